@@ -0,0 +1,62 @@
+import os
+
+"""Writes files atomically, so a reader never sees one half written.
+
+The file is written to a temporary file beside it, which replaces it only
+once the block inside the with statement finishes. If the block raises,
+the existing file is left as it was and the temporary file is removed.
+
+Usage:
+    with AtomicWrite("rates.csv") as file:
+        file.write(text)
+
+Methods:
+    AtomicWrite:
+        Opens a temporary file which replaces a file once it has been written.
+"""
+
+# Added to the name of a file to get the temporary file it is written to.
+TEMPORARY_SUFFIX = ".tmp"
+
+class AtomicWrite:
+    """Opens a temporary file which replaces a file once it has been written.
+    """
+
+    def __init__(self, fileName: str, mode: str="w", sync: bool=False):
+        """Initialises an AtomicWrite object.
+
+        Parameters:
+            fileName: str
+                The file to write.
+            mode: str
+                The mode to open the temporary file with, "w" or "wb".
+            sync: bool
+                Whether to flush the temporary file to disk before it replaces the file.
+        """
+
+        self.fileName = fileName
+        self.temporaryFile = fileName + TEMPORARY_SUFFIX
+        self.mode = mode
+        self.sync = sync
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.temporaryFile, self.mode)
+        return self.file
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if (exc_type is None and self.sync):
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.file.close()
+
+            if (exc_type is None):
+                os.replace(self.temporaryFile, self.fileName)
+        finally:
+            # Removes the temporary file if anything failed before it replaced the file.
+            self.file.close()
+            if (os.path.exists(self.temporaryFile)):
+                os.remove(self.temporaryFile)
+
+        return False
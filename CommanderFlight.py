@@ -1,5 +1,8 @@
 from flight import DEFAULT_HEIGHT, DEFAULT_TIME, DEFAULT_DELAY
 import logs
+import LoopGeometry
+import Profiler
+from TelemetryHistory import TelemetryHistory
 import math
 import time
 
@@ -26,10 +29,26 @@ class CommanderFlight:
             The velocity in the z-direction of the drone.
         batV: float
             The battery level in volts.
+        linkStats: LinkStats
+            The statistics of the telemetry link while logging,
+            or None if the drone isn't logging.
+        phase: str
+            The phase of flight the drone is in ("takeoff", "hover", "cruise"
+            or "land"), or None before it has taken off.
+        logConfig: LogConfig
+            The log config started by logs.StartLogging, or None if the drone isn't logging.
+        rateProfile: dict[str, float]
+            The period in ms to log at during each phase, or None to keep the period fixed.
+        telemetryBus: TelemetryBus
+            The bus that every logged sample is published to, or None to not publish them.
+        history: TelemetryHistory
+            The recent samples given to UpdateState, for window queries such as the mean velocity.
     
     Methods:
         UpdateState:
             Updates the attributes of the instance.
+        SetPhase:
+            Changes the phase of flight and the logging rate.
         TakeOff:
             Makes the drone take off.
         Land:
@@ -59,9 +78,16 @@ class CommanderFlight:
         self.vz = 0
         self.batV = 0
         self.batP = 0
-
-    def UpdateState(self, position: list[float], velocity: list[float], batV: float, batP: float) -> None:
-        """Updates the attributes of the CommanderFlight instance.
+        self.linkStats = None
+        self.phase = None
+        self.logConfig = None
+        self.rateProfile = None
+        self.telemetryBus = None
+        self.history = TelemetryHistory()
+
+    @Profiler.Profiled("flight")
+    def UpdateState(self, position: list[float], velocity: list[float], batV: float, batP: float, timestamp: float=None) -> None:
+        """Updates the attributes of the CommanderFlight instance and adds the sample to its history.
         
         Parameters:
             position: list[float]
@@ -72,6 +98,9 @@ class CommanderFlight:
                 The battery of the drone in volts.
             batP: float
                 The battery of the drone as a percentage.
+            timestamp: float
+                The time of the sample in ms, from the Crazyflie's clock.
+                Uses the time of the computer by default.
         """
 
         self.x = position[0]
@@ -85,6 +114,29 @@ class CommanderFlight:
         self.batV = batV
         self.batP = batP
 
+        if (timestamp is None):
+            timestamp = time.time() * 1000
+        self.history.Append(timestamp / 1000, position, velocity, batV, batP)
+
+    def SetPhase(self, phase: str) -> None:
+        """Changes the phase of flight.
+
+        If logging with a rate profile, changes the logging period
+        to the period of the new phase.
+
+        Parameters:
+            phase: str
+                The new phase of flight.
+        """
+
+        if (phase == self.phase):
+            return
+
+        self.phase = phase
+        if (self.logConfig is not None and self.rateProfile is not None and phase in self.rateProfile):
+            logs.SetLogPeriod(self, self.logConfig, self.rateProfile[phase])
+
+    @Profiler.Profiled("flight")
     def TakeOff(self, height: float=DEFAULT_HEIGHT, time_s: float=DEFAULT_TIME, yaw: float=0) -> None:
         """Makes the drone take off.
 
@@ -100,14 +152,18 @@ class CommanderFlight:
                 that the drone should be facing in during take off.
         """
 
+        self.SetPhase("takeoff")
+
         steps = int(time_s * 10)
         # Loops through the steps, each step should take 0.1 seconds
         # since the commands other than .sleep are negligible.
         for i in range(1, steps + 1):
             currentHeight = height * (i / steps)
+            Profiler.Instant("setpoint", "flight")
             self.commander.send_position_setpoint(self.x, self.y, currentHeight, yaw)
             time.sleep(0.1)
 
+    @Profiler.Profiled("flight")
     def Land(self, time_s: float=DEFAULT_TIME) -> None:
         """Lands the drone at its current coordinates.
         
@@ -116,13 +172,17 @@ class CommanderFlight:
                 The duration of the landing in seconds.
         """
 
+        self.SetPhase("land")
+
         steps = int(time_s * 10)
         height = self.z
         for i in range(steps, 2, -1):
             currentHeight = height * (i / steps)
+            Profiler.Instant("setpoint", "flight")
             self.commander.send_position_setpoint(self.x, self.y, currentHeight, 0)
             time.sleep(0.1)
 
+    @Profiler.Profiled("flight")
     def MoveToPosition(self, position: list[float], velocity: float, yaw: float=0) -> None:
         """Moves to a new position at a desired velocity.
 
@@ -141,6 +201,8 @@ class CommanderFlight:
                 The yaw of the drone during the movement.
         """
 
+        self.SetPhase("cruise")
+
         distance = [ position[0] - self.x, position[1] - self.y, position[2] - self.z ]
         distanceMagnitude = math.sqrt(distance[0]**2 + distance[1]**2 + distance[2]**2)
         initialPosition = [self.x, self.y, self.z]
@@ -150,9 +212,11 @@ class CommanderFlight:
             newX = initialPosition[0] + (i * distance[0] / flightSteps)
             newY = initialPosition[1] + (i * distance[1] / flightSteps)
             newZ = initialPosition[2] + (i * distance[2] / flightSteps)
+            Profiler.Instant("setpoint", "flight")
             self.commander.send_position_setpoint(newX, newY, newZ, yaw)
             time.sleep(0.1)
     
+    @Profiler.Profiled("flight")
     def Hover(self, time_s: float, yaw: float=0) -> None:
         """Hovers in place for the allotted time.
 
@@ -163,10 +227,13 @@ class CommanderFlight:
                 The yaw of the drone during the hovering.
         """
 
+        self.SetPhase("hover")
+
         pos = [self.x, self.y, self.z]
 
         hoverTime = time.time() + time_s
         while ((waitTime := hoverTime - time.time()) > 0):
+            Profiler.Instant("setpoint", "flight")
             self.commander.send_position_setpoint(pos[0], pos[1], pos[2], yaw)
             time.sleep(0.1)
 
@@ -178,14 +245,16 @@ class CommanderFlight:
         """
 
         logFile = logs.CreateSimpleLogFile(logFolder)
-        logs.StartLogging(self, logFile, 1000) # Speed at 1000 so that the error is never printed to console
+        config = logs.StartLogging(self, logFile, 1000) # Speed at 1000 so that the error is never printed to console
         time.sleep(0.2) # Pauses to let the log data update the position.
 
         self.TakeOff()
         self.Hover(5.0)
         self.Land()
+        logs.StopLogging(self, config, logFile)
 
-    def Loop(self, logFolder: str, speed: float, height: float, startTime: float, separation: float, isLeading: bool) -> None:
+    def Loop(self, logFolder: str, speed: float, height: float, startTime: float, separation: float, isLeading: bool, legs: int=2,
+             rateProfile: dict[str, float]=None) -> None:
         """Makes the drone do laps around the system.
         
         Parameters:
@@ -201,36 +270,30 @@ class CommanderFlight:
                 The vertical and horizontal separation between the drones in m.
             isLeading: bool
                 Whether the current drone is leading or not.
+            legs: int
+                The number of legs (sides of the box) to fly. A full lap is
+                4 legs, see MissionPlanner.PlanLoopMission for how many
+                laps the battery can sustain.
+            rateProfile: dict[str, float]
+                The period in ms to log at during each phase, e.g. logs.DEFAULT_RATE_PROFILE.
+                Logs at a fixed period by default.
         """
 
-        # Defines the range of the box.
-        xRange = [-1, 1]
-        yRange = [-1, 1]
         # Defines the corners of the box.
-        corners = [(xRange[0], yRange[0]), (xRange[1], yRange[0]), (xRange[1], yRange[1]), (xRange[0], yRange[1])]
+        corners = LoopGeometry.GetCorners(LoopGeometry.DEFAULT_X_RANGE, LoopGeometry.DEFAULT_Y_RANGE)
 
         # Changes the start and end positions of each leg depending on whether the drone
         # is leading or trailing.
-        if (isLeading):
-            # Start slightly ahead of the corner.
-            startCoordinates = [(corners[0][0] + separation, corners[0][1]),
-                                (corners[1][0], corners[1][1] + separation),
-                                (corners[2][0] - separation, corners[2][1]),
-                                (corners[3][0], corners[3][1] - separation)]
-            # End on the corners.
-            endCoordinates = [corners[1], corners[2], corners[3], corners[0]]
-        else:
-            # Start on the corner.
-            startCoordinates = corners
-            # End slightly behind the corners.
-            endCoordinates = [(corners[1][0] - separation, corners[1][1]),
-                              (corners[2][0], corners[2][1] - separation),
-                              (corners[3][0] + separation, corners[3][1]),
-                              (corners[0][0], corners[0][1] + separation)]
+        startCoordinates, endCoordinates = LoopGeometry.GetLegCoordinates(corners, separation, isLeading)
 
         # Creates the log file.
-        logFile = logs.CreateSimpleLogFile(logFolder)
-        logs.StartLogging(self, logFile, speed)
+        logFile = logs.CreateSimpleLogFile(logFolder, {
+            "velocity": speed,
+            "horizontalSeparation": separation,
+            "verticalSeparation": separation,
+            "leading": isLeading,
+        })
+        config = logs.StartLogging(self, logFile, speed, rateProfile=rateProfile)
 
         # Takes off and hovers to stabilise.
         self.TakeOff(height)
@@ -245,7 +308,7 @@ class CommanderFlight:
         # Loops as long as the drone has enough battery.
         cornerIndex = 0
         # while (self.batV >= 3.4):
-        for i in range(2):
+        for i in range(legs):
             # Moves to the end position.
             position = [ endCoordinates[cornerIndex][0], endCoordinates[cornerIndex][1], height]
             self.MoveToPosition(position, velocity=speed)
@@ -262,4 +325,5 @@ class CommanderFlight:
             self.Hover(DEFAULT_DELAY)
 
         # Lands when the battery is too low.
-        self.Land() 
\ No newline at end of file
+        self.Land() 
+        logs.StopLogging(self, config, logFile)
\ No newline at end of file
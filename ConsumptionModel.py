@@ -0,0 +1,274 @@
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import Tuple
+
+from AtomicWrite import AtomicWrite
+from ParseData import ExtractTrialRatesFromFolder, LOG_FOLDER, MIN_VOLTAGE, MAX_VOLTAGE
+
+"""Fits models of battery consumption across every trial in the archive.
+
+Rather than averaging the trials of each configuration, every trial is
+used as its own row of a design matrix, and the consumption rate is
+modelled as a function of the velocity, separations and position of the drone.
+
+A fitted model is stored as a dictionary of the form
+    {
+        "model": the name of the model in MODELS,
+        "features": the names of the features, in order,
+        "terms": a list of terms, where each term is a list of feature indices
+                 whose product is one column of the design matrix
+                 (an empty list is the intercept),
+        "coefficients": the coefficient of each term
+    }
+which can be saved as a small .json file.
+
+Methods:
+    BuildDesignData:
+        Gets the features and consumption rate of every trial in a folder.
+    GetModelTerms:
+        Gets the terms used by a model.
+    BuildDesignMatrix:
+        Builds the design matrix of a set of features.
+    FitModel:
+        Fits a model to a set of trials.
+    CrossValidateModel:
+        Gets the k-fold cross-validation error of a model.
+    SaveModel:
+        Saves a fitted model to a file.
+    LoadModel:
+        Loads a fitted model from a file.
+    PredictConsumption:
+        Predicts the consumption rate of a configuration.
+"""
+
+# The features of each trial, in the order they appear in the design matrix.
+FEATURES = ("velocity", "horizontalSeparation", "verticalSeparation", "leading")
+
+# The models which can be fitted.
+MODELS = ("linear", "interaction")
+
+def BuildDesignData(folder: str=LOG_FOLDER, percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE,
+                    estimator: str="ols", prefilter: str=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Gets the features and consumption rate of every trial in a folder.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+        percentage: bool
+            Determines whether to use the rates in V/s or %/s.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting,
+            from SlopeEstimators.FILTERS.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            A tuple containing an (n, 4) array of the features of each trial,
+            in the order given by FEATURES, and the consumption rate of each trial.
+            Trials whose rate could not be fitted are left out.
+    """
+
+    keys, rates, files = ExtractTrialRatesFromFolder(folder, percentage, minVoltage, maxVoltage, estimator, prefilter)
+
+    features = np.array(keys, dtype=float)
+    valid = np.isfinite(rates)
+
+    return features[valid], rates[valid]
+
+def GetModelTerms(model: str) -> list[list[int]]:
+    """Gets the terms used by a model.
+
+    Parameters:
+        model: str
+            The name of the model, from MODELS.
+
+    Returns:
+        list[list[int]]:
+            The terms of the model, where each term is a list of the
+            indices of the features which are multiplied together.
+    """
+
+    if (model not in MODELS):
+        raise ValueError(f"Unknown model {model}, expected one of {MODELS}")
+
+    # Every model has an intercept and a term for each feature.
+    terms = [[]] + [[i] for i in range(len(FEATURES))]
+
+    # The interaction model also has a term for each pair of features.
+    if (model == "interaction"):
+        terms += [list(pair) for pair in combinations(range(len(FEATURES)), 2)]
+
+    return terms
+
+def BuildDesignMatrix(features: np.ndarray, terms: list[list[int]]) -> np.ndarray:
+    """Builds the design matrix of a set of features.
+
+    Parameters:
+        features: np.ndarray
+            An (n, 4) array of features, in the order given by FEATURES.
+        terms: list[list[int]]
+            The terms of the model, as given by GetModelTerms.
+
+    Returns:
+        np.ndarray:
+            An (n, len(terms)) array, where each column is the product
+            of the features in the corresponding term.
+    """
+
+    matrix = np.ones((len(features), len(terms)))
+    for column, term in enumerate(terms):
+        for feature in term:
+            matrix[:, column] *= features[:, feature]
+
+    return matrix
+
+def FitModel(features: np.ndarray, rates: np.ndarray, model: str="linear") -> dict:
+    """Fits a model to a set of trials with least squares.
+
+    Features which never vary in the data (such as a single horizontal separation)
+    can't be separated from the intercept, in which case the smallest
+    coefficients which fit the data are used.
+
+    Parameters:
+        features: np.ndarray
+            An (n, 4) array of features, in the order given by FEATURES.
+        rates: np.ndarray
+            The consumption rate of each trial.
+        model: str
+            The name of the model to fit, from MODELS.
+
+    Returns:
+        dict:
+            The fitted model.
+    """
+
+    terms = GetModelTerms(model)
+    matrix = BuildDesignMatrix(features, terms)
+    coefficients, residuals, rank, singularValues = np.linalg.lstsq(matrix, rates, rcond=None)
+
+    return {
+        "model": model,
+        "features": list(FEATURES),
+        "terms": terms,
+        "coefficients": [float(c) for c in coefficients],
+    }
+
+def CrossValidateModel(features: np.ndarray, rates: np.ndarray, model: str="linear", folds: int=5, seed: int=0, workers: int=None) -> np.ndarray:
+    """Gets the k-fold cross-validation error of a model.
+
+    The trials are shuffled and split into folds, and each fold is
+    predicted by a model fitted to the other folds. The folds are
+    fitted in parallel.
+
+    Parameters:
+        features: np.ndarray
+            An (n, 4) array of features, in the order given by FEATURES.
+        rates: np.ndarray
+            The consumption rate of each trial.
+        model: str
+            The name of the model to fit, from MODELS.
+        folds: int
+            The number of folds to split the trials into.
+        seed: int
+            The seed used to shuffle the trials.
+        workers: int
+            The number of threads to fit the folds with.
+            Uses one thread per fold by default.
+
+    Returns:
+        np.ndarray:
+            The root mean square prediction error of each fold.
+    """
+
+    terms = GetModelTerms(model)
+    matrix = BuildDesignMatrix(features, terms)
+
+    # Assigns each trial to a fold.
+    order = np.random.default_rng(seed).permutation(len(rates))
+    foldOf = np.empty(len(rates), dtype=int)
+    foldOf[order] = np.arange(len(rates)) % folds
+
+    def FitFold(fold: int) -> float:
+        # Fits to every other fold and tests on this one.
+        train = foldOf != fold
+        coefficients = np.linalg.lstsq(matrix[train], rates[train], rcond=None)[0]
+        errors = matrix[~train] @ coefficients - rates[~train]
+        return float(np.sqrt(np.mean(errors**2)))
+
+    # numpy releases the GIL during the fits, so threads run them in parallel.
+    with ThreadPoolExecutor(max_workers=workers or folds) as executor:
+        errors = list(executor.map(FitFold, range(folds)))
+
+    return np.array(errors)
+
+def SaveModel(model: dict, fileName: str) -> None:
+    """Saves a fitted model to a file.
+
+    Parameters:
+        model: dict
+            The fitted model, as given by FitModel.
+        fileName: str
+            The .json file to save the model to.
+    """
+
+    with AtomicWrite(fileName) as file:
+        json.dump(model, file)
+
+def LoadModel(fileName: str) -> dict:
+    """Loads a fitted model from a file.
+
+    Parameters:
+        fileName: str
+            The .json file the model was saved to.
+
+    Returns:
+        dict:
+            The fitted model.
+    """
+
+    file = open(fileName, "r")
+    model = json.load(file)
+    file.close()
+
+    return model
+
+def PredictConsumption(model: dict, velocity: float, horizontalSeparation: float, verticalSeparation: float, leading: bool) -> float:
+    """Predicts the consumption rate of a configuration.
+
+    Only uses plain Python arithmetic, so a single prediction
+    takes a few microseconds.
+
+    Parameters:
+        model: dict
+            The fitted model, as given by FitModel or LoadModel.
+        velocity: float
+            The velocity of the drones in m/s.
+        horizontalSeparation: float
+            The horizontal separation between the drones in m.
+        verticalSeparation: float
+            The vertical separation between the drones in m.
+        leading: bool
+            Whether the drone is the leading drone.
+
+    Returns:
+        float:
+            The predicted consumption rate, in the units the model was fitted with.
+    """
+
+    features = (velocity, horizontalSeparation, verticalSeparation, float(leading))
+
+    prediction = 0.0
+    for term, coefficient in zip(model["terms"], model["coefficients"]):
+        value = coefficient
+        for feature in term:
+            value *= features[feature]
+        prediction += value
+
+    return prediction
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Tuple
+
+from AtomicWrite import AtomicWrite
+from LogArchive import OpenLog
+from ParseData import ListLogFiles, CountHeaderLines
+
+"""Finds logs whose data appears more than once across log folders.
+
+Logs are fingerprinted by their data rows only, so a log copied into another
+folder with a rewritten header (see the README about old_logs) is still
+recognised. Each row is hashed on its own, which makes the fingerprint a
+content-defined chunking of the log at row boundaries:
+    - logs with exactly the same rows have the same digest, and
+    - logs which share most of their rows (e.g. a truncated copy, or a copy with
+      a few rows edited) have similar MinHash signatures.
+
+Near-duplicates are found with locality sensitive hashing on the signatures,
+so every folder is compared in a single pass without comparing every pair of logs.
+
+Methods:
+    FingerprintLog:
+        Hashes the data rows of a log.
+    GetSignature:
+        Gets the MinHash signature of a log's row hashes.
+"""
+
+# The number of hash functions in each MinHash signature.
+SIGNATURE_LENGTH = 64
+# The number of signature entries in each band used to find candidate pairs.
+BAND_SIZE = 4
+# The fraction of shared rows above which two logs are near-duplicates.
+SIMILARITY_THRESHOLD = 0.8
+
+# The seeds of the MinHash functions. Fixed so that saved signatures stay comparable.
+_SEEDS = np.random.default_rng(20250510).integers(0, 2**63, SIGNATURE_LENGTH, dtype=np.uint64)
+# An odd constant used to mix the bits of each hash, from splitmix64.
+_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+
+def FingerprintLog(fileName: str) -> Tuple[str, np.ndarray]:
+    """Hashes the data rows of a log.
+
+    Parameters:
+        fileName: str
+            The log file to fingerprint.
+
+    Returns:
+        Tuple[str, np.ndarray]:
+            The digest of every data row in order, and the 64-bit hash of each row.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    rowHashes = []
+
+    file = OpenLog(fileName)
+    for i in range(CountHeaderLines(fileName)):
+        file.readline()
+
+    for line in file:
+        # Ignores trailing whitespace so that line endings don't matter.
+        row = line.rstrip().encode("utf-8")
+        if (not row):
+            continue
+
+        digest.update(row + b"\n")
+        rowHashes.append(int.from_bytes(hashlib.blake2b(row, digest_size=8).digest(), "little"))
+    file.close()
+
+    return digest.hexdigest(), np.array(rowHashes, dtype=np.uint64)
+
+def GetSignature(rowHashes: np.ndarray) -> np.ndarray:
+    """Gets the MinHash signature of a log's row hashes.
+
+    The fraction of matching entries between two signatures estimates
+    the fraction of rows shared by the two logs (their Jaccard similarity).
+
+    Parameters:
+        rowHashes: np.ndarray
+            The 64-bit hash of each row, as given by FingerprintLog.
+
+    Returns:
+        np.ndarray:
+            The SIGNATURE_LENGTH entries of the signature.
+    """
+
+    if (len(rowHashes) == 0):
+        return np.full(SIGNATURE_LENGTH, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    # Applies every hash function to every row at once, letting the multiplication wrap around.
+    mixed = (rowHashes[None, :] ^ _SEEDS[:, None]) * _MULTIPLIER
+    mixed ^= mixed >> np.uint64(31)
+
+    return mixed.min(axis=1)
+
+class DedupIndex:
+    """Stores the fingerprints of the logs in any number of folders.
+
+    Logs which haven't changed since they were last fingerprinted
+    aren't read again when their folder is added again.
+
+    Attributes:
+        entries: dict[str, dict]
+            Maps the path of each log to its size, modification time, number
+            of rows, digest and signature.
+
+    Methods:
+        AddFolders:
+            Fingerprints every log in the folders that isn't already up to date.
+        FindDuplicates:
+            Finds the groups of logs with exactly the same data rows.
+        FindNearDuplicates:
+            Finds the pairs of logs which share most of their data rows.
+        GetUniqueFiles:
+            Lists the logs in the folders, leaving out duplicates.
+        Save:
+            Saves the index to a file.
+        Load:
+            Loads an index from a file.
+    """
+
+    def __init__(self):
+        """Initialises an empty DedupIndex.
+        """
+
+        self.entries = {}
+
+    def AddFolders(self, folders: list[str]) -> int:
+        """Fingerprints every log in the folders that isn't already up to date.
+
+        Parameters:
+            folders: list[str]
+                The folders (or bundles) containing the logs.
+
+        Returns:
+            int:
+                The number of logs that were fingerprinted.
+        """
+
+        count = 0
+        for folder in folders:
+            for fileName in ListLogFiles(folder):
+                # Bundled logs are checked against the bundle, since they have no file of their own.
+                stat = os.stat(fileName) if os.path.exists(fileName) else os.stat(folder)
+
+                entry = self.entries.get(fileName)
+                if (entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns):
+                    continue
+
+                digest, rowHashes = FingerprintLog(fileName)
+                self.entries[fileName] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "rows": len(rowHashes),
+                    "digest": digest,
+                    "signature": [int(value) for value in GetSignature(rowHashes)],
+                }
+                count += 1
+
+        return count
+
+    def FindDuplicates(self) -> list[list[str]]:
+        """Finds the groups of logs with exactly the same data rows.
+
+        Returns:
+            list[list[str]]:
+                The groups of logs with the same data, each sorted by path.
+        """
+
+        groups = {}
+        for fileName, entry in self.entries.items():
+            groups.setdefault(entry["digest"], []).append(fileName)
+
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+    def FindNearDuplicates(self, threshold: float=SIMILARITY_THRESHOLD) -> list[Tuple[str, str, float]]:
+        """Finds the pairs of logs which share most of their data rows.
+
+        Logs whose signatures match in every entry of a band are candidates,
+        and candidates are kept if their estimated similarity is above the threshold.
+        Exact duplicates are included with a similarity of 1.
+
+        Parameters:
+            threshold: float
+                The fraction of shared rows above which two logs are near-duplicates.
+
+        Returns:
+            list[Tuple[str, str, float]]:
+                The (fileA, fileB, similarity) of each pair, sorted by path.
+        """
+
+        files = sorted(self.entries.keys())
+        if (len(files) < 2):
+            return []
+
+        signatures = np.array([self.entries[fileName]["signature"] for fileName in files], dtype=np.uint64)
+
+        # Puts the logs into buckets by each band of their signature.
+        candidates = set()
+        for start in range(0, SIGNATURE_LENGTH, BAND_SIZE):
+            buckets = {}
+            for i, band in enumerate(signatures[:, start:start + BAND_SIZE]):
+                buckets.setdefault(band.tobytes(), []).append(i)
+
+            for bucket in buckets.values():
+                for a in range(len(bucket)):
+                    for b in range(a + 1, len(bucket)):
+                        candidates.add((bucket[a], bucket[b]))
+
+        # Estimates the similarity of the candidates from their signatures.
+        output = []
+        for a, b in sorted(candidates):
+            similarity = float(np.mean(signatures[a] == signatures[b]))
+            if (self.entries[files[a]]["digest"] == self.entries[files[b]]["digest"]):
+                similarity = 1.0
+            if (similarity >= threshold):
+                output.append((files[a], files[b], similarity))
+
+        return output
+
+    def GetUniqueFiles(self, folders: list[str], threshold: float=None, excludeFailed: bool=False) -> list[str]:
+        """Lists the logs in the folders, leaving out duplicates.
+
+        The folders should be given in order of preference, since the
+        first copy of a log is kept and later copies are left out.
+
+        Parameters:
+            folders: list[str]
+                The folders (or bundles) containing the logs.
+            threshold: float
+                If given, near-duplicates with at least this similarity are also
+                left out. Only exact duplicates are left out by default.
+            excludeFailed: bool
+                Whether to leave out the trials that failed quality control. The failed
+                copies are left out before choosing which copy to keep, so a trial is kept
+                as long as one of its copies passed.
+
+        Returns:
+            list[str]:
+                The paths to the unique logs, in folder order.
+        """
+
+        self.AddFolders(folders)
+        files = [fileName for folder in folders for fileName in ListLogFiles(folder, excludeFailed)]
+        order = {fileName: i for i, fileName in enumerate(files)}
+
+        # Keeps the first copy of each digest.
+        seen = set()
+        removed = set()
+        for fileName in files:
+            digest = self.entries[fileName]["digest"]
+            if (digest in seen):
+                removed.add(fileName)
+            seen.add(digest)
+
+        # Leaves out the later log of each pair of near-duplicates.
+        if (threshold is not None):
+            for fileA, fileB, similarity in self.FindNearDuplicates(threshold):
+                if (fileA in order and fileB in order):
+                    removed.add(fileA if order[fileA] > order[fileB] else fileB)
+
+        return [fileName for fileName in files if fileName not in removed]
+
+    def Save(self, fileName: str) -> None:
+        """Saves the index to a file.
+
+        Parameters:
+            fileName: str
+                The .json file to save the index to.
+        """
+
+        with AtomicWrite(fileName) as file:
+            json.dump(self.entries, file)
+
+    @staticmethod
+    def Load(fileName: str) -> "DedupIndex":
+        """Loads an index from a file.
+
+        Parameters:
+            fileName: str
+                The .json file the index was saved to.
+
+        Returns:
+            DedupIndex:
+                The loaded index.
+        """
+
+        file = open(fileName, "r")
+        index = DedupIndex()
+        index.entries = json.load(file)
+        file.close()
+
+        return index
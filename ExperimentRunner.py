@@ -0,0 +1,521 @@
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import MissionPlanner
+from AtomicWrite import AtomicWrite
+
+"""Runs the whole grid of trials, in an order that needs the fewest battery swaps.
+
+Replaces editing the trial parameters in main.py by hand for every trial.
+The grid of velocities, horizontal separations and vertical separations is
+repeated a number of times, and the trials are ordered so that:
+    - consecutive trials change the positions of the drones as little as
+      possible, so the leading drone repositions the least.
+    - the trials are packed into few battery charges, using the drain table
+      of MissionPlanner to estimate the voltage each trial uses, so the
+      batteries are swapped as few times as the order allows.
+
+Every finished trial is recorded in a progress file, so an interrupted
+experiment carries on from the next unfinished trial when run again. The
+remaining trials are packed again from a fresh battery when resuming.
+
+Usage:
+    python ExperimentRunner.py
+    python ExperimentRunner.py --run --progress experiment.json
+
+Methods:
+    Trial:
+        A single trial of the experiment.
+    GetTrials:
+        Gets every trial of the grid.
+    GetTrialDuration:
+        Gets how long flight.RunOneTrial takes to fly a trial.
+    EstimateTrialDrain:
+        Estimates the voltage used by a trial.
+    GetEstimatedConfigurations:
+        Gets the configurations whose drain comes from cells that weren't measured.
+    GetTransitionCost:
+        Gets how much the drones have to move between two trials.
+    PlanExperiment:
+        Orders the trials and packs them into battery charges.
+    GetPlanTransitionCost:
+        Gets how much the drones have to move over a whole plan.
+    LoadProgress:
+        Loads the trials already finished.
+    SaveProgress:
+        Saves the trials already finished.
+    RunExperiment:
+        Runs every unfinished trial.
+    FlyTrial:
+        Flies one trial with the leading and trailing drones.
+"""
+
+# The grid of trial parameters by default. Matches the comments in main.py.
+DEFAULT_VELOCITIES = (0.5, 0.75, 1.0)
+DEFAULT_HORIZONTAL_SEPARATIONS = (0.25, 0.5, 0.75, 1.0)
+DEFAULT_VERTICAL_SEPARATIONS = (0.0, 0.25, 0.5, 0.75)
+DEFAULT_REPETITIONS = 3
+
+# The distance travelled by the leading drone when it's 1.0 m away from the trailing drone. Matches main.TRIAL_DISTANCE.
+TRIAL_DISTANCE = 2.0
+
+# The starting x-coordinates of the leading and trailing drones.
+LEADING_X = -0.75
+TRAILING_X = -1.5
+
+# The time in s from take off to the start of the movement, covering the take off,
+# hover and reposition of flight.RunOneTrial and some slack to line the drones up.
+SETUP_TIME = 12.0
+# The time in s after the movement, hovering, returning at 1 m/s and landing.
+HOVER_TIME = 5.0
+RETURN_SPEED = 1.0
+LAND_TIME = 2.8
+# The time in s between starting a trial and taking off, so both drones take off together.
+START_DELAY = 15.0
+
+# The voltage of a freshly charged battery.
+CHARGED_VOLTAGE = 4.1
+# The lowest drain in V/s a trial is taken to have, for drain tables saved before every cell was floored.
+MIN_DRAIN = MissionPlanner.MIN_DRAIN
+
+# How much each kind of change between trials costs, per m or m/s. Moving the
+# leading drone to a new horizontal separation takes the longest.
+HORIZONTAL_WEIGHT = 2.0
+VERTICAL_WEIGHT = 1.0
+VELOCITY_WEIGHT = 0.1
+
+# How many trials past the next one PlanExperiment may bring forward to fill the room
+# left in a charge. 0 flies the trials strictly in order, moving the drones the least.
+LOOKAHEAD = 2
+
+class Trial(NamedTuple):
+    """A single trial of the experiment.
+
+    Methods:
+        GetKey:
+            Gets the key the trial is recorded under in the progress file.
+    """
+
+    velocity: float
+    horizontalSeparation: float
+    verticalSeparation: float
+    repetition: int
+
+    def GetKey(self) -> str:
+        """Gets the key the trial is recorded under in the progress file.
+
+        Returns:
+            str:
+                The parameters of the trial, separated by commas.
+        """
+
+        return f"{self.velocity},{self.horizontalSeparation},{self.verticalSeparation},{self.repetition}"
+
+def GetTrials(velocities: tuple=DEFAULT_VELOCITIES, horizontalSeparations: tuple=DEFAULT_HORIZONTAL_SEPARATIONS,
+              verticalSeparations: tuple=DEFAULT_VERTICAL_SEPARATIONS, repetitions: int=DEFAULT_REPETITIONS) -> list[Trial]:
+    """Gets every trial of the grid.
+
+    Parameters:
+        velocities: tuple
+            The velocities in m/s.
+        horizontalSeparations: tuple
+            The horizontal separations in m.
+        verticalSeparations: tuple
+            The vertical separations in m.
+        repetitions: int
+            The number of times to repeat each configuration.
+
+    Returns:
+        list[Trial]:
+            A trial for every combination of the parameters and every repetition.
+    """
+
+    return [Trial(float(vel), float(hSep), float(vSep), rep)
+            for vel, hSep, vSep, rep in itertools.product(velocities, horizontalSeparations, verticalSeparations, range(repetitions))]
+
+def GetTrialDistance(trial: Trial) -> float:
+    """Gets the distance the drones move forward during a trial.
+
+    Parameters:
+        trial: Trial
+            The trial.
+
+    Returns:
+        float:
+            The distance in m.
+    """
+
+    return TRIAL_DISTANCE + (1.0 - trial.horizontalSeparation)
+
+def GetTrialDuration(trial: Trial) -> float:
+    """Gets how long flight.RunOneTrial takes to fly a trial, from take off to landing.
+
+    Parameters:
+        trial: Trial
+            The trial.
+
+    Returns:
+        float:
+            The duration in s.
+    """
+
+    distance = GetTrialDistance(trial)
+    return SETUP_TIME + distance / trial.velocity + HOVER_TIME + distance / RETURN_SPEED + LAND_TIME
+
+def EstimateTrialDrain(table: dict, trial: Trial) -> float:
+    """Estimates the voltage used by a trial.
+
+    Both drones fly every trial on their own battery, so the estimate is
+    the voltage used by whichever drone uses more. The drain is never taken
+    to be below MIN_DRAIN.
+
+    Parameters:
+        table: dict
+            The drain table, as given by MissionPlanner.BuildDrainTable.
+        trial: Trial
+            The trial.
+
+    Returns:
+        float:
+            The voltage used in V.
+    """
+
+    drain = max(MissionPlanner.LookupDrain(table, trial.velocity, trial.verticalSeparation, True),
+                MissionPlanner.LookupDrain(table, trial.velocity, trial.verticalSeparation, False), MIN_DRAIN)
+
+    return drain * GetTrialDuration(trial)
+
+def GetEstimatedConfigurations(trials: list[Trial], table: dict) -> dict[tuple[float, float], set[str]]:
+    """Gets the configurations whose drain comes from cells that weren't measured.
+
+    The charges holding these trials are planned on a guess of their drain,
+    see MissionPlanner.GetCellFlags.
+
+    Parameters:
+        trials: list[Trial]
+            The trials to check.
+        table: dict
+            The drain table, as given by MissionPlanner.BuildDrainTable.
+
+    Returns:
+        dict[tuple[float, float], set[str]]:
+            A dictionary where
+                the keys are the (velocity, verticalSeparation) of each configuration and
+
+                the values are the flags of the cells that weren't measured.
+    """
+
+    estimated = {}
+    for trial in trials:
+        flags = (MissionPlanner.GetCellFlags(table, trial.velocity, trial.verticalSeparation, True)
+                 | MissionPlanner.GetCellFlags(table, trial.velocity, trial.verticalSeparation, False))
+        flags.discard(MissionPlanner.CELL_MEASURED)
+        if (flags):
+            estimated[(trial.velocity, trial.verticalSeparation)] = flags
+
+    return estimated
+
+def GetTransitionCost(previous: Trial, trial: Trial) -> float:
+    """Gets how much the drones have to move between two trials.
+
+    Parameters:
+        previous: Trial
+            The trial flown first, or None if the trial is the first on a battery.
+        trial: Trial
+            The trial flown next.
+
+    Returns:
+        float:
+            The weighted change in separations and velocity.
+    """
+
+    if (previous is None):
+        return 0.0
+
+    return (HORIZONTAL_WEIGHT * abs(trial.horizontalSeparation - previous.horizontalSeparation)
+            + VERTICAL_WEIGHT * abs(trial.verticalSeparation - previous.verticalSeparation)
+            + VELOCITY_WEIGHT * abs(trial.velocity - previous.velocity))
+
+def PlanExperiment(trials: list[Trial], table: dict, chargedVoltage: float=CHARGED_VOLTAGE,
+                   reserveVoltage: float=MissionPlanner.RESERVE_VOLTAGE, lookahead: int=LOOKAHEAD) -> list[list[Trial]]:
+    """Orders the trials and packs them into battery charges.
+
+    The trials are first ordered so that the next trial is always the one
+    that changes the drones the least from the previous trial, which flies
+    the repetitions of a configuration together. The order is then split into
+    charges, each taking the next trials while they fit. The room left in a
+    charge is filled with the first of the next lookahead trials that fit, so
+    a larger lookahead needs fewer charges but moves the drones more. Trials
+    that use more than a full charge are given a charge of their own.
+
+    Parameters:
+        trials: list[Trial]
+            The trials to plan.
+        table: dict
+            The drain table, as given by MissionPlanner.BuildDrainTable.
+        chargedVoltage: float
+            The voltage of a freshly charged battery.
+        reserveVoltage: float
+            The voltage the drones must still have when they land.
+        lookahead: int
+            How many trials past the next one may be brought forward to fill a charge.
+
+    Returns:
+        list[list[Trial]]:
+            The trials flown on each charge, in order.
+    """
+
+    budget = chargedVoltage - reserveVoltage
+    if (budget <= 0):
+        raise ValueError(f"A charged battery ({chargedVoltage} V) must be above the reserve ({reserveVoltage} V)")
+    if (lookahead < 0):
+        raise ValueError(f"The lookahead must not be negative, not {lookahead}")
+
+    drains = {trial: EstimateTrialDrain(table, trial) for trial in trials}
+
+    # Orders the trials, starting from the first of the grid. Sorting first keeps the plan the same for the same grid.
+    ordered = []
+    remaining = sorted(trials)
+    previous = None
+    while (remaining):
+        trial = min(remaining, key=lambda candidate: GetTransitionCost(previous, candidate))
+        remaining.remove(trial)
+        ordered.append(trial)
+        previous = trial
+
+    # Splits the order into charges, filling each from the next few trials.
+    charges = []
+    while (ordered):
+        charge = [ordered.pop(0)]
+        available = budget - drains[charge[0]]
+
+        i = 0
+        while (i < len(ordered) and i <= lookahead):
+            if (drains[ordered[i]] <= available):
+                available -= drains[ordered[i]]
+                charge.append(ordered.pop(i))
+            else:
+                i += 1
+
+        charges.append(charge)
+
+    return charges
+
+def GetPlanTransitionCost(charges: list[list[Trial]]) -> float:
+    """Gets how much the drones have to move over a whole plan.
+
+    Parameters:
+        charges: list[list[Trial]]
+            The plan, as given by PlanExperiment.
+
+    Returns:
+        float:
+            The sum of GetTransitionCost between every pair of consecutive trials,
+            including from the last trial of a charge to the first of the next.
+    """
+
+    cost = 0.0
+    previous = None
+    for charge in charges:
+        for trial in charge:
+            cost += GetTransitionCost(previous, trial)
+            previous = trial
+
+    return cost
+
+def LoadProgress(fileName: str) -> set[str]:
+    """Loads the trials already finished.
+
+    Parameters:
+        fileName: str
+            The .json progress file.
+
+    Returns:
+        set[str]:
+            The keys of the finished trials, see Trial.GetKey. Empty if the file doesn't exist.
+    """
+
+    if (not os.path.exists(fileName)):
+        return set()
+
+    file = open(fileName, "r")
+    progress = json.load(file)
+    file.close()
+
+    return set(progress["completed"])
+
+def SaveProgress(fileName: str, completed: set[str]) -> None:
+    """Saves the trials already finished.
+
+    The progress is written to a temporary file first and then moved
+    into place, so an interruption never leaves it half written.
+
+    Parameters:
+        fileName: str
+            The .json progress file.
+        completed: set[str]
+            The keys of the finished trials, see Trial.GetKey.
+    """
+
+    with AtomicWrite(fileName) as file:
+        json.dump({"completed": sorted(completed)}, file, indent=4)
+
+def RunExperiment(trials: list[Trial], table: dict, progressFile: str, runTrial, swapBattery, chargedVoltage: float=CHARGED_VOLTAGE,
+                  reserveVoltage: float=MissionPlanner.RESERVE_VOLTAGE, lookahead: int=LOOKAHEAD) -> None:
+    """Runs every unfinished trial, recording each one as it finishes.
+
+    Parameters:
+        trials: list[Trial]
+            Every trial of the experiment.
+        table: dict
+            The drain table, as given by MissionPlanner.BuildDrainTable.
+        progressFile: str
+            The .json file recording the finished trials.
+        runTrial:
+            Called with each Trial to fly it, e.g. FlyTrial.
+        swapBattery:
+            Called with the index of the charge and its trials before each charge
+            is started, including the first, once a charged battery has been fitted.
+        chargedVoltage: float
+            The voltage of a freshly charged battery.
+        reserveVoltage: float
+            The voltage the drones must still have when they land.
+        lookahead: int
+            How many trials past the next one may be brought forward to fill a charge.
+    """
+
+    completed = LoadProgress(progressFile)
+    remaining = [trial for trial in trials if trial.GetKey() not in completed]
+    if (len(remaining) < len(trials)):
+        print(f"Resuming with {len(remaining)} of {len(trials)} trials left.")
+
+    charges = PlanExperiment(remaining, table, chargedVoltage, reserveVoltage, lookahead)
+    for i, charge in enumerate(charges):
+        swapBattery(i, charge)
+
+        for trial in charge:
+            runTrial(trial)
+
+            completed.add(trial.GetKey())
+            SaveProgress(progressFile, completed)
+
+def FlyTrial(scfs: list, logFolder: str, trial: Trial) -> None:
+    """Flies one trial with the leading and trailing drones, a thread each.
+
+    Parameters:
+        scfs: list[SyncCrazyflie]
+            The leading drone and then the trailing drone, with their links open.
+        logFolder: str
+            The folder to save the logs to.
+        trial: Trial
+            The trial to fly.
+    """
+
+    # Imported here since flight needs cflib, which planning doesn't.
+    from flight import RunOneTrial
+
+    takeOffTime = time.time() + START_DELAY
+    movementTime = takeOffTime + SETUP_TIME
+    distance = GetTrialDistance(trial)
+
+    threads = []
+    # Writes the vertical separation and position to both headers, since neither can be
+    # worked out from the trailing drone's height, or from a leading drone's height of 0.
+    for scf, initialX, extraHeight, leading in ((scfs[0], LEADING_X, trial.verticalSeparation, True), (scfs[1], TRAILING_X, 0.0, False)):
+        thread = threading.Thread(target=RunOneTrial, args=(scf, initialX, logFolder, distance, trial.velocity, trial.horizontalSeparation,
+                                                            extraHeight, takeOffTime, movementTime, trial.repetition,
+                                                            trial.verticalSeparation, leading))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+def _FormatPlan(charges: list[list[Trial]], table: dict) -> str:
+    """Formats a plan as a list of charges.
+
+    Parameters:
+        charges: list[list[Trial]]
+            The plan, as given by PlanExperiment.
+        table: dict
+            The drain table the plan was made with.
+
+    Returns:
+        str:
+            A line per trial, grouped by charge, after the number of charges
+            and the transition cost of the whole plan.
+    """
+
+    lines = [f"{len(charges)} charges, transition cost {GetPlanTransitionCost(charges):.1f}"]
+    for i, charge in enumerate(charges):
+        used = sum(EstimateTrialDrain(table, trial) for trial in charge)
+        cost = GetPlanTransitionCost([charge])
+        lines.append(f"Charge {i + 1}: {len(charge)} trials, {used:.3f} V, transition cost {cost:.1f}")
+        for trial in charge:
+            lines.append(f"    velocity={trial.velocity}, horizontal={trial.horizontalSeparation}, "
+                         f"vertical={trial.verticalSeparation}, repetition={trial.repetition}")
+
+    return "\n".join(lines)
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plans and runs the whole grid of trials.")
+    parser.add_argument("--velocities", type=float, nargs="+", default=list(DEFAULT_VELOCITIES), help="The velocities in m/s.")
+    parser.add_argument("--horizontal", type=float, nargs="+", default=list(DEFAULT_HORIZONTAL_SEPARATIONS), help="The horizontal separations in m.")
+    parser.add_argument("--vertical", type=float, nargs="+", default=list(DEFAULT_VERTICAL_SEPARATIONS), help="The vertical separations in m.")
+    parser.add_argument("--repetitions", type=int, default=DEFAULT_REPETITIONS, help="The number of times to repeat each configuration.")
+    parser.add_argument("--drain-table", help="A drain table saved by MissionPlanner.SaveDrainTable. Built from the logs by default.")
+    parser.add_argument("--charged-voltage", type=float, default=CHARGED_VOLTAGE, help="The voltage of a freshly charged battery.")
+    parser.add_argument("--lookahead", type=int, default=LOOKAHEAD,
+                        help="How many trials past the next one may be brought forward to fill a charge. Higher needs fewer charges but moves the drones more.")
+    parser.add_argument("--progress", default="experiment.json", help="The file recording the finished trials.")
+    parser.add_argument("--log-folder", default=MissionPlanner.LOG_FOLDER, help="The folder to save the logs to.")
+    parser.add_argument("--run", action="store_true", help="Flies the trials instead of only printing the plan.")
+    arguments = parser.parse_args()
+
+    trials = GetTrials(arguments.velocities, arguments.horizontal, arguments.vertical, arguments.repetitions)
+    table = MissionPlanner.LoadDrainTable(arguments.drain_table) if arguments.drain_table else MissionPlanner.BuildDrainTable()
+
+    for (velocity, verticalSeparation), flags in sorted(GetEstimatedConfigurations(trials, table).items()):
+        print(f"WARNING: the drain at velocity={velocity}, vertical={verticalSeparation} comes from {', '.join(sorted(flags))} cells, "
+              f"so its charges may run short.")
+
+    if (not arguments.run):
+        completed = LoadProgress(arguments.progress)
+        remaining = [trial for trial in trials if trial.GetKey() not in completed]
+        print(_FormatPlan(PlanExperiment(remaining, table, arguments.charged_voltage, lookahead=arguments.lookahead), table))
+    else:
+        # Imported here since connecting to the drones needs cflib.
+        import cflib.crtp
+        from cflib.crazyflie import Crazyflie
+        from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+        from cflib.utils import reset_estimator
+        from main import URIS
+
+        cflib.crtp.init_drivers()
+        scfs = [SyncCrazyflie(uri, cf=Crazyflie(rw_cache="./cache")) for uri in URIS]
+
+        # The drones lose power while their batteries are swapped, so they are reconnected after each swap.
+        def SwapBattery(index: int, charge: list[Trial]) -> None:
+            for scf in scfs:
+                if (scf.is_link_open()):
+                    scf.close_link()
+
+            input(f"Fit charged batteries for charge {index + 1} ({len(charge)} trials), then press enter...")
+            for scf in scfs:
+                scf.open_link()
+                reset_estimator.reset_estimator(scf)
+
+        try:
+            RunExperiment(trials, table, arguments.progress, lambda trial: FlyTrial(scfs, arguments.log_folder, trial),
+                          SwapBattery, arguments.charged_voltage, lookahead=arguments.lookahead)
+        finally:
+            for scf in scfs:
+                if (scf.is_link_open()):
+                    scf.close_link()
@@ -0,0 +1,158 @@
+import numpy as np
+from typing import Tuple
+
+import LoopGeometry
+from ParseData import LoadFolderArrays, MIN_VOLTAGE, MAX_VOLTAGE
+from SlopeEstimators import GroupedLinearRegression
+
+"""Splits the trial logs into the phases of flight.
+
+Fitting one trendline over a whole log mixes the battery usage of every
+phase of the flight, so these functions label each sample with the phase
+it was recorded in and fit the battery usage of each phase separately.
+Every trial in a folder is processed in a single vectorised pass.
+
+Methods:
+    SegmentPhases:
+        Labels every sample with the phase of flight it was recorded in.
+    ExtractPhaseUsageFromFolder:
+        Gets the battery usage rate and duration of each phase of every trial.
+"""
+
+# The phases of flight, indexed by their label.
+PHASES = ("takeoff", "hover", "accelerate", "cruise", "corner", "landing")
+TAKEOFF = 0
+HOVER = 1
+ACCELERATE = 2
+CRUISE = 3
+CORNER = 4
+LANDING = 5
+
+# Default thresholds used to determine the phases.
+HOVER_SPEED = 0.1 # Horizontal speed in m/s below which the drone is hovering.
+VERTICAL_SPEED = 0.15 # Vertical speed in m/s above which the drone is taking off or landing.
+HEIGHT_MARGIN = 0.1 # Distance in m below the cruising height where the drone can be taking off or landing.
+ACCELERATION = 0.5 # Horizontal acceleration in m/s^2 above which the drone is accelerating.
+CORNER_RADIUS = 0.25 # Distance in m from a corner within which the drone is turning the corner.
+
+def SegmentPhases(data: dict[str, np.ndarray], corners: list[tuple[float, float]]=None, hoverSpeed: float=HOVER_SPEED,
+                  verticalSpeed: float=VERTICAL_SPEED, heightMargin: float=HEIGHT_MARGIN, acceleration: float=ACCELERATION,
+                  cornerRadius: float=CORNER_RADIUS) -> np.ndarray:
+    """Labels every sample with the phase of flight it was recorded in.
+
+    When a sample meets the conditions for multiple phases, takeoff and landing
+    take priority, followed by corner, hover, accelerate and finally cruise.
+
+    Parameters:
+        data: dict[str, np.ndarray]
+            The concatenated logs, as given by ParseData.LoadFolderArrays.
+        corners: list[tuple[float, float]]
+            The corners of the path that was flown. Uses the corners of
+            CommanderFlight.Loop by default.
+        hoverSpeed: float
+            The horizontal speed in m/s below which the drone is hovering.
+        verticalSpeed: float
+            The vertical speed in m/s above which the drone is taking off or landing.
+        heightMargin: float
+            The distance in m below the highest point of the trial within which
+            the drone cannot be taking off or landing.
+        acceleration: float
+            The horizontal acceleration in m/s^2 above which the drone is accelerating.
+        cornerRadius: float
+            The distance in m from a corner within which the drone is turning the corner.
+
+    Returns:
+        np.ndarray:
+            The index into PHASES of the phase of each sample.
+    """
+
+    if (corners is None):
+        corners = LoopGeometry.GetCorners()
+
+    trial = data["trial"]
+    speed = np.hypot(data["vx"], data["vy"])
+
+    # Calculates the change in horizontal speed since the previous sample,
+    # ignoring the first sample of each trial.
+    dt = np.diff(data["time"], prepend=0.0)
+    dSpeed = np.diff(speed, prepend=0.0)
+    sameTrial = np.concatenate(([False], trial[1:] == trial[:-1]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accel = np.where(sameTrial & (dt > 0), dSpeed / dt, 0.0)
+
+    # Gets the highest point of each trial.
+    maxHeights = np.full(trial.max() + 1, -np.inf)
+    np.maximum.at(maxHeights, trial, data["z"])
+    belowCruise = data["z"] < maxHeights[trial] - heightMargin
+
+    # Gets the distance from each sample to its nearest corner.
+    cornerArray = np.array(corners, dtype=float)
+    cornerDistances = np.hypot(data["x"][:, None] - cornerArray[:, 0], data["y"][:, None] - cornerArray[:, 1])
+    nearCorner = cornerDistances.min(axis=1) < cornerRadius
+
+    # Applies the labels from lowest to highest priority.
+    labels = np.full(len(trial), CRUISE)
+    labels[np.abs(accel) > acceleration] = ACCELERATE
+    labels[speed < hoverSpeed] = HOVER
+    labels[nearCorner] = CORNER
+    labels[belowCruise & (data["vz"] > verticalSpeed)] = TAKEOFF
+    labels[belowCruise & (data["vz"] < -verticalSpeed)] = LANDING
+
+    return labels
+
+def ExtractPhaseUsageFromFolder(folder: str, percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE,
+                                corners: list[tuple[float, float]]=None) -> dict[str, dict[str, Tuple[float, float]]]:
+    """Gets the battery usage rate and duration of each phase of every trial in a folder.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+        percentage: bool
+            Determines whether to return the rates in V/s or %/s.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+        corners: list[tuple[float, float]]
+            The corners of the path that was flown. Uses the corners of
+            CommanderFlight.Loop by default.
+
+    Returns:
+        dict[str, dict[str, Tuple[float, float]]]:
+            A dictionary where
+                the keys are the log files and
+
+                the values are dictionaries mapping each phase that occurred
+                in that trial to a tuple containing the battery usage rate in
+                V/s or %/s (NaN if the phase was too short to fit) and the
+                duration of the phase in s.
+    """
+
+    data, files = LoadFolderArrays(folder)
+    labels = SegmentPhases(data, corners)
+
+    # Gives every (trial, phase) pair its own group.
+    groups = data["trial"] * len(PHASES) + labels
+    numGroups = len(files) * len(PHASES)
+
+    # Fits the battery usage of every group at once, weighting each sample by the period it was logged at.
+    rates, intercepts = GroupedLinearRegression(groups, data["time"], data["batteryV"], numGroups, data["period"])
+    if (percentage):
+        rates = rates * 100 / (maxVoltage - minVoltage)
+
+    # Attributes the time until the next sample in the same trial to each sample.
+    dt = np.diff(data["time"], append=0.0)
+    dt[np.diff(data["trial"], append=-1) != 0] = 0.0
+    durations = np.bincount(groups, dt, minlength=numGroups)
+    counts = np.bincount(groups, minlength=numGroups)
+
+    # Converts the flat arrays back into a dictionary.
+    output = {}
+    for trial, fileName in enumerate(files):
+        output[fileName] = {}
+        for phase in range(len(PHASES)):
+            group = trial * len(PHASES) + phase
+            if (counts[group] > 0):
+                output[fileName][PHASES[phase]] = (float(rates[group]), float(durations[group]))
+
+    return output
@@ -0,0 +1,283 @@
+import difflib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from AtomicWrite import AtomicWrite
+
+"""Applies the same change to the headers of many log files at once.
+
+Replaces ParseData.ReplaceLineInFile, which had to be called once per file.
+A migration is described by a patch, which maps each header key to its new
+value, e.g. to fix the horizontal separation of a campaign:
+    MigrateHeaders(ListLogFiles(folder), {"horizontalSeparation": "1.0"}, where={"horizontalSeparation": "0.75"})
+
+Only the header of each log is parsed. The data rows are copied across as raw
+bytes to a temporary file, which then replaces the log with an atomic
+rename, so a log is never left half written, even if the migration is interrupted.
+
+Methods:
+    ReadHeader:
+        Reads the header region of a log file.
+    PatchHeader:
+        Applies a patch to the lines of a header.
+    MigrateLogFile:
+        Applies a patch to the header of one log file.
+    MigrateHeaders:
+        Applies a patch to the headers of many log files in parallel.
+    FormatDiff:
+        Joins the diffs of a migration into a single summary.
+"""
+
+# The line which surrounds the header. Matches LogHeader.HEADER_SEPARATOR.
+SEPARATOR = b"=========================================="
+
+def ReadHeader(file) -> Tuple[bytes, list[bytes]]:
+    """Reads the header region of a log file.
+
+    Leaves the file positioned at the start of the data rows.
+
+    Parameters:
+        file:
+            The log file, opened in binary mode.
+
+    Returns:
+        Tuple[bytes, list[bytes]]:
+            The column labels line, and the lines between the two separators,
+            or None if the log has no header (as made by logs.CreateSimpleLogFile before schema 2).
+    """
+
+    columns = file.readline()
+    start = file.tell()
+
+    # Logs without an opening separator have no header.
+    if (not file.readline().startswith(b"=")):
+        file.seek(start)
+        return columns, None
+
+    lines = []
+    while (line := file.readline()):
+        if (line.startswith(b"=")):
+            return columns, lines
+        lines.append(line)
+
+    raise ValueError("Header has no closing separator")
+
+def PatchHeader(lines: list[bytes], patch: dict[str, str], newline: bytes=b"\n") -> Tuple[list[bytes], list[Tuple[str, str, str]]]:
+    """Applies a patch to the lines of a header.
+
+    Keys that are already in the header keep their position, and new keys
+    are added to the end of the header.
+
+    Parameters:
+        lines: list[bytes]
+            The lines of the header, as given by ReadHeader.
+        patch: dict[str, str]
+            Maps each key to its new value, or to None to remove the key.
+        newline: bytes
+            The line ending to use for new lines.
+
+    Returns:
+        Tuple[list[bytes], list[Tuple[str, str, str]]]:
+            The patched lines, and the (key, old value, new value) of every
+            change, where a missing value is None.
+    """
+
+    output = []
+    changes = []
+    remaining = dict(patch)
+
+    for line in lines:
+        key, colon, value = line.decode("utf-8").partition(":")
+        key = key.strip()
+        if (not colon or key not in remaining):
+            output.append(line)
+            continue
+
+        oldValue = value.strip()
+        newValue = remaining.pop(key)
+        if (newValue is None):
+            changes.append((key, oldValue, None))
+            continue
+
+        newValue = str(newValue)
+        if (newValue != oldValue):
+            changes.append((key, oldValue, newValue))
+            lineEnding = line[len(line.rstrip(b"\r\n")):] or newline
+            line = f"{key}: {newValue}".encode("utf-8") + lineEnding
+        output.append(line)
+
+    # Adds the keys which weren't in the header.
+    for key, newValue in remaining.items():
+        if (newValue is not None):
+            changes.append((key, None, str(newValue)))
+            output.append(f"{key}: {newValue}".encode("utf-8") + newline)
+
+    return output, changes
+
+def _Matches(lines: list[bytes], where: dict[str, str]) -> bool:
+    """Checks whether a header has every key and value in a condition.
+
+    Parameters:
+        lines: list[bytes]
+            The lines of the header.
+        where: dict[str, str]
+            The value that each key must have.
+
+    Returns:
+        bool:
+            Whether the header matches.
+    """
+
+    values = {}
+    for line in lines:
+        key, colon, value = line.decode("utf-8").partition(":")
+        if (colon):
+            values[key.strip()] = value.strip()
+
+    return all(values.get(key) == str(value) for key, value in where.items())
+
+def MigrateLogFile(fileName: str, patch: dict[str, str], where: dict[str, str]=None, dryRun: bool=False) -> Tuple[list[Tuple[str, str, str]], str]:
+    """Applies a patch to the header of one log file.
+
+    Parameters:
+        fileName: str
+            The log file to migrate. Must be an uncompressed .csv file.
+        patch: dict[str, str]
+            Maps each key to its new value, or to None to remove the key.
+        where: dict[str, str]
+            If given, only logs whose header has these values are migrated.
+        dryRun: bool
+            Whether to only work out the changes, without writing them.
+
+    Returns:
+        Tuple[list[Tuple[str, str, str]], str]:
+            The (key, old value, new value) of every change, and a unified
+            diff of the header. Both are empty if nothing changed.
+    """
+
+    source = open(fileName, "rb")
+    try:
+        columns, lines = ReadHeader(source)
+        dataStart = source.tell()
+        hasHeader = lines is not None
+        if (not hasHeader):
+            lines = []
+
+        if (where is not None and not _Matches(lines, where)):
+            return [], ""
+
+        newline = b"\r\n" if columns.endswith(b"\r\n") else b"\n"
+        newLines, changes = PatchHeader(lines, patch, newline)
+        if (not changes):
+            return [], ""
+
+        # Builds the new header region, adding separators to logs without a header.
+        oldRegion = [columns] + ([SEPARATOR + newline] + lines + [SEPARATOR + newline] if hasHeader else [])
+        newRegion = [columns, SEPARATOR + newline] + newLines + [SEPARATOR + newline]
+        diff = "".join(difflib.unified_diff([line.decode("utf-8") for line in oldRegion], [line.decode("utf-8") for line in newRegion],
+                                            fileName, fileName, n=0))
+        if (dryRun):
+            return changes, diff
+
+        # Writes the new header and then streams the data rows across unchanged.
+        with AtomicWrite(fileName, "wb", sync=True) as output:
+            for line in newRegion:
+                output.write(line)
+            headerSize = output.tell()
+
+            source.seek(dataStart)
+            shutil.copyfileobj(source, output)
+            dataSize = output.tell() - headerSize
+
+            # Only replaces the log if every data byte was copied.
+            if (dataSize != os.path.getsize(fileName) - dataStart):
+                raise ValueError(f"Copied {dataSize} bytes of data from {fileName}, expected {os.path.getsize(fileName) - dataStart}")
+
+            shutil.copymode(fileName, output.name)
+
+            # Closes the log before it is replaced, since Windows can't replace an open file.
+            source.close()
+    finally:
+        source.close()
+
+    return changes, diff
+
+def MigrateHeaders(files: list[str], patch: dict[str, str], where: dict[str, str]=None, dryRun: bool=False,
+                   workers: int=8) -> Tuple[dict[str, list[Tuple[str, str, str]]], dict[str, str], dict[str, str]]:
+    """Applies a patch to the headers of many log files in parallel.
+
+    A log which fails to migrate is left untouched and doesn't stop the others.
+
+    Parameters:
+        files: list[str]
+            The log files to migrate, e.g. from ParseData.ListLogFiles.
+        patch: dict[str, str]
+            Maps each key to its new value, or to None to remove the key.
+        where: dict[str, str]
+            If given, only logs whose header has these values are migrated.
+        dryRun: bool
+            Whether to only work out the changes, without writing them.
+        workers: int
+            The number of logs to migrate at once.
+
+    Returns:
+        Tuple[dict[str, list[Tuple[str, str, str]]], dict[str, str], dict[str, str]]:
+            A tuple containing the changes made to each log that changed, the
+            unified diff of each log that changed, and the error of each log that failed.
+    """
+
+    def Migrate(fileName: str):
+        try:
+            return MigrateLogFile(fileName, patch, where, dryRun), None
+        except (OSError, ValueError, UnicodeDecodeError) as error:
+            return ([], ""), str(error)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(Migrate, files))
+
+    changes = {}
+    diffs = {}
+    errors = {}
+    for fileName, ((fileChanges, diff), error) in zip(files, results):
+        if (error is not None):
+            errors[fileName] = error
+        elif (fileChanges):
+            changes[fileName] = fileChanges
+            diffs[fileName] = diff
+
+    return changes, diffs, errors
+
+def FormatDiff(changes: dict[str, list[Tuple[str, str, str]]], diffs: dict[str, str], errors: dict[str, str]) -> str:
+    """Joins the diffs of a migration into a single summary.
+
+    Parameters:
+        changes: dict[str, list[Tuple[str, str, str]]]
+            The changes made to each log, as given by MigrateHeaders.
+        diffs: dict[str, str]
+            The unified diff of each log, as given by MigrateHeaders.
+        errors: dict[str, str]
+            The error of each log that failed, as given by MigrateHeaders.
+
+    Returns:
+        str:
+            A count of the changes to each key, followed by every diff and error.
+    """
+
+    # Counts how many logs each (key, old value, new value) change applies to.
+    counts = {}
+    for fileChanges in changes.values():
+        for change in fileChanges:
+            counts[change] = counts.get(change, 0) + 1
+
+    lines = [f"{len(changes)} logs changed, {len(errors)} failed"]
+    for (key, oldValue, newValue), count in sorted(counts.items(), key=lambda item: str(item[0])):
+        lines.append(f"    {key}: {oldValue} -> {newValue} in {count} logs")
+
+    for fileName in sorted(diffs.keys()):
+        lines.append(diffs[fileName].rstrip("\n"))
+    for fileName in sorted(errors.keys()):
+        lines.append(f"ERROR {fileName}: {errors[fileName]}")
+
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+import numpy as np
+from typing import Tuple
+
+import LoopGeometry
+from ParseData import LoadFolderArrays
+from SlopeEstimators import GroupedLinearRegression
+
+"""Splits CommanderFlight.Loop trials into individual laps.
+
+Each sample is projected onto the square path to find how far around the
+path the drone is, and a new lap begins every time the drone completes
+another full perimeter. Every lap of every trial in a folder is processed
+in a single vectorised pass.
+
+Methods:
+    ProjectOntoPath:
+        Projects positions onto the closed path through a set of corners.
+    DetectLaps:
+        Labels every sample with the lap it was recorded in.
+    ExtractLapsFromFolder:
+        Gets the time, path length, cross-track error and battery drop of every lap.
+"""
+
+def ProjectOntoPath(x: np.ndarray, y: np.ndarray, corners: list[tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Projects positions onto the closed path through a set of corners.
+
+    Parameters:
+        x: np.ndarray
+            The x-coordinates of the positions.
+        y: np.ndarray
+            The y-coordinates of the positions.
+        corners: list[tuple[float, float]]
+            The corners of the path, in the order they are flown.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            A tuple where
+                the first entry is the distance along the path from the first corner
+                to the closest point on the path, and
+                the second entry is the distance from each position to the path
+                (the cross-track error).
+    """
+
+    # Gets the start point and direction of each edge of the path.
+    starts = np.array(corners, dtype=float)
+    directions = np.roll(starts, -1, axis=0) - starts
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    edgeOffsets = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+
+    # Finds the closest point on every edge to every position.
+    relX = x[:, None] - starts[:, 0]
+    relY = y[:, None] - starts[:, 1]
+    fractions = np.clip((relX * directions[:, 0] + relY * directions[:, 1]) / lengths**2, 0.0, 1.0)
+    distances = np.hypot(relX - fractions * directions[:, 0], relY - fractions * directions[:, 1])
+
+    # Keeps the closest edge for every position.
+    closest = np.argmin(distances, axis=1)
+    rows = np.arange(len(x))
+    arcLengths = edgeOffsets[closest] + fractions[rows, closest] * lengths[closest]
+
+    return arcLengths, distances[rows, closest]
+
+def DetectLaps(data: dict[str, np.ndarray], corners: list[tuple[float, float]]=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Labels every sample with the lap it was recorded in.
+
+    A trial's first lap starts wherever the drone is at its first sample,
+    and each following lap starts once the drone has travelled one more
+    full perimeter around the path.
+
+    Parameters:
+        data: dict[str, np.ndarray]
+            The concatenated logs, as given by ParseData.LoadFolderArrays.
+        corners: list[tuple[float, float]]
+            The corners of the path that was flown. Uses the corners of
+            CommanderFlight.Loop by default.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            A tuple where
+                the first entry is the lap (starting at 0 for each trial) of each sample, and
+                the second entry is the cross-track error of each sample in m.
+    """
+
+    if (corners is None):
+        corners = LoopGeometry.GetCorners()
+    perimeter = LoopGeometry.GetLapLength(corners)
+
+    trial = data["trial"]
+    arcLengths, crossTrack = ProjectOntoPath(data["x"], data["y"], corners)
+
+    # Unwraps the distance along the path so that passing the first corner
+    # doesn't make it jump back to 0.
+    steps = np.diff(arcLengths, prepend=arcLengths[0])
+    steps[steps > perimeter / 2] -= perimeter
+    steps[steps < -perimeter / 2] += perimeter
+    newTrial = np.concatenate(([True], trial[1:] != trial[:-1]))
+    steps[newTrial] = 0.0
+
+    # Gets the total distance travelled along the path since the start of each trial.
+    progress = np.cumsum(steps)
+    trialStarts = np.flatnonzero(newTrial)
+    progress -= np.repeat(progress[trialStarts], np.diff(np.append(trialStarts, len(trial))))
+
+    # Stops noise around a lap boundary from moving a sample back into the previous lap
+    # by taking the running maximum of the lap within each trial.
+    laps = np.maximum(np.floor(progress / perimeter), 0).astype(int)
+    offsets = trial * (laps.max() + 1)
+    laps = np.maximum.accumulate(laps + offsets) - offsets
+
+    return laps, crossTrack
+
+def ExtractLapsFromFolder(folder: str, corners: list[tuple[float, float]]=None) -> dict[str, np.ndarray]:
+    """Gets the time, path length, cross-track error and battery drop of every lap in a folder.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+        corners: list[tuple[float, float]]
+            The corners of the path that was flown. Uses the corners of
+            CommanderFlight.Loop by default.
+
+    Returns:
+        dict[str, np.ndarray]:
+            A dictionary with one entry per lap in each array, where
+                "file" is the log file the lap came from,
+                "lap" is the index of the lap within that trial,
+                "time" is the duration of the lap in s,
+                "pathLength" is the distance flown during the lap in m,
+                "meanCrossTrack" and "maxCrossTrack" are the mean and maximum
+                distances from the path in m,
+                "batteryDrop" is the fitted drop in battery voltage over the lap in V, and
+                "complete" is whether the lap covered the whole path.
+    """
+
+    if (corners is None):
+        corners = LoopGeometry.GetCorners()
+
+    data, files = LoadFolderArrays(folder)
+    trial = data["trial"]
+    laps, crossTrack = DetectLaps(data, corners)
+
+    # Since the laps only ever increase within a trial, every lap is
+    # a contiguous run of samples.
+    newTrial = np.concatenate(([True], trial[1:] != trial[:-1]))
+    newLap = newTrial | np.concatenate(([False], laps[1:] != laps[:-1]))
+    lapStarts = np.flatnonzero(newLap)
+    lapEnds = np.append(lapStarts[1:], len(trial)) - 1
+    groups = np.cumsum(newLap) - 1
+    numLaps = len(lapStarts)
+
+    # Attributes the distance since the previous sample in the same trial to each sample.
+    stepLengths = np.sqrt(np.diff(data["x"], prepend=0.0)**2 + np.diff(data["y"], prepend=0.0)**2 + np.diff(data["z"], prepend=0.0)**2)
+    stepLengths[newTrial] = 0.0
+
+    # A lap is complete if the next sample in the same trial starts a new lap.
+    complete = np.append(trial[lapStarts[1:]] == trial[lapStarts[:-1]], False)
+
+    # Complete laps end when the next lap starts, while the last lap of each trial
+    # ends at the trial's last sample.
+    nextSamples = np.where(complete, lapEnds + 1, lapEnds)
+    durations = data["time"][nextSamples] - data["time"][lapStarts]
+
+    # Fits the battery usage of every lap at once, weighting each sample by the period it was logged at.
+    slopes, intercepts = GroupedLinearRegression(groups, data["time"], data["batteryV"], numLaps, data["period"])
+
+    counts = np.bincount(groups, minlength=numLaps)
+    maxCrossTrack = np.zeros(numLaps)
+    np.maximum.at(maxCrossTrack, groups, crossTrack)
+
+    return {
+        "file": np.array(files)[trial[lapStarts]],
+        "lap": laps[lapStarts],
+        "time": durations,
+        "pathLength": np.bincount(groups, stepLengths, minlength=numLaps),
+        "meanCrossTrack": np.bincount(groups, crossTrack, minlength=numLaps) / counts,
+        "maxCrossTrack": maxCrossTrack,
+        "batteryDrop": -slopes * durations,
+        "complete": complete,
+    }
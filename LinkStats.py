@@ -0,0 +1,231 @@
+import json
+import math
+import threading
+
+from AtomicWrite import AtomicWrite
+
+"""Measures the quality of the telemetry link to a Crazyflie.
+
+Methods:
+    GetTrailerFile:
+        Gets the file that a log's link summary is written to.
+"""
+
+# The number of bins in the gap histogram. The last bin counts every
+# gap of at least GAP_BINS - 1 missing packets.
+GAP_BINS = 6
+
+def GetTrailerFile(logFile: str) -> str:
+    """Gets the file that a log's link summary is written to.
+
+    The summary is kept beside the log rather than appended to it, so that
+    the log stays a plain .csv file.
+
+    Parameters:
+        logFile: str
+            The path to the log file.
+
+    Returns:
+        str:
+            The path to the summary file.
+    """
+
+    if (logFile.endswith(".csv")):
+        logFile = logFile[:-4]
+
+    return logFile + ".link.json"
+
+class LinkStats:
+    """Keeps running statistics about the packets received from a Crazyflie.
+
+    Every update is O(1) and allocates nothing, so it can be
+    called from the log callback for every packet.
+
+    Attributes:
+        uri: str
+            The URI of the Crazyflie.
+        period: float
+            The period in ms that packets are currently requested at.
+        received: int
+            The number of packets received.
+        gapHistogram: list[int]
+            The number of times that 0, 1, 2, ... packets went missing between two received packets.
+
+    Methods:
+        SetPeriod:
+            Changes the period that packets are expected at.
+        RecordPacket:
+            Records the arrival of a packet.
+        RecordCallbackTime:
+            Records how long the log callback took to run.
+        GetExpectedPackets:
+            Gets the number of packets that should have arrived so far.
+        Snapshot:
+            Gets a copy of the current statistics.
+        WriteTrailer:
+            Writes the current statistics beside a log file.
+    """
+
+    def __init__(self, uri: str, period: float):
+        """Initialises a LinkStats object.
+
+        Parameters:
+            uri: str
+                The URI of the Crazyflie.
+            period: float
+                The period in ms that packets are requested at.
+        """
+
+        self.uri = uri
+        self.period = period
+        self.received = 0
+        self.gapHistogram = [0] * GAP_BINS
+
+        # The packets expected up to the start of the current period, counting
+        # the packet it started at, and the timestamp the current period started at.
+        self._expectedBefore = 0
+        self._periodStart = None
+        self._lastTimestamp = None
+
+        # Running mean and sum of squares of the inter-arrival jitter in ms.
+        self._lastArrival = None
+        self._jitterCount = 0
+        self._jitterMean = 0.0
+        self._jitterSquares = 0.0
+        self._maxJitter = 0.0
+
+        # Running mean and sum of squares of the callback time in ms.
+        self._callbackCount = 0
+        self._callbackMean = 0.0
+        self._callbackSquares = 0.0
+        self._maxCallback = 0.0
+
+        self._lock = threading.Lock()
+
+    def SetPeriod(self, period: float) -> None:
+        """Changes the period that packets are expected at.
+
+        The new period is counted from the last packet at the old period, so
+        packets lost while the period changes are still expected.
+
+        Parameters:
+            period: float
+                The new period in ms.
+        """
+
+        with self._lock:
+            # Closes off the packets expected at the old period.
+            if (self._periodStart is not None):
+                self._expectedBefore += int(round((self._lastTimestamp - self._periodStart) / self.period))
+                self._periodStart = self._lastTimestamp
+
+            # The next interval includes restarting the log block, so it isn't scored as jitter.
+            self._lastArrival = None
+
+            self.period = period
+
+    def RecordPacket(self, timestamp: float, arrivalTime: float) -> None:
+        """Records the arrival of a packet.
+
+        Parameters:
+            timestamp: float
+                The Crazyflie's timestamp of the packet in ms.
+            arrivalTime: float
+                The time in s that the packet arrived, from time.time().
+        """
+
+        with self._lock:
+            self.received += 1
+
+            if (self._periodStart is None):
+                self._periodStart = timestamp
+                self._expectedBefore = 1
+            else:
+                # Counts the packets missing since the previous one.
+                missing = max(int(round((timestamp - self._lastTimestamp) / self.period)) - 1, 0)
+                self.gapHistogram[min(missing, GAP_BINS - 1)] += 1
+
+            # Updates the jitter, which is how far the time between arrivals is from the period.
+            if (self._lastArrival is not None):
+                jitter = (arrivalTime - self._lastArrival) * 1000.0 - self.period
+                self._jitterCount += 1
+                delta = jitter - self._jitterMean
+                self._jitterMean += delta / self._jitterCount
+                self._jitterSquares += delta * (jitter - self._jitterMean)
+                self._maxJitter = max(self._maxJitter, abs(jitter))
+
+            self._lastTimestamp = timestamp
+            self._lastArrival = arrivalTime
+
+    def RecordCallbackTime(self, duration: float) -> None:
+        """Records how long the log callback took to run.
+
+        Parameters:
+            duration: float
+                The time in s that the callback took.
+        """
+
+        with self._lock:
+            duration *= 1000.0
+            self._callbackCount += 1
+            delta = duration - self._callbackMean
+            self._callbackMean += delta / self._callbackCount
+            self._callbackSquares += delta * (duration - self._callbackMean)
+            self._maxCallback = max(self._maxCallback, duration)
+
+    def GetExpectedPackets(self) -> int:
+        """Gets the number of packets that should have arrived so far.
+
+        Based on the Crazyflie's timestamps of the first and latest packets
+        at each period.
+
+        Returns:
+            int:
+                The expected number of packets.
+        """
+
+        expected = self._expectedBefore
+        if (self._periodStart is not None):
+            expected += int(round((self._lastTimestamp - self._periodStart) / self.period))
+
+        return expected
+
+    def Snapshot(self) -> dict:
+        """Gets a copy of the current statistics.
+
+        Returns:
+            dict:
+                The URI, period, expected and received packet counts, packet loss,
+                gap histogram, inter-arrival jitter in ms and callback time in ms.
+        """
+
+        with self._lock:
+            expected = self.GetExpectedPackets()
+            jitterStd = math.sqrt(self._jitterSquares / (self._jitterCount - 1)) if self._jitterCount > 1 else 0.0
+            callbackStd = math.sqrt(self._callbackSquares / (self._callbackCount - 1)) if self._callbackCount > 1 else 0.0
+
+            return {
+                "uri": self.uri,
+                "period": self.period,
+                "expected": expected,
+                "received": self.received,
+                "packetLoss": 1 - self.received / expected if expected > 0 else 0.0,
+                "gapHistogram": list(self.gapHistogram),
+                "jitterMean": self._jitterMean,
+                "jitterStd": jitterStd,
+                "jitterMax": self._maxJitter,
+                "callbackMean": self._callbackMean,
+                "callbackStd": callbackStd,
+                "callbackMax": self._maxCallback,
+            }
+
+    def WriteTrailer(self, logFile: str) -> None:
+        """Writes the current statistics beside a log file.
+
+        Parameters:
+            logFile: str
+                The path to the log file the statistics belong to.
+        """
+
+        with AtomicWrite(GetTrailerFile(logFile)) as file:
+            json.dump(self.Snapshot(), file, indent=4)
@@ -0,0 +1,315 @@
+import gzip
+import io
+import json
+import os
+import struct
+import zlib
+from typing import Tuple
+
+from AtomicWrite import AtomicWrite
+
+"""Stores log files compressed, either one .csv.gz per log or one bundle per campaign.
+
+A bundle (a file ending in ARCHIVE_SUFFIX) stores every log of a folder as its
+own gzip member, followed by an index of where each member starts, so any
+single trial can be read without decompressing the others. A log inside a
+bundle is named by its path inside the bundle, e.g.
+    ./350mAh_logs.logbundle/2025-05-10-0.csv
+and can be passed to the ParseData functions in place of a normal log file.
+
+Every read decompresses CHUNK_SIZE bytes at a time, so the memory used doesn't
+grow with the size of the log or the bundle.
+
+A bundle is laid out as
+    MAGIC
+    gzip member of the first log
+    gzip member of the second log
+    ...
+    the index as JSON, mapping each log to its [offset, compressed size, size]
+    the offset of the index as a little-endian 8 byte integer
+    MAGIC
+
+Methods:
+    CreateArchive:
+        Compresses log files into a single bundle.
+    CompressLogFile:
+        Compresses a single log file into a .csv.gz file.
+    IsArchive:
+        Checks whether a path is a bundle.
+    LoadArchiveIndex:
+        Loads the index of a bundle.
+    ListArchiveMembers:
+        Lists the logs in a bundle.
+    SplitArchivePath:
+        Splits the path of a log inside a bundle into the bundle and the log.
+    OpenLog:
+        Opens a plain, gzipped or bundled log file for reading as text.
+"""
+
+# The extension of bundle files.
+ARCHIVE_SUFFIX = ".logbundle"
+# The bytes at the start and end of every bundle.
+MAGIC = b"LOGBNDL1"
+# The number of compressed bytes read at a time.
+CHUNK_SIZE = 64 * 1024
+
+# Caches the index of each bundle, keyed by its path, modification time and size.
+_indexCache = {}
+
+def _CompressInto(fileName: str, output, level: int) -> Tuple[int, int]:
+    """Compresses a file as a gzip member and writes it to an open file.
+
+    Parameters:
+        fileName: str
+            The file to compress.
+        output:
+            The binary file to write the member to.
+        level: int
+            The compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        Tuple[int, int]:
+            The compressed size and the original size of the file in bytes.
+    """
+
+    # A wbits of 31 writes a gzip header and trailer, so each member is a valid gzip stream.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    compressedSize = 0
+    size = 0
+
+    file = open(fileName, "rb")
+    while (chunk := file.read(CHUNK_SIZE)):
+        size += len(chunk)
+        data = compressor.compress(chunk)
+        output.write(data)
+        compressedSize += len(data)
+    file.close()
+
+    data = compressor.flush()
+    output.write(data)
+    compressedSize += len(data)
+
+    return compressedSize, size
+
+def CreateArchive(files: list[str], archiveFile: str, level: int=6) -> dict[str, list[int]]:
+    """Compresses log files into a single bundle.
+
+    The bundle is written to a temporary file and then renamed, so an existing
+    bundle is never left half-written.
+
+    Parameters:
+        files: list[str]
+            The log files to compress, e.g. from ParseData.ListLogFiles.
+        archiveFile: str
+            The bundle to create. Should end in ARCHIVE_SUFFIX.
+        level: int
+            The compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        dict[str, list[int]]:
+            The index of the bundle, mapping the name of each log to its
+            [offset, compressed size, size] in bytes.
+    """
+
+    index = {}
+
+    with AtomicWrite(archiveFile, "wb") as output:
+        output.write(MAGIC)
+        offset = len(MAGIC)
+
+        for fileName in files:
+            name = os.path.basename(fileName)
+            if (name in index):
+                raise ValueError(f"Cannot bundle two logs named {name}")
+
+            compressedSize, size = _CompressInto(fileName, output, level)
+            index[name] = [offset, compressedSize, size]
+            offset += compressedSize
+
+        # Writes the index and where to find it at the end of the bundle.
+        output.write(json.dumps(index).encode("utf-8"))
+        output.write(struct.pack("<Q", offset))
+        output.write(MAGIC)
+
+    return index
+
+def CompressLogFile(fileName: str, level: int=6) -> str:
+    """Compresses a single log file into a .csv.gz file next to it.
+
+    Parameters:
+        fileName: str
+            The log file to compress.
+        level: int
+            The compression level from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        str:
+            The path to the compressed file.
+    """
+
+    with AtomicWrite(fileName + ".gz", "wb") as output:
+        _CompressInto(fileName, output, level)
+
+    return fileName + ".gz"
+
+def IsArchive(path: str) -> bool:
+    """Checks whether a path is a bundle.
+
+    Parameters:
+        path: str
+            The path to check.
+
+    Returns:
+        bool:
+            Whether the path is a bundle file.
+    """
+
+    return path.endswith(ARCHIVE_SUFFIX) and os.path.isfile(path)
+
+def LoadArchiveIndex(archiveFile: str) -> dict[str, list[int]]:
+    """Loads the index of a bundle.
+
+    Only the end of the bundle is read, and the index is cached until the
+    bundle changes.
+
+    Parameters:
+        archiveFile: str
+            The bundle to load the index of.
+
+    Returns:
+        dict[str, list[int]]:
+            The index of the bundle, mapping the name of each log to its
+            [offset, compressed size, size] in bytes.
+    """
+
+    stat = os.stat(archiveFile)
+    key = (archiveFile, stat.st_mtime_ns, stat.st_size)
+    if (key in _indexCache):
+        return _indexCache[key]
+
+    file = open(archiveFile, "rb")
+    if (file.read(len(MAGIC)) != MAGIC):
+        file.close()
+        raise ValueError(f"{archiveFile} is not a log bundle")
+
+    # Reads where the index starts from the footer.
+    footerSize = 8 + len(MAGIC)
+    file.seek(-footerSize, os.SEEK_END)
+    footer = file.read(footerSize)
+    if (footer[8:] != MAGIC):
+        file.close()
+        raise ValueError(f"{archiveFile} is truncated")
+    indexOffset = struct.unpack("<Q", footer[:8])[0]
+
+    file.seek(indexOffset)
+    index = json.loads(file.read(stat.st_size - footerSize - indexOffset).decode("utf-8"))
+    file.close()
+
+    _indexCache[key] = index
+    return index
+
+def ListArchiveMembers(archiveFile: str) -> list[str]:
+    """Lists the logs in a bundle.
+
+    Parameters:
+        archiveFile: str
+            The bundle to list.
+
+    Returns:
+        list[str]:
+            The sorted names of the logs in the bundle.
+    """
+
+    return sorted(LoadArchiveIndex(archiveFile).keys())
+
+def SplitArchivePath(fileName: str) -> Tuple[str, str]:
+    """Splits the path of a log inside a bundle into the bundle and the log.
+
+    Parameters:
+        fileName: str
+            The path to a log, which may be inside a bundle.
+
+    Returns:
+        Tuple[str, str]:
+            The bundle and the name of the log inside it,
+            or None and the original path if the log isn't in a bundle.
+    """
+
+    archiveFile, member = os.path.split(fileName)
+    if (IsArchive(archiveFile)):
+        return archiveFile, member
+
+    return None, fileName
+
+class _MemberReader(io.RawIOBase):
+    """Reads and decompresses one gzip member of a bundle, a chunk at a time.
+    """
+
+    def __init__(self, archiveFile: str, offset: int, compressedSize: int):
+        """Initialises a _MemberReader object.
+
+        Parameters:
+            archiveFile: str
+                The bundle containing the member.
+            offset: int
+                The offset in bytes of the member in the bundle.
+            compressedSize: int
+                The size in bytes of the member in the bundle.
+        """
+
+        super().__init__()
+        self._file = open(archiveFile, "rb")
+        self._file.seek(offset)
+        self._remaining = compressedSize
+        self._decompressor = zlib.decompressobj(31)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # Feeds compressed chunks in until some output is ready,
+        # never producing more output than fits in the buffer.
+        while (not self._decompressor.eof):
+            compressed = self._decompressor.unconsumed_tail
+            if (not compressed):
+                compressed = self._file.read(min(CHUNK_SIZE, self._remaining))
+                self._remaining -= len(compressed)
+                if (not compressed):
+                    raise ValueError("Log bundle member ended before its data did")
+
+            data = self._decompressor.decompress(compressed, len(buffer))
+            if (data):
+                buffer[:len(data)] = data
+                return len(data)
+
+        return 0
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+def OpenLog(fileName: str) -> io.TextIOBase:
+    """Opens a plain, gzipped or bundled log file for reading as text.
+
+    Parameters:
+        fileName: str
+            The path to a .csv file, a .csv.gz file, or a log inside a bundle.
+
+    Returns:
+        io.TextIOBase:
+            The open log, which decompresses as it is read.
+    """
+
+    archiveFile, member = SplitArchivePath(fileName)
+    if (archiveFile is not None):
+        index = LoadArchiveIndex(archiveFile)
+        if (member not in index):
+            raise FileNotFoundError(f"{member} is not in {archiveFile}")
+
+        offset, compressedSize, size = index[member]
+        return io.TextIOWrapper(io.BufferedReader(_MemberReader(archiveFile, offset, compressedSize), CHUNK_SIZE), encoding="utf-8")
+
+    if (fileName.endswith(".gz")):
+        return gzip.open(fileName, "rt", encoding="utf-8")
+
+    return open(fileName, "r")
@@ -0,0 +1,300 @@
+import heapq
+import json
+import threading
+from typing import Tuple
+
+from AtomicWrite import AtomicWrite
+from LinkStats import LinkStats, GetTrailerFile
+
+"""Splits the logged variables across several log blocks at different rates.
+
+A single LogConfig is limited to MAX_BLOCK_SIZE bytes of variables and one
+period, so the fast-changing state and the slow-changing battery are logged in
+separate blocks, and the packets of every block are merged back into a single
+stream of rows ordered by the Crazyflie's timestamps.
+
+A block is stored as a tuple of the form
+    (name, period in ms, ((variable, fetch type), ...))
+
+Methods:
+    GetBlockSize:
+        Gets the number of bytes that a block's variables take up in a packet.
+    ValidateBlocks:
+        Checks that the blocks can be logged by the Crazyflie.
+    GetPacketRate:
+        Gets the number of packets per second that the blocks will send.
+    CheckPacketBudget:
+        Checks that the blocks fit within the packet budget of a link.
+"""
+
+# The size in bytes of each type that a variable can be fetched as.
+TYPE_SIZES = {
+    "uint8_t": 1,
+    "uint16_t": 2,
+    "uint32_t": 4,
+    "int8_t": 1,
+    "int16_t": 2,
+    "int32_t": 4,
+    "FP16": 2,
+    "float": 4,
+}
+
+# The largest number of bytes of variables in one block. Matches cflib's LogConfig.MAX_LEN.
+MAX_BLOCK_SIZE = 26
+# The shortest period in ms that the Crazyflie can log a block at.
+MIN_PERIOD = 10
+# The number of log packets per second that one link can carry alongside the
+# setpoints sent by CommanderFlight without starting to drop packets.
+LINK_PACKET_BUDGET = 250
+
+# Logs the state at 20 ms and the battery at 500 ms.
+DEFAULT_BLOCKS = (
+    ("state", 20, (
+        ("stateEstimate.x", "float"),
+        ("stateEstimate.y", "float"),
+        ("stateEstimate.z", "float"),
+        ("stateEstimate.vx", "FP16"),
+        ("stateEstimate.vy", "FP16"),
+        ("stateEstimate.vz", "FP16"),
+    )),
+    ("battery", 500, (
+        ("pm.vbat", "float"),
+        ("pm.batteryLevel", "FP16"),
+    )),
+)
+
+def GetBlockSize(variables: tuple[Tuple[str, str]]) -> int:
+    """Gets the number of bytes that a block's variables take up in a packet.
+
+    Parameters:
+        variables: tuple[Tuple[str, str]]
+            The (variable, fetch type) pairs of the block.
+
+    Returns:
+        int:
+            The size of the variables in bytes.
+    """
+
+    return sum(TYPE_SIZES[fetchAs] for variable, fetchAs in variables)
+
+def ValidateBlocks(blocks: tuple) -> None:
+    """Checks that the blocks can be logged by the Crazyflie.
+
+    Parameters:
+        blocks: tuple
+            The blocks to log, of the form given in DEFAULT_BLOCKS.
+    """
+
+    names = set()
+    for name, period, variables in blocks:
+        if (name in names):
+            raise ValueError(f"Block '{name}' is defined more than once")
+        names.add(name)
+
+        if (period < MIN_PERIOD):
+            raise ValueError(f"Block '{name}' has a period of {period} ms, below the minimum of {MIN_PERIOD} ms")
+
+        size = GetBlockSize(variables)
+        if (size > MAX_BLOCK_SIZE):
+            raise ValueError(f"Block '{name}' needs {size} bytes, above the maximum of {MAX_BLOCK_SIZE} bytes")
+
+def GetPacketRate(blocks: tuple) -> float:
+    """Gets the number of packets per second that the blocks will send.
+
+    Parameters:
+        blocks: tuple
+            The blocks to log, of the form given in DEFAULT_BLOCKS.
+
+    Returns:
+        float:
+            The number of packets per second.
+    """
+
+    return sum(1000.0 / period for name, period, variables in blocks)
+
+def CheckPacketBudget(blocks: tuple, budget: float=LINK_PACKET_BUDGET) -> None:
+    """Checks that the blocks fit within the packet budget of a link.
+
+    Parameters:
+        blocks: tuple
+            The blocks to log, of the form given in DEFAULT_BLOCKS.
+        budget: float
+            The number of packets per second that the link can carry.
+    """
+
+    rate = GetPacketRate(blocks)
+    if (rate > budget):
+        raise ValueError(f"Blocks send {rate:.0f} packets/s, above the link's budget of {budget:.0f} packets/s")
+
+class BlockMerger:
+    """Merges the packets of several log blocks into one stream ordered by timestamp.
+
+    Packets from each block arrive in order, so a block's next packet can't be
+    earlier than its last timestamp plus its period. Packets are held back until
+    every block that has been heard from has passed their timestamp, and are
+    then released in order. The packets with the same timestamp are merged, and
+    a row is only made when a packet of the fastest block is released, so there
+    is one row per sample of the fastest block. The packets of the other blocks
+    only update the held values, so the battery columns are held between the
+    battery packets. Rows released before every variable has a value are dropped.
+
+    A packet which arrives after a later packet has already been released
+    only updates the held values.
+
+    Attributes:
+        periods: dict[str, float]
+            The period in ms of each block.
+        rowBlock: str
+            The name of the fastest block, whose packets each make a row.
+        values: dict[str, float]
+            The latest released value of every variable.
+        stats: dict[str, LinkStats]
+            The statistics of the packets received for each block.
+        latePackets: int
+            The number of packets which arrived after a later packet was released.
+        droppedRows: int
+            The number of rows which were dropped because a variable had no value yet.
+        budget: float
+            The number of packets per second that the link can carry.
+
+    Methods:
+        AddPacket:
+            Adds a packet from one of the blocks.
+        Flush:
+            Releases every packet that is still being held.
+        Snapshot:
+            Gets a copy of the statistics of every block and the link's packet budget.
+        WriteTrailer:
+            Writes the current statistics beside a log file.
+    """
+
+    def __init__(self, blocks: tuple, callback, uri: str="", budget: float=LINK_PACKET_BUDGET):
+        """Initialises a BlockMerger object.
+
+        Parameters:
+            blocks: tuple
+                The blocks being logged, of the form given in DEFAULT_BLOCKS.
+            callback:
+                The function to call with (timestamp, values) for every merged row.
+            uri: str
+                The URI of the Crazyflie.
+            budget: float
+                The number of packets per second that the link can carry.
+        """
+
+        self.periods = {name: period for name, period, variables in blocks}
+        self.rowBlock = min(self.periods.keys(), key=lambda name: self.periods[name])
+        self.values = {variable: None for name, period, variables in blocks for variable, fetchAs in variables}
+        self.stats = {name: LinkStats(uri, period) for name, period, variables in blocks}
+        self.latePackets = 0
+        self.droppedRows = 0
+        self.budget = budget
+
+        self._callback = callback
+        self._heap = []
+        self._count = 0
+        self._nextTimestamps = {}
+        self._lastReleased = None
+        self._lock = threading.Lock()
+
+    def AddPacket(self, name: str, timestamp: float, data: dict[str, float], arrivalTime: float) -> None:
+        """Adds a packet from one of the blocks.
+
+        Parameters:
+            name: str
+                The name of the block the packet came from.
+            timestamp: float
+                The Crazyflie's timestamp of the packet in ms.
+            data: dict[str, float]
+                The values of the block's variables.
+            arrivalTime: float
+                The time in s that the packet arrived, from time.time().
+        """
+
+        self.stats[name].RecordPacket(timestamp, arrivalTime)
+
+        with self._lock:
+            # Only updates the held values if a later packet has already been released.
+            if (self._lastReleased is not None and timestamp < self._lastReleased):
+                self.latePackets += 1
+                self.values.update(data)
+                return
+
+            # The count breaks ties so that the names and dictionaries are never compared.
+            heapq.heappush(self._heap, (timestamp, self._count, name, data))
+            self._count += 1
+            self._nextTimestamps[name] = timestamp + self.periods[name]
+
+            self._Release(min(self._nextTimestamps.values()))
+
+    def Flush(self) -> None:
+        """Releases every packet that is still being held.
+        """
+
+        with self._lock:
+            self._Release(float("inf"))
+
+    def _Release(self, watermark: float) -> None:
+        """Releases the held packets that are earlier than the watermark, in order.
+
+        Parameters:
+            watermark: float
+                The timestamp in ms that no block can send an earlier packet than.
+        """
+
+        while (self._heap and self._heap[0][0] < watermark):
+            # Merges every packet with this timestamp, which are all earlier than the watermark.
+            timestamp, count, name, data = heapq.heappop(self._heap)
+            self.values.update(data)
+            hasRow = name == self.rowBlock
+            while (self._heap and self._heap[0][0] == timestamp):
+                timestamp, count, name, data = heapq.heappop(self._heap)
+                self.values.update(data)
+                hasRow = hasRow or name == self.rowBlock
+            self._lastReleased = timestamp
+
+            # The other blocks' packets only update the held values.
+            if (not hasRow):
+                continue
+            if (None in self.values.values()):
+                self.droppedRows += 1
+            else:
+                self._callback(timestamp, dict(self.values))
+
+    def Snapshot(self) -> dict:
+        """Gets a copy of the statistics of every block and the link's packet budget.
+
+        Returns:
+            dict:
+                The statistics of each block as given by LinkStats.Snapshot, the
+                requested and measured packets per second, the budget, and the
+                number of late packets and dropped rows.
+        """
+
+        blocks = {name: stats.Snapshot() for name, stats in self.stats.items()}
+
+        # Measures the packet rate over the time that each block has been logging.
+        measuredRate = 0.0
+        for name, block in blocks.items():
+            if (block["expected"] > 1):
+                measuredRate += block["received"] * 1000.0 / (block["expected"] * self.periods[name])
+
+        return {
+            "blocks": blocks,
+            "requestedRate": sum(1000.0 / period for period in self.periods.values()),
+            "measuredRate": measuredRate,
+            "budget": self.budget,
+            "latePackets": self.latePackets,
+            "droppedRows": self.droppedRows,
+        }
+
+    def WriteTrailer(self, logFile: str) -> None:
+        """Writes the current statistics beside a log file.
+
+        Parameters:
+            logFile: str
+                The path to the log file the statistics belong to.
+        """
+
+        with AtomicWrite(GetTrailerFile(logFile)) as file:
+            json.dump(self.Snapshot(), file, indent=4)
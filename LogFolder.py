@@ -0,0 +1,117 @@
+import json
+import os
+
+from AtomicWrite import AtomicWrite
+from LogArchive import IsArchive, ListArchiveMembers
+
+"""Lists the logs in a folder and reads and writes the folder's manifest.
+
+Only needs the standard library, so that quick queries such as "cli.py list"
+don't have to import numpy. ListLogFiles is also imported by ParseData,
+so it can still be used from there.
+
+Methods:
+    ListLogFiles:
+        Lists the log files in a folder.
+    GetManifestPath:
+        Gets the path to the manifest of a log folder.
+    LoadManifest:
+        Loads the manifest of a log folder.
+    SaveManifest:
+        Saves the manifest of a log folder.
+"""
+
+# The file in each log folder which stores the information about its trials.
+MANIFEST_FILE = "manifest.json"
+
+def ListLogFiles(folder: str, excludeFailed: bool=False) -> list[str]:
+    """Lists the log files in a folder.
+
+    Only .csv and .csv.gz files are returned, so other files stored alongside
+    the logs (such as the manifest) are ignored. If a log is stored both
+    compressed and uncompressed, only the uncompressed log is returned.
+
+    Parameters:
+        folder: str
+            The folder containing the logs, or a bundle from LogArchive.CreateArchive.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control,
+            as recorded in the folder's manifest by QualityControl.RunQualityControl.
+
+    Returns:
+        list[str]:
+            The sorted paths to every log file in the folder.
+    """
+
+    if (IsArchive(folder)):
+        files = ListArchiveMembers(folder)
+    else:
+        names = set(os.listdir(folder))
+        files = [file for file in sorted(names) if file.endswith(".csv") or (file.endswith(".csv.gz") and file[:-3] not in names)]
+
+    if (excludeFailed):
+        manifest = LoadManifest(folder)
+        files = [file for file in files if manifest.get(file, {}).get("verdict") != "fail"]
+
+    return [f"{folder}/{file}" for file in files]
+
+def GetManifestPath(folder: str) -> str:
+    """Gets the path to the manifest of a log folder.
+
+    Bundles can't be written to in place, so the manifest of a bundle
+    is kept beside it instead.
+
+    Parameters:
+        folder: str
+            The folder containing the logs, or a bundle.
+
+    Returns:
+        str:
+            The path to the manifest.
+    """
+
+    if (IsArchive(folder)):
+        return f"{folder}.{MANIFEST_FILE}"
+
+    return f"{folder}/{MANIFEST_FILE}"
+
+def LoadManifest(folder: str) -> dict[str, dict]:
+    """Loads the manifest of a log folder.
+
+    Parameters:
+        folder: str
+            The folder containing the logs, or a bundle.
+
+    Returns:
+        dict[str, dict]:
+            A dictionary mapping the name of each log file to the
+            information recorded about it. Empty if the folder has no manifest.
+    """
+
+    path = GetManifestPath(folder)
+    if (not os.path.exists(path)):
+        return {}
+
+    file = open(path, "r")
+    manifest = json.load(file)
+    file.close()
+
+    return manifest
+
+def SaveManifest(folder: str, manifest: dict[str, dict]) -> None:
+    """Saves the manifest of a log folder.
+
+    The manifest is written to a temporary file first and then moved
+    into place, so it is never left half written.
+
+    Parameters:
+        folder: str
+            The folder containing the logs, or a bundle.
+        manifest: dict[str, dict]
+            A dictionary mapping the name of each log file to the
+            information recorded about it.
+    """
+
+    path = GetManifestPath(folder)
+    with AtomicWrite(path) as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
@@ -0,0 +1,262 @@
+import datetime
+from typing import NamedTuple
+
+from LogArchive import OpenLog
+
+"""Reads the metadata in the header of a log file.
+
+The header is parsed as "key: value" lines by name, so the order of the lines
+doesn't matter, and only the lines up to the closing separator are read.
+
+Every layout that has been written is parsed, distinguished by its schema version:
+    0: no header, only the column labels (logs.CreateSimpleLogFile before schema 2).
+    1: no schema line. The committed logs contain date, time, distance, velocity,
+       horizontalSeparation, verticalSeparation, heightAboveDefault and trial,
+       while logs.CreateLogFile before schema 2 left out verticalSeparation. A leading
+       drone's verticalSeparation and leading are worked out from its heightAboveDefault,
+       but a trailing drone's log in that layout has no verticalSeparation, so it can't
+       be identified and ParseData.ExtractHeaderFromFile raises on it. A leading drone
+       with a vertical separation of 0 is mistaken for a trailing drone.
+    2: a schema line, written by WriteHeader, with any of the keys in LogMetadata.
+       logs.CreateLogFile always writes verticalSeparation and leading.
+
+Methods:
+    WriteHeader:
+        Writes the column labels and a header to a newly created log file.
+    ParseHeaderLines:
+        Parses the lines of a header into a LogMetadata record.
+    ReadLogMetadata:
+        Reads the metadata in the header of a log file.
+    MetadataToRecord:
+        Converts a LogMetadata record into a dictionary that can be saved as JSON.
+    MetadataFromRecord:
+        Converts a dictionary made by MetadataToRecord back into a LogMetadata record.
+"""
+
+# The schema version written by WriteHeader.
+SCHEMA_VERSION = 2
+# The column labels written to the first line of every log.
+LOG_COLUMNS = "timestamp,uri,x,y,z,vx,vy,vz,batteryV,battery%,period"
+# The line which surrounds the header of every log.
+HEADER_SEPARATOR = "=========================================="
+
+class LogMetadata(NamedTuple):
+    """The metadata in the header of a log file.
+
+    Any value which isn't in the header, and can't be worked out from
+    the rest of the header, is None.
+
+    Attributes:
+        schema: int
+            The schema version of the header.
+        columns: tuple[str]
+            The labels of the columns of the data.
+        date: datetime.date
+            The date the log was created.
+        time: datetime.time
+            The time the log was created.
+        distance: float
+            The distance in m travelled during the trial.
+        velocity: float
+            The velocity in m/s of the trial.
+        horizontalSeparation: float
+            The horizontal separation between the drones in m.
+        verticalSeparation: float
+            The vertical separation between the drones in m.
+        heightAboveDefault: float
+            The height in m above flight.DEFAULT_HEIGHT that the drone flew at.
+        leading: bool
+            Whether the drone was the leading drone.
+        trial: int
+            The repetition of the trial.
+        extra: dict[str, str]
+            Any other keys in the header.
+    """
+
+    schema: int
+    columns: tuple[str]
+    date: datetime.date = None
+    time: datetime.time = None
+    distance: float = None
+    velocity: float = None
+    horizontalSeparation: float = None
+    verticalSeparation: float = None
+    heightAboveDefault: float = None
+    leading: bool = None
+    trial: int = None
+    extra: dict[str, str] = None
+
+    def GetStartTime(self) -> datetime.datetime:
+        """Gets the date and time the log was created.
+
+        Returns:
+            datetime.datetime:
+                The start of the log, or None if the header has no date or time.
+        """
+
+        if (self.date is None or self.time is None):
+            return None
+
+        return datetime.datetime.combine(self.date, self.time)
+
+# Converts the value of each known key from the text in the header.
+_CONVERTERS = {
+    "schema": int,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "distance": float,
+    "velocity": float,
+    "horizontalSeparation": float,
+    "verticalSeparation": float,
+    "heightAboveDefault": float,
+    "leading": lambda value: value.strip().lower() in ("true", "1", "yes"),
+    "trial": int,
+}
+
+def WriteHeader(file, metadata: dict, startTime: datetime.datetime=None) -> None:
+    """Writes the column labels and a header to a newly created log file.
+
+    The header is written as "key: value" lines between two separators,
+    starting with the schema version, date and time.
+
+    Parameters:
+        file:
+            The log file, opened for writing.
+        metadata: dict
+            Maps each key to write in the header to its value. Keys with a value of None are left out.
+        startTime: datetime.datetime
+            The date and time to write to the header. Uses the current time by default.
+    """
+
+    if (startTime is None):
+        startTime = datetime.datetime.now()
+
+    file.write(f"{LOG_COLUMNS}\n")
+    file.write(f"{HEADER_SEPARATOR}\n")
+    file.write(f"schema: {SCHEMA_VERSION}\n")
+    file.write(f"date: {str(startTime.date())}\n")
+    file.write(f"time: {str(startTime.strftime('%H:%M:%S'))}\n")
+    for key, value in metadata.items():
+        if (value is not None):
+            file.write(f"{key}: {value}\n")
+    file.write(f"{HEADER_SEPARATOR}\n")
+
+def ParseHeaderLines(columns: str, lines: list[str]) -> LogMetadata:
+    """Parses the lines of a header into a LogMetadata record.
+
+    Parameters:
+        columns: str
+            The column labels line.
+        lines: list[str]
+            The lines between the separators, or None if the log has no header.
+
+    Returns:
+        LogMetadata:
+            The metadata in the header.
+    """
+
+    fields = {"columns": tuple(columns.strip().split(","))}
+    extra = {}
+
+    for line in lines or []:
+        key, colon, value = line.partition(":")
+        key = key.strip()
+        value = value.strip()
+        if (not colon):
+            continue
+
+        if (key in _CONVERTERS):
+            try:
+                fields[key] = _CONVERTERS[key](value)
+            except ValueError:
+                raise ValueError(f"Header has an invalid {key}: {value}")
+        else:
+            extra[key] = value
+
+    # Works out the schema of headers from before the schema line was written.
+    if ("schema" not in fields):
+        fields["schema"] = 0 if lines is None else 1
+
+    # Before schema 2, the leading drone was the one flying above the default height.
+    if ("leading" not in fields and fields.get("heightAboveDefault") is not None):
+        fields["leading"] = fields["heightAboveDefault"] != 0.0
+
+    # The leading drone's height above the default height is the vertical separation.
+    if ("verticalSeparation" not in fields and fields.get("leading") and fields.get("heightAboveDefault") is not None):
+        fields["verticalSeparation"] = fields["heightAboveDefault"]
+
+    fields["extra"] = extra
+    return LogMetadata(**fields)
+
+def ReadLogMetadata(fileName: str) -> LogMetadata:
+    """Reads the metadata in the header of a log file.
+
+    Only reads up to the closing separator, so the data rows are never read.
+
+    Parameters:
+        fileName: str
+            The log file, which may be compressed or in a bundle.
+
+    Returns:
+        LogMetadata:
+            The metadata in the header.
+    """
+
+    file = OpenLog(fileName)
+    columns = file.readline()
+
+    # Logs without an opening separator have no header.
+    if (not file.readline().startswith("=")):
+        file.close()
+        return ParseHeaderLines(columns, None)
+
+    lines = []
+    for line in file:
+        if (line.startswith("=")):
+            break
+        lines.append(line)
+    else:
+        file.close()
+        raise ValueError(f"The header of {fileName} has no closing separator")
+
+    file.close()
+    return ParseHeaderLines(columns, lines)
+
+def MetadataToRecord(metadata: LogMetadata) -> dict:
+    """Converts a LogMetadata record into a dictionary that can be saved as JSON.
+
+    Parameters:
+        metadata: LogMetadata
+            The record to convert.
+
+    Returns:
+        dict:
+            The fields of the record, with the date and time as ISO strings.
+    """
+
+    record = metadata._asdict()
+    record["columns"] = list(metadata.columns)
+    record["date"] = metadata.date.isoformat() if metadata.date is not None else None
+    record["time"] = metadata.time.isoformat() if metadata.time is not None else None
+    record["extra"] = dict(metadata.extra or {})
+
+    return record
+
+def MetadataFromRecord(record: dict) -> LogMetadata:
+    """Converts a dictionary made by MetadataToRecord back into a LogMetadata record.
+
+    Parameters:
+        record: dict
+            The dictionary to convert.
+
+    Returns:
+        LogMetadata:
+            The record.
+    """
+
+    fields = dict(record)
+    fields["columns"] = tuple(record["columns"])
+    fields["date"] = datetime.date.fromisoformat(record["date"]) if record["date"] is not None else None
+    fields["time"] = datetime.time.fromisoformat(record["time"]) if record["time"] is not None else None
+
+    return LogMetadata(**fields)
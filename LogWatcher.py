@@ -0,0 +1,284 @@
+import os
+import time
+
+import ParseData
+from AtomicWrite import AtomicWrite
+from LogArchive import IsArchive
+from QualityControl import RunQualityControl
+
+"""Keeps the battery usage rates up to date while logs are being recorded.
+
+During a lab session a new log lands in the log folder every few minutes.
+A LogWatcher polls the folder and only processes the logs that are new or
+have changed since it last looked: each is parsed once (filling the parse
+cache, see ParseData.EnableParseCache), checked by QualityControl, which
+updates its record in the manifest, and fitted for its battery usage rate.
+The rates of each configuration are then regrouped from the stored rate
+of every trial, and rates.csv and the consumption table are written again.
+
+A log counts as finished once it hasn't been written to for a few seconds,
+since a log being recorded is appended to many times a second.
+
+Usage:
+    python cli.py watch --output rates.csv --table ./plots
+
+Methods:
+    LogWatcher:
+        Keeps the rate of every finished trial in a folder.
+    Watch:
+        Polls a folder until interrupted, writing the rates whenever logs land.
+"""
+
+# The time in s a log must go unchanged before it counts as finished.
+DEFAULT_SETTLE_TIME = 5.0
+# The time in s between polls of the folder.
+DEFAULT_INTERVAL = 2.0
+
+class LogWatcher:
+    """Keeps the rate of every finished trial in a folder.
+
+    Attributes:
+        folder: str
+            The folder being watched.
+        settleTime: float
+            The time in s a log must go unchanged before it counts as finished.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting, from SlopeEstimators.FILTERS.
+        excludeFailed: bool
+            Whether to leave out the trials that fail quality control.
+        trials: dict[str, dict]
+            Maps the name of every processed log to its configuration, rate in V/s and quality verdict.
+
+    Methods:
+        FindChangedLogs:
+            Finds the finished logs which are new or have changed, and the logs which were removed.
+        Update:
+            Processes the new and changed logs.
+        GetRates:
+            Gets the mean rate of every configuration.
+    """
+
+    def __init__(self, folder: str, settleTime: float=DEFAULT_SETTLE_TIME, estimator: str="ols", prefilter: str=None,
+                 excludeFailed: bool=False):
+        """Initialises a LogWatcher object which hasn't processed any logs yet.
+
+        Parameters:
+            folder: str
+                The folder to watch. Bundles can't change, so can't be watched.
+            settleTime: float
+                The time in s a log must go unchanged before it counts as finished.
+            estimator: str
+                The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+            prefilter: str
+                The filter to apply to the battery levels before fitting, from SlopeEstimators.FILTERS.
+            excludeFailed: bool
+                Whether to leave out the trials that fail quality control.
+        """
+
+        if (IsArchive(folder)):
+            raise ValueError(f"{folder} is a bundle, which can't change")
+
+        self.folder = folder
+        self.settleTime = settleTime
+        self.estimator = estimator
+        self.prefilter = prefilter
+        self.excludeFailed = excludeFailed
+        self.trials = {}
+        # Maps the name of every processed log to the (size, mtime) it had when it was processed.
+        self._processed = {}
+        # Maps the name of every log which couldn't be read to the (size, mtime) it had, so its error is only printed once.
+        self._failed = {}
+
+    def FindChangedLogs(self, now: float=None) -> tuple[list[str], list[str]]:
+        """Finds the finished logs which are new or have changed, and the logs which were removed.
+
+        Parameters:
+            now: float
+                The current time.time(). Uses the current time by default.
+
+        Returns:
+            tuple[list[str], list[str]]:
+                The paths of the finished logs to process, and the names of the processed logs which no longer exist.
+        """
+
+        if (now is None):
+            now = time.time()
+
+        changed = []
+        names = set()
+        for fileName in ParseData.ListLogFiles(self.folder):
+            name = os.path.basename(fileName)
+            names.add(name)
+
+            # Skips the logs still being written to, and those already processed.
+            stat = os.stat(fileName)
+            if (now - stat.st_mtime < self.settleTime):
+                continue
+            if (self._processed.get(name) == (stat.st_size, stat.st_mtime_ns)):
+                continue
+
+            changed.append(fileName)
+
+        removed = [name for name in self._processed.keys() if name not in names]
+
+        return changed, removed
+
+    def Update(self, now: float=None) -> list[str]:
+        """Processes the new and changed logs, and forgets the removed logs.
+
+        Parameters:
+            now: float
+                The current time.time(). Uses the current time by default.
+
+        Returns:
+            list[str]:
+                The paths of the logs that were processed, leaving out those with no data
+                and those which couldn't be read, which are printed and tried again next time.
+        """
+
+        changed, removed = self.FindChangedLogs(now)
+
+        for name in removed:
+            del self._processed[name]
+            self.trials.pop(name, None)
+        for name in [name for name in self._failed.keys() if not os.path.exists(f"{self.folder}/{name}")]:
+            del self._failed[name]
+
+        if (not changed):
+            return changed
+
+        # Records the state of each log before reading it, so a log changed while being read is processed again.
+        stats = {fileName: os.stat(fileName) for fileName in changed}
+
+        files = []
+        for fileName in changed:
+            name = os.path.basename(fileName)
+            state = (stats[fileName].st_size, stats[fileName].st_mtime_ns)
+            self.trials.pop(name, None)
+
+            # Skips the logs which can't be read or have no trial header, e.g. from a diagnostic flight,
+            # without recording them as processed, so they are tried again if they are fixed.
+            try:
+                hasData = len(ParseData.LoadLogArrays(fileName)["timestamp"]) > 0
+                ParseData.ExtractHeaderFromFile(fileName)
+            except Exception as error:
+                if (self._failed.get(name) != state):
+                    print(f"Skipping {fileName}: {error}")
+                self._failed[name] = state
+                continue
+
+            self._failed.pop(name, None)
+            self._processed[name] = state
+            # Leaves out the logs with no data, e.g. from a drone which never took off.
+            if (hasData):
+                files.append(fileName)
+
+        if (not files):
+            return files
+
+        # Checks and fits only the changed logs.
+        records = RunQualityControl(self.folder, files=files)
+        keys, rates, files = ParseData.ExtractTrialRatesFromFiles(files, estimator=self.estimator, prefilter=self.prefilter)
+
+        for fileName, key, rate in zip(files, keys, rates):
+            name = os.path.basename(fileName)
+            self.trials[name] = {"key": key, "rate": float(rate), "verdict": records[name]["verdict"]}
+
+        return files
+
+    def GetRates(self, percentage: bool=False, minVoltage: float=ParseData.MIN_VOLTAGE,
+                 maxVoltage: float=ParseData.MAX_VOLTAGE) -> dict[tuple[float, float, float, bool], float]:
+        """Gets the mean rate of every configuration from the processed logs.
+
+        Gives the same result as ParseData.ExtractBatteryUsageFromFolder on the processed logs.
+
+        Parameters:
+            percentage: bool
+                Determines whether to return the rates in V/s or %/s.
+            minVoltage: float
+                The voltage corresponding to a fully uncharged battery.
+            maxVoltage: float
+                The voltage corresponding to a fully charged battery.
+
+        Returns:
+            dict[tuple[float, float, float, bool], (float, float)]:
+                The (mean, std. dev.) of each configuration, as given by ParseData.GroupRatesByConfiguration.
+        """
+
+        # Orders the trials by name, the order ParseData.ListLogFiles gives them in.
+        trials = [self.trials[name] for name in sorted(self.trials.keys())]
+        if (self.excludeFailed):
+            trials = [trial for trial in trials if trial["verdict"] != "fail"]
+
+        rates = [trial["rate"] for trial in trials]
+        if (percentage):
+            rates = [rate * 100 / (maxVoltage - minVoltage) for rate in rates]
+
+        return ParseData.GroupRatesByConfiguration([trial["key"] for trial in trials], rates)
+
+def Watch(folder: str, ratesFile: str=None, tableFolder: str=None, interval: float=DEFAULT_INTERVAL, settleTime: float=DEFAULT_SETTLE_TIME,
+          estimator: str="ols", prefilter: str=None, excludeFailed: bool=False) -> None:
+    """Polls a folder until interrupted, writing the rates whenever logs land.
+
+    The logs already in the folder are processed first. After each update the
+    trailing drones' rates are written in the format of rates.csv, and the
+    number of trials of each configuration that changed is printed, to help
+    decide whether more repetitions are needed.
+
+    Parameters:
+        folder: str
+            The folder to watch.
+        ratesFile: str
+            The .csv file to write the rates to, e.g. rates.csv. Only printed by default.
+        tableFolder: str
+            The folder to save the consumption table to. Created if it doesn't exist. The table isn't plotted by default.
+        interval: float
+            The time in s between polls of the folder.
+        settleTime: float
+            The time in s a log must go unchanged before it counts as finished.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting, from SlopeEstimators.FILTERS.
+        excludeFailed: bool
+            Whether to leave out the trials that fail quality control.
+    """
+
+    if (tableFolder is not None):
+        os.makedirs(tableFolder, exist_ok=True)
+
+    watcher = LogWatcher(folder, settleTime, estimator, prefilter, excludeFailed)
+    print(f"Watching {folder}, press Ctrl+C to stop.")
+
+    while (True):
+        start = time.perf_counter()
+        changed = watcher.Update()
+
+        if (changed):
+            ratesVoltage = ParseData.FilterDronePositions(watcher.GetRates(), False)
+            ratesPercentage = ParseData.FilterDronePositions(watcher.GetRates(True), False)
+            text = ParseData.FormatRates(ratesVoltage, ratesPercentage)
+
+            if (ratesFile is not None):
+                with AtomicWrite(ratesFile) as file:
+                    file.write(text)
+
+            if (tableFolder is not None):
+                ParseData.SaveConsumptionTable(watcher.GetRates(True), tableFolder)
+
+            # Keeps the newly parsed logs in the parse cache, in case the watch is stopped.
+            ParseData.SaveParseCaches()
+
+            # Prints how many trials each changed configuration now has.
+            rates = watcher.GetRates()
+            counts = {}
+            for trial in watcher.trials.values():
+                counts[trial["key"]] = counts.get(trial["key"], 0) + 1
+            print(f"Processed {len(changed)} logs in {time.perf_counter() - start:.2f} s, {len(watcher.trials)} trials in total.")
+            for key in sorted(set(watcher.trials[os.path.basename(fileName)]["key"] for fileName in changed)):
+                mean, stddev = rates.get(key, (float("nan"), float("nan")))
+                print(f"    {key}: {counts[key]} trials, rate {mean} V/s, stddev {stddev} V/s")
+
+        time.sleep(interval)
@@ -0,0 +1,93 @@
+import math
+
+"""Stores the geometry of the square path flown by CommanderFlight.Loop.
+
+Kept separate from CommanderFlight so that the analysis code can use
+the same corners without needing cflib to be installed.
+
+Methods:
+    GetCorners:
+        Gets the corners of the box defined by an x and y range.
+    GetLegCoordinates:
+        Gets the start and end coordinates of each leg of a lap.
+    GetLapLength:
+        Gets the length of one lap around the box.
+"""
+
+# Defines the default range of the box.
+DEFAULT_X_RANGE = (-1.0, 1.0)
+DEFAULT_Y_RANGE = (-1.0, 1.0)
+
+def GetCorners(xRange: tuple[float, float]=DEFAULT_X_RANGE, yRange: tuple[float, float]=DEFAULT_Y_RANGE) -> list[tuple[float, float]]:
+    """Gets the corners of the box, in the order they are flown.
+
+    Parameters:
+        xRange: tuple[float, float]
+            The (min, max) x-coordinates of the box in m.
+        yRange: tuple[float, float]
+            The (min, max) y-coordinates of the box in m.
+
+    Returns:
+        list[tuple[float, float]]:
+            The (x, y) coordinates of the four corners.
+    """
+
+    return [(xRange[0], yRange[0]), (xRange[1], yRange[0]), (xRange[1], yRange[1]), (xRange[0], yRange[1])]
+
+def GetLegCoordinates(corners: list[tuple[float, float]], separation: float, isLeading: bool) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
+    """Gets the start and end coordinates of each leg of a lap.
+
+    The leading drone starts each leg slightly ahead of the corner and
+    ends on the next corner, while the trailing drone starts on the corner
+    and ends slightly behind the next corner.
+
+    Parameters:
+        corners: list[tuple[float, float]]
+            The corners of the box, as given by GetCorners.
+        separation: float
+            The horizontal separation between the drones in m.
+        isLeading: bool
+            Whether the drone is leading or not.
+
+    Returns:
+        tuple[list[tuple[float, float]], list[tuple[float, float]]]:
+            The start coordinates and end coordinates of each leg.
+    """
+
+    if (isLeading):
+        # Start slightly ahead of the corner.
+        startCoordinates = [(corners[0][0] + separation, corners[0][1]),
+                            (corners[1][0], corners[1][1] + separation),
+                            (corners[2][0] - separation, corners[2][1]),
+                            (corners[3][0], corners[3][1] - separation)]
+        # End on the corners.
+        endCoordinates = [corners[1], corners[2], corners[3], corners[0]]
+    else:
+        # Start on the corner.
+        startCoordinates = corners
+        # End slightly behind the corners.
+        endCoordinates = [(corners[1][0] - separation, corners[1][1]),
+                          (corners[2][0], corners[2][1] - separation),
+                          (corners[3][0] + separation, corners[3][1]),
+                          (corners[0][0], corners[0][1] + separation)]
+
+    return startCoordinates, endCoordinates
+
+def GetLapLength(corners: list[tuple[float, float]]) -> float:
+    """Gets the length of one lap around the corners.
+
+    Parameters:
+        corners: list[tuple[float, float]]
+            The corners of the path.
+
+    Returns:
+        float:
+            The perimeter of the path in m.
+    """
+
+    length = 0.0
+    for i in range(len(corners)):
+        nextCorner = corners[(i + 1) % len(corners)]
+        length += math.dist(corners[i], nextCorner)
+
+    return length
@@ -0,0 +1,410 @@
+import json
+import math
+import numpy as np
+from bisect import bisect_right
+from typing import Tuple
+
+import LoopGeometry
+from AtomicWrite import AtomicWrite
+from ConsumptionModel import FitModel, PredictConsumption
+from FlightPhases import ExtractPhaseUsageFromFolder
+from ParseData import ExtractHeaderFromFile, ExtractTrialRatesFromFolder, LOG_FOLDER
+
+"""Plans how many laps of CommanderFlight.Loop a battery can sustain.
+
+The battery drain rate of every configuration in the logs is stored in a
+table over the (velocity, separation) grid for leading and trailing drones.
+The trials of every horizontal separation are pooled into the cell of their
+vertical separation, since CommanderFlight.Loop flies with the same horizontal
+and vertical separation and the logs only cover a couple of horizontal separations.
+Planning a mission only interpolates the table and does some arithmetic,
+so it is cheap enough to call before every trial and to re-evaluate mid-flight
+with the drone's current voltage.
+
+A drain table is stored as a dictionary of the form
+    {
+        "velocities": the sorted velocities of the grid in m/s,
+        "separations": the sorted separations of the grid in m,
+        "leading": the drain of the leading drone in V/s, indexed [velocity][separation],
+        "trailing": the drain of the trailing drone in V/s, indexed [velocity][separation],
+        "flags": {"leading": ..., "trailing": ...}, where each flag says whether the
+                 cell was measured, imputed or floored, indexed [velocity][separation]
+    }
+
+Cells that weren't measured are only a guess, so PlanLoopMission refuses to
+plan on them unless asked to. Tables saved before the cells were flagged have
+no "flags" and are planned on as they are.
+
+Methods:
+    BuildDrainTable:
+        Builds the drain table from a folder of logs.
+    SaveDrainTable:
+        Saves a drain table to a file.
+    LoadDrainTable:
+        Loads a drain table from a file.
+    LookupDrain:
+        Interpolates the drain rate of a configuration from the table.
+    GetCellFlags:
+        Gets the flags of the cells the drain of a configuration is interpolated from.
+    GetLapTime:
+        Gets the time taken by CommanderFlight.Loop to fly one lap.
+    PlanLoopMission:
+        Gets the maximum safe number of laps and the expected landing voltage.
+"""
+
+# The voltage the drone must still have when it lands.
+RESERVE_VOLTAGE = 3.4
+
+# The hover time after each movement in CommanderFlight.Loop. Matches flight.DEFAULT_DELAY.
+HOVER_DELAY = 3.0
+
+# The time spent outside of the laps, taking off, hovering before the start and landing.
+OVERHEAD_TIME = 12.0
+
+# The lowest drain in V/s of any cell. The trials in the logs are short enough that the
+# drain of a cell can come out negative, which would let a mission fly any number of laps.
+MIN_DRAIN = 0.003
+
+# The phases of flight a lap of CommanderFlight.Loop is made of, from FlightPhases.PHASES.
+LAP_PHASES = ("cruise", "corner")
+
+# Where the drain of each trial comes from. "phases" fits only the LAP_PHASES of each
+# trial, leaving out the voltage sag of taking off and accelerating which makes the
+# slope of a whole log unusable. "trials" fits the whole log with a slope estimator.
+DRAIN_SOURCES = ("phases", "trials")
+
+# The flag of a cell that has trials with a positive drain.
+CELL_MEASURED = "measured"
+# The flag of a cell filled in by the ConsumptionModel, since it had no trials or its drain wasn't positive.
+CELL_IMPUTED = "imputed"
+# The flag of a cell raised to MIN_DRAIN.
+CELL_FLOORED = "floored"
+
+def _GetPhaseDrains(folder: str) -> Tuple[list[tuple[float, float, float, bool]], list[float]]:
+    """Gets the drain of every trial in a folder over the phases of flight a lap is made of.
+
+    The drain of a trial is the mean of its LAP_PHASES rates, weighted by
+    how long each phase lasted.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+
+    Returns:
+        Tuple[list[tuple[float, float, float, bool]], list[float]]:
+            The (velocity, horizontalSeparation, verticalSeparation, leading)
+            configuration of each trial and its drain in V/s, NaN if none
+            of the phases could be fitted.
+    """
+
+    usage = ExtractPhaseUsageFromFolder(folder)
+
+    keys = []
+    drains = []
+    for fileName, phases in usage.items():
+        vel, horiz, vert, leading, trialNum = ExtractHeaderFromFile(fileName)
+
+        total = 0.0
+        duration = 0.0
+        for phase in LAP_PHASES:
+            rate, phaseDuration = phases.get(phase, (math.nan, 0.0))
+            if (math.isfinite(rate) and phaseDuration > 0):
+                total -= rate * phaseDuration
+                duration += phaseDuration
+
+        keys.append((vel, horiz, vert, leading))
+        drains.append(total / duration if duration > 0 else math.nan)
+
+    return keys, drains
+
+def BuildDrainTable(folder: str=LOG_FOLDER, source: str="phases", estimator: str="theilsen", prefilter: str=None) -> dict:
+    """Builds the drain table from a folder of logs.
+
+    Each cell is the median drain of the trials with that configuration, using
+    the vertical separation of the trials as the separation, so the trials of
+    every horizontal separation are pooled. Cells with no trials, or whose median
+    drain isn't positive, are filled in by a linear ConsumptionModel fitted to
+    every trial. Every cell is at least MIN_DRAIN, and is flagged with how it was
+    filled in.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+        source: str
+            Where the drain of each trial comes from, from DRAIN_SOURCES.
+        estimator: str
+            The slope estimator to fit whole logs with, from SlopeEstimators.ESTIMATORS.
+            Only used by the "trials" source.
+        prefilter: str
+            The filter to apply to the battery levels before fitting whole logs,
+            from SlopeEstimators.FILTERS. Only used by the "trials" source.
+
+    Returns:
+        dict:
+            The drain table.
+    """
+
+    if (source == "phases"):
+        keys, drains = _GetPhaseDrains(folder)
+    elif (source == "trials"):
+        keys, rates, files = ExtractTrialRatesFromFolder(folder, False, estimator=estimator, prefilter=prefilter)
+        drains = [-float(rate) for rate in rates]
+    else:
+        raise ValueError(f"Unknown drain source {source}, expected one of {list(DRAIN_SOURCES)}")
+
+    # Stores the list of the drains of each (velocity, separation, leading) cell.
+    cells = {}
+    for key, drain in zip(keys, drains):
+        if (not math.isfinite(drain)):
+            continue
+
+        vel, horiz, vert, leading = key
+        cell = (vel, vert, leading)
+        if cell in cells.keys():
+            cells[cell].append(drain)
+        else:
+            cells[cell] = [drain,]
+
+    velocities = sorted(set(cell[0] for cell in cells.keys()))
+    separations = sorted(set(cell[1] for cell in cells.keys()))
+
+    # Fits a model to fill in any missing cells.
+    validKeys = [key for key, drain in zip(keys, drains) if math.isfinite(drain)]
+    validRates = [-drain for drain in drains if math.isfinite(drain)]
+    model = FitModel(np.array(validKeys, dtype=float), np.array(validRates), "linear")
+    horizontalSeparation = float(np.mean([key[1] for key in validKeys]))
+
+    table = {"velocities": velocities, "separations": separations, "flags": {}}
+    for role, leading in (("leading", True), ("trailing", False)):
+        table[role] = []
+        table["flags"][role] = []
+        for vel in velocities:
+            row = []
+            flags = []
+            for sep in separations:
+                cellDrains = cells.get((vel, sep, leading))
+                drain = float(np.median(cellDrains)) if cellDrains else 0.0
+                flag = CELL_MEASURED
+                if (drain <= 0):
+                    drain = -PredictConsumption(model, vel, horizontalSeparation, sep, leading)
+                    flag = CELL_IMPUTED
+                if (drain < MIN_DRAIN):
+                    drain = MIN_DRAIN
+                    flag = CELL_FLOORED
+                row.append(float(drain))
+                flags.append(flag)
+            table[role].append(row)
+            table["flags"][role].append(flags)
+
+    return table
+
+def SaveDrainTable(table: dict, fileName: str) -> None:
+    """Saves a drain table to a file.
+
+    Parameters:
+        table: dict
+            The drain table, as given by BuildDrainTable.
+        fileName: str
+            The .json file to save the table to.
+    """
+
+    with AtomicWrite(fileName) as file:
+        json.dump(table, file)
+
+def LoadDrainTable(fileName: str) -> dict:
+    """Loads a drain table from a file.
+
+    Parameters:
+        fileName: str
+            The .json file the table was saved to.
+
+    Returns:
+        dict:
+            The drain table.
+    """
+
+    file = open(fileName, "r")
+    table = json.load(file)
+    file.close()
+
+    return table
+
+def _Bracket(values: list[float], value: float) -> Tuple[int, int, float]:
+    """Finds the grid points either side of a value.
+
+    Values outside of the grid are clamped to its edges.
+
+    Parameters:
+        values: list[float]
+            The sorted grid points.
+        value: float
+            The value to find.
+
+    Returns:
+        Tuple[int, int, float]:
+            The indices of the grid points below and above the value,
+            and how far (from 0 to 1) the value is between them.
+    """
+
+    if (value <= values[0]):
+        return 0, 0, 0.0
+    if (value >= values[-1]):
+        return len(values) - 1, len(values) - 1, 0.0
+
+    upper = bisect_right(values, value)
+    lower = upper - 1
+    fraction = (value - values[lower]) / (values[upper] - values[lower])
+
+    return lower, upper, fraction
+
+def LookupDrain(table: dict, speed: float, separation: float, isLeading: bool) -> float:
+    """Interpolates the drain rate of a configuration from the table.
+
+    Parameters:
+        table: dict
+            The drain table.
+        speed: float
+            The speed of the drone in m/s.
+        separation: float
+            The separation between the drones in m.
+        isLeading: bool
+            Whether the drone is the leading drone.
+
+    Returns:
+        float:
+            The drain rate of the battery in V/s.
+    """
+
+    grid = table["leading"] if isLeading else table["trailing"]
+    v0, v1, vFraction = _Bracket(table["velocities"], speed)
+    s0, s1, sFraction = _Bracket(table["separations"], separation)
+
+    # Interpolates between the four surrounding cells.
+    low = grid[v0][s0] * (1 - sFraction) + grid[v0][s1] * sFraction
+    high = grid[v1][s0] * (1 - sFraction) + grid[v1][s1] * sFraction
+
+    return low * (1 - vFraction) + high * vFraction
+
+def GetCellFlags(table: dict, speed: float, separation: float, isLeading: bool) -> set[str]:
+    """Gets the flags of the cells the drain of a configuration is interpolated from.
+
+    Parameters:
+        table: dict
+            The drain table.
+        speed: float
+            The speed of the drone in m/s.
+        separation: float
+            The separation between the drones in m.
+        isLeading: bool
+            Whether the drone is the leading drone.
+
+    Returns:
+        set[str]:
+            The flags of every cell LookupDrain gives any weight to, CELL_MEASURED,
+            CELL_IMPUTED or CELL_FLOORED. Empty if the table has no flags.
+    """
+
+    if ("flags" not in table.keys()):
+        return set()
+
+    flags = table["flags"]["leading"] if isLeading else table["flags"]["trailing"]
+    v0, v1, vFraction = _Bracket(table["velocities"], speed)
+    s0, s1, sFraction = _Bracket(table["separations"], separation)
+
+    velocityIndices = (v0, v1) if vFraction > 0 else (v0,)
+    separationIndices = (s0, s1) if sFraction > 0 else (s0,)
+
+    return {flags[v][s] for v in velocityIndices for s in separationIndices}
+
+def GetLapTime(speed: float, separation: float, isLeading: bool, xRange: tuple[float, float]=LoopGeometry.DEFAULT_X_RANGE,
+               yRange: tuple[float, float]=LoopGeometry.DEFAULT_Y_RANGE, hoverDelay: float=HOVER_DELAY) -> float:
+    """Gets the time taken by CommanderFlight.Loop to fly one lap.
+
+    Each of the four legs of a lap moves to the end of the leg, hovers,
+    moves to the start of the next leg and hovers again.
+
+    Parameters:
+        speed: float
+            The speed of the drone in m/s.
+        separation: float
+            The separation between the drones in m.
+        isLeading: bool
+            Whether the drone is the leading drone.
+        xRange: tuple[float, float]
+            The (min, max) x-coordinates of the box in m.
+        yRange: tuple[float, float]
+            The (min, max) y-coordinates of the box in m.
+        hoverDelay: float
+            The time in s spent hovering after each movement.
+
+    Returns:
+        float:
+            The duration of one lap in s.
+    """
+
+    corners = LoopGeometry.GetCorners(xRange, yRange)
+    startCoordinates, endCoordinates = LoopGeometry.GetLegCoordinates(corners, separation, isLeading)
+
+    lapTime = 0.0
+    for i in range(4):
+        distance = math.dist(startCoordinates[i], endCoordinates[i]) + math.dist(endCoordinates[i], startCoordinates[(i + 1) % 4])
+        lapTime += distance / speed + 2 * hoverDelay
+
+    return lapTime
+
+def PlanLoopMission(table: dict, speed: float, separation: float, isLeading: bool, startVoltage: float,
+                    xRange: tuple[float, float]=LoopGeometry.DEFAULT_X_RANGE, yRange: tuple[float, float]=LoopGeometry.DEFAULT_Y_RANGE,
+                    reserveVoltage: float=RESERVE_VOLTAGE, hoverDelay: float=HOVER_DELAY, overheadTime: float=OVERHEAD_TIME,
+                    minDrain: float=MIN_DRAIN, allowEstimated: bool=False) -> Tuple[int, float]:
+    """Gets the maximum safe number of laps and the expected landing voltage.
+
+    To re-plan mid-flight, pass the current voltage as the start voltage and
+    only the time left to land as the overhead time. Refuses to plan on a
+    drain interpolated from cells that weren't measured, see GetCellFlags.
+
+    Parameters:
+        table: dict
+            The drain table.
+        speed: float
+            The speed of the drone in m/s.
+        separation: float
+            The separation between the drones in m.
+        isLeading: bool
+            Whether the drone is the leading drone.
+        startVoltage: float
+            The battery voltage before the mission.
+        xRange: tuple[float, float]
+            The (min, max) x-coordinates of the box in m.
+        yRange: tuple[float, float]
+            The (min, max) y-coordinates of the box in m.
+        reserveVoltage: float
+            The voltage the drone must still have when it lands.
+        hoverDelay: float
+            The time in s spent hovering after each movement.
+        overheadTime: float
+            The time in s spent outside of the laps.
+        minDrain: float
+            The lowest drain in V/s to plan with, for tables saved before every cell was floored.
+        allowEstimated: bool
+            Whether to plan on imputed or floored cells anyway.
+
+    Returns:
+        Tuple[int, float]:
+            The maximum number of full laps which keep the landing voltage
+            above the reserve, and the expected landing voltage after that many laps.
+    """
+
+    estimated = GetCellFlags(table, speed, separation, isLeading) - {CELL_MEASURED}
+    if (estimated and not allowEstimated):
+        raise ValueError(f"The drain at {speed} m/s and {separation} m separation comes from {', '.join(sorted(estimated))} "
+                         f"cells rather than measured ones, pass allowEstimated to plan on it anyway")
+
+    drain = max(LookupDrain(table, speed, separation, isLeading), minDrain)
+
+    lapDrain = drain * GetLapTime(speed, separation, isLeading, xRange, yRange, hoverDelay)
+    available = startVoltage - reserveVoltage - drain * overheadTime
+
+    laps = max(int(available // lapDrain), 0)
+    landingVoltage = startVoltage - drain * overheadTime - laps * lapDrain
+
+    return laps, landingVoltage
@@ -1,45 +1,85 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
-separations = ("0.25 x 0.25", "0.65 x 0.65", "1.0 x 1.0")
-halfSpeed = {
-    "Experimental": (0.13, 0.12, 0.08),
-    "Simulated": (0.18, 0.16, 0.18)
-}
-fullSpeed = {
-    "Experimental": (0.15, 0.13, 0.10),
-    "Simulated": (0.36, 0.32, 0.26)
+"""Plots the bar charts comparing the experimental and simulated battery consumption rates.
+
+The experimental rates are from the lap trials, which aren't in this
+repository, and the simulated rates are from the simulation, so both
+are kept here rather than fitted from a log folder.
+
+Usage:
+    python OtherPlots.py
+    python cli.py report
+
+Methods:
+    PlotComparison:
+        Plots a bar chart of the rates at each separation and saves it.
+"""
+
+SEPARATIONS = ("0.25 x 0.25", "0.65 x 0.65", "1.0 x 1.0")
+# The rates in %/s at each of SEPARATIONS, keyed by the speed in m/s.
+COMPARISONS = {
+    "0.5": {
+        "Experimental": (0.13, 0.12, 0.08),
+        "Simulated": (0.18, 0.16, 0.18)
+    },
+    "1.0": {
+        "Experimental": (0.15, 0.13, 0.10),
+        "Simulated": (0.36, 0.32, 0.26)
+    },
 }
+COLORS = ("blue", "red")
+
+def PlotComparison(separations: tuple[str], measurements: dict[str, tuple[float]], outputFile: str, yLimit: float=0.5,
+                   width: float=0.25) -> str:
+    """Plots a bar chart of the rates at each separation and saves it.
+
+    Parameters:
+        separations: tuple[str]
+            The label of each group of bars.
+        measurements: dict[str, tuple[float]]
+            The rate in %/s at each separation, keyed by the label of the series, e.g. "Experimental".
+        outputFile: str
+            The .png file to save the chart to.
+        yLimit: float
+            The top of the y-axis in %/s.
+        width: float
+            The width of each bar.
+
+    Returns:
+        str:
+            The file the chart was saved to.
+    """
+
+    # Imported here since matplotlib is slow to import and most tasks don't plot.
+    import matplotlib.pyplot as plt
 
-for i in range(2):
     x = np.arange(len(separations))  # the label locations
-    width = 0.25  # the width of the bars
     multiplier = 0
 
     fig, ax = plt.subplots(layout='constrained')
     ax.grid(axis='y')
     ax.set_axisbelow(True)
 
-    speedLabels = ("0.5", "1.0")
-    speeds = (halfSpeed, fullSpeed)
-
-    for attribute, measurement in speeds[i].items():
+    for attribute, measurement in measurements.items():
         offset = width * multiplier
-        if (multiplier == 0):
-            color = 'blue'
-        else:
-            color = 'red'
-        rects = ax.bar(x + offset, measurement, width, label=attribute, color=color)
+        rects = ax.bar(x + offset, measurement, width, label=attribute, color=COLORS[multiplier % len(COLORS)])
         ax.bar_label(rects, padding=3)
         multiplier += 1
 
     # Add some text for labels, title and custom x-axis tick labels, etc.
     ax.set_ylabel('Battery Consumption Rate (%/s)')
     ax.set_xlabel("Vertical and Horizontal Separations (m)")
-    # ax.set_title('Battery Consumption Rate at 0.5 m/s')
     ax.set_xticks(x + width, separations)
     ax.legend(loc='upper left')
-    ax.set_ylim(0, 0.5)
+    ax.set_ylim(0, yLimit)
+
+    plt.savefig(outputFile)
+    plt.close(fig)
+
+    return outputFile
+
+# =============================================================================
 
-    plt.savefig(f"{speedLabels[i]} m s Comparison.png")
-    plt.clf()
\ No newline at end of file
+if __name__ == "__main__":
+    for speed, measurements in COMPARISONS.items():
+        PlotComparison(SEPARATIONS, measurements, f"{speed} m s Comparison.png")
@@ -0,0 +1,153 @@
+import numpy as np
+
+from AtomicWrite import AtomicWrite
+
+"""Caches the parsed columns of every log in a folder in a single file.
+
+Parsing the text of a log is the slowest part of most analysis, so once a
+log has been parsed its columns are kept in the cache along with the size
+and modification time of the log. A log is only parsed again if it changes.
+See ParseData.EnableParseCache for how the cache is used.
+
+The cache is a .npz file holding the name, size, modification time and
+number of rows of every log, and each column of every log concatenated
+into one array, so loading it doesn't depend on the number of logs.
+
+Methods:
+    ParseCache:
+        Stores the parsed columns of the logs in one folder.
+"""
+
+# Changed whenever the way logs are parsed changes, so old caches are thrown away.
+CACHE_VERSION = 1
+
+class ParseCache:
+    """Stores the parsed columns of the logs in one folder.
+
+    Attributes:
+        entries: dict[str, Tuple[int, int, dict[str, np.ndarray]]]
+            Maps the name of each log to its size, modification time and columns.
+        changed: bool
+            Whether any entries have changed since the cache was loaded.
+
+    Methods:
+        Get:
+            Gets the columns of a log, if the log hasn't changed.
+        Put:
+            Stores the columns of a log.
+        Save:
+            Saves the cache to a file.
+        Load:
+            Loads a cache from a file.
+    """
+
+    def __init__(self):
+        """Initialises an empty ParseCache.
+        """
+
+        self.entries = {}
+        self.changed = False
+
+    def Get(self, name: str, size: int, mtime: int) -> dict[str, np.ndarray]:
+        """Gets the columns of a log, if the log hasn't changed.
+
+        Parameters:
+            name: str
+                The name of the log in its folder.
+            size: int
+                The size of the log in bytes.
+            mtime: int
+                The modification time of the log in ns.
+
+        Returns:
+            dict[str, np.ndarray]:
+                The columns of the log, or None if the log isn't cached or has changed.
+        """
+
+        entry = self.entries.get(name)
+        if (entry is None or entry[0] != size or entry[1] != mtime):
+            return None
+
+        return dict(entry[2])
+
+    def Put(self, name: str, size: int, mtime: int, columns: dict[str, np.ndarray]) -> None:
+        """Stores the columns of a log.
+
+        Parameters:
+            name: str
+                The name of the log in its folder.
+            size: int
+                The size of the log in bytes.
+            mtime: int
+                The modification time of the log in ns.
+            columns: dict[str, np.ndarray]
+                The columns of the log, as given by ParseData.LoadLogArrays.
+        """
+
+        self.entries[name] = (size, mtime, dict(columns))
+        self.changed = True
+
+    def Save(self, fileName: str) -> None:
+        """Saves the cache to a file.
+
+        Parameters:
+            fileName: str
+                The .npz file to save the cache to.
+        """
+
+        names = sorted(self.entries.keys())
+        labels = sorted(set(label for name in names for label in self.entries[name][2].keys()))
+        lengths = [len(next(iter(self.entries[name][2].values()), [])) for name in names]
+
+        # Concatenates each column across the logs, filling the logs without it with NaN.
+        arrays = {
+            "version": np.array(CACHE_VERSION),
+            "names": np.array(names, dtype=str),
+            "sizes": np.array([self.entries[name][0] for name in names], dtype=np.int64),
+            "mtimes": np.array([self.entries[name][1] for name in names], dtype=np.int64),
+            "lengths": np.array(lengths, dtype=np.int64),
+            "labels": np.array(labels, dtype=str),
+            "present": np.array([[label in self.entries[name][2] for label in labels] for name in names], dtype=bool).reshape(len(names), len(labels)),
+        }
+        for i, label in enumerate(labels):
+            arrays[f"column{i}"] = np.concatenate([self.entries[name][2].get(label, np.full(length, np.nan))
+                                                   for name, length in zip(names, lengths)] + [np.zeros(0)])
+
+        with AtomicWrite(fileName, "wb") as file:
+            np.savez(file, **arrays)
+
+        self.changed = False
+
+    @staticmethod
+    def Load(fileName: str) -> "ParseCache":
+        """Loads a cache from a file.
+
+        Parameters:
+            fileName: str
+                The .npz file the cache was saved to.
+
+        Returns:
+            ParseCache:
+                The loaded cache, which is empty if the file was made by a different CACHE_VERSION.
+        """
+
+        cache = ParseCache()
+        data = np.load(fileName)
+        if (int(data["version"]) != CACHE_VERSION):
+            data.close()
+            return cache
+
+        names = data["names"].tolist()
+        labels = data["labels"].tolist()
+        present = data["present"]
+        columns = [data[f"column{i}"] for i in range(len(labels))]
+        offsets = np.concatenate(([0], np.cumsum(data["lengths"])))
+        sizes = data["sizes"].tolist()
+        mtimes = data["mtimes"].tolist()
+        data.close()
+
+        for i, (name, size, mtime) in enumerate(zip(names, sizes, mtimes)):
+            start, end = offsets[i], offsets[i + 1]
+            cache.entries[name] = (size, mtime, {label: columns[j][start:end] for j, label in enumerate(labels) if present[i, j]})
+
+        return cache
@@ -1,17 +1,32 @@
 import os
-import csv
+import datetime
 from typing import Tuple
-import matplotlib.pyplot as plt
-from scipy import stats
+import numpy as np
 import statistics
 
+from LogArchive import OpenLog, IsArchive
+from LogFolder import ListLogFiles
+from LogHeader import ReadLogMetadata, LOG_COLUMNS
+from ParseCache import ParseCache
+import Profiler
+from SlopeEstimators import EstimateSlopes, WEIGHTED_ESTIMATORS
+
 LOG_FOLDER = "./350mAh_logs"
 OUTPUT_FOLDER = "./plots"
 
 MIN_VOLTAGE = 3.0
 MAX_VOLTAGE = 4.2
 
-def ExtractBatteryUsageRateFromFile(fileName: str) -> float:
+# The period in ms of logs which don't record their period. Matches logs.DEFAULT_PERIOD.
+DEFAULT_PERIOD = 100
+
+# The file in each log folder which caches the parsed columns of its logs.
+PARSE_CACHE_FILE = "parsecache.npz"
+
+# Maps each folder to its ParseCache while the cache is enabled, see EnableParseCache.
+_parseCaches = None
+
+def ExtractBatteryUsageRateFromFile(fileName: str, estimator: str="ols", prefilter: str=None) -> float:
     """Gets the rate of battery usage from a file.
     
     Assumes the battery usage is linear and fits a
@@ -20,6 +35,12 @@ def ExtractBatteryUsageRateFromFile(fileName: str) -> float:
     Parameters:
         fileName: str
             The file to parse through.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+            Uses ordinary least squares by default.
+        prefilter: str
+            The filter to apply to the battery levels before fitting,
+            from SlopeEstimators.FILTERS. No filter is applied by default.
 
     Returns:
         float:
@@ -28,9 +49,13 @@ def ExtractBatteryUsageRateFromFile(fileName: str) -> float:
     """
 
     timestamps, batteryLevels = ExtractBatteryUsageDataFromFile(fileName)
+    # Weights each sample by its period, as ExtractTrialRatesFromFiles does, so the file fits the same on its own.
+    weights = LoadLogArrays(fileName)["period"] if estimator in WEIGHTED_ESTIMATORS else None
 
-    slope, intercept, r_value, p_value, std_err = stats.linregress(timestamps, batteryLevels)
-    return slope
+    # Fits the file as a single group.
+    groups = np.zeros(len(timestamps), dtype=int)
+    slopes = EstimateSlopes(groups, np.array(timestamps), np.array(batteryLevels), 1, estimator, prefilter, weights)
+    return float(slopes[0])
 
 def ExtractBatteryUsageDataFromFile(fileName: str) -> Tuple[list[float], list[float]]:
     """Extracts the battery usage data from a file.
@@ -47,8 +72,9 @@ def ExtractBatteryUsageDataFromFile(fileName: str) -> Tuple[list[float], list[fl
                 timestamps.
     """
 
-    timestamps = ExtractColumnFromLog(fileName, "timestamp")
-    batteryLevels = ExtractColumnFromLog(fileName, "batteryV")
+    data = LoadLogArrays(fileName)
+    timestamps = data["timestamp"].tolist()
+    batteryLevels = data["batteryV"].tolist()
 
     # Shifts the timestamps to start at 0.
     timestamps = [(time - timestamps[0]) / 1000.0 for time in timestamps]
@@ -69,20 +95,238 @@ def ExtractColumnFromLog(fileName: str, columnLabel: str) -> list[float]:
             All of the data in that column.
     """
 
-    # Opens the file in a csv dictionary.
-    file = open(fileName, "r")
-    csvFile = csv.DictReader(file)
+    return LoadLogArrays(fileName)[columnLabel].tolist()
+
+def GetParseCachePath(folder: str) -> str:
+    """Gets the path to the parse cache of a log folder.
+
+    Like the manifest, the parse cache of a bundle is kept beside it.
+
+    Parameters:
+        folder: str
+            The folder containing the logs, or a bundle.
+
+    Returns:
+        str:
+            The path to the parse cache.
+    """
+
+    if (IsArchive(folder)):
+        return f"{folder}.{PARSE_CACHE_FILE}"
+
+    return f"{folder}/{PARSE_CACHE_FILE}"
+
+def EnableParseCache() -> None:
+    """Makes LoadLogArrays reuse the columns of logs that were parsed before.
+
+    Every function that reads the data of a log goes through LoadLogArrays,
+    so they all use the cache. Each folder's cache is loaded the first time
+    one of its logs is read, and only changes once SaveParseCaches is called.
+    """
+
+    global _parseCaches
+    if (_parseCaches is None):
+        _parseCaches = {}
+
+def SaveParseCaches() -> None:
+    """Saves the parse cache of every folder whose cache has changed.
+    """
+
+    if (_parseCaches is None):
+        return
+
+    for folder, cache in _parseCaches.items():
+        if (cache.changed):
+            cache.Save(GetParseCachePath(folder))
+
+def CountHeaderLines(fileName: str) -> int:
+    """Counts the lines before the data starts in a log file.
+
+    Logs created by logs.CreateSimpleLogFile before schema 2 only contain the
+    column labels, while every other log also contains a header surrounded
+    by separators (see LogHeader).
+
+    Parameters:
+        fileName: str
+            The file to parse through.
+
+    Returns:
+        int:
+            The number of lines before the first line of data.
+    """
+
+    file = OpenLog(fileName)
+    file.readline()
+
+    # If there is no opening separator, only the column labels come before the data.
+    if (not file.readline().startswith("=")):
+        file.close()
+        return 1
+
+    # Otherwise, counts the lines until the closing separator.
+    count = 2
+    for line in file:
+        count += 1
+        if (line.startswith("=")):
+            break
+
+    file.close()
+    return count
+
+@Profiler.Profiled("analysis")
+def LoadLogArrays(fileName: str) -> dict[str, np.ndarray]:
+    """Loads every numeric column of a log file into arrays.
+
+    Parameters:
+        fileName: str
+            The file to parse through.
+
+    Returns:
+        dict[str, np.ndarray]:
+            A dictionary where the keys are the column labels
+            and the values are the data in that column.
+            The uri column is not included. Logs from before the
+            period column was recorded get a period of DEFAULT_PERIOD.
+    """
+
+    if (_parseCaches is None):
+        return _ParseLogArrays(fileName)
+
+    # Bundled logs are checked against the bundle, since they have no file of their own.
+    folder, name = os.path.split(fileName)
+    stat = os.stat(fileName) if os.path.exists(fileName) else os.stat(folder)
+
+    if (folder not in _parseCaches):
+        path = GetParseCachePath(folder)
+        _parseCaches[folder] = ParseCache.Load(path) if os.path.exists(path) else ParseCache()
+    cache = _parseCaches[folder]
+
+    output = cache.Get(name, stat.st_size, stat.st_mtime_ns)
+    if (output is None):
+        output = _ParseLogArrays(fileName)
+        cache.Put(name, stat.st_size, stat.st_mtime_ns, output)
+
+    return output
+
+def _ParseLogArrays(fileName: str) -> dict[str, np.ndarray]:
+    """Parses every numeric column of a log file into arrays, without the cache.
+
+    Parameters:
+        fileName: str
+            The file to parse through.
+
+    Returns:
+        dict[str, np.ndarray]:
+            The columns, as given by LoadLogArrays.
+    """
+
+    # Reads the column labels from the first line.
+    file = OpenLog(fileName)
+    columns = file.readline().strip().split(",")
+
+    # Loads every column except for the uri, reading on from after the column labels.
+    indices = [i for i in range(len(columns)) if columns[i] != "uri"]
+    data = np.loadtxt(file, delimiter=",", skiprows=CountHeaderLines(fileName) - 1, usecols=indices, ndmin=2)
+    file.close()
+    output = {columns[index]: data[:, i] for i, index in enumerate(indices)}
+
+    if ("period" not in output):
+        output["period"] = np.full(len(data), float(DEFAULT_PERIOD))
+
+    return output
+
+@Profiler.Profiled("analysis")
+def LoadFolderArrays(folder: str, excludeFailed: bool=False) -> Tuple[dict[str, np.ndarray], list[str]]:
+    """Loads every log in a folder into one set of concatenated arrays.
 
-    # Cuts off the header.
-    for i in range(10):
-        csvFile.__next__()
+    This allows an entire folder to be processed in a single
+    vectorised pass rather than one file at a time.
 
-    # Gets the timestamp and battery level data.
-    data = []
-    for line in csvFile:
-       data.append(float(line[columnLabel]))
+    Parameters:
+        folder: str
+            The folder containing the logs.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control.
+
+    Returns:
+        Tuple[dict[str, np.ndarray], list[str]]:
+            A tuple where
+                the first entry is a dictionary of the concatenated columns, with
+                an extra "trial" column containing the index of the file each sample
+                came from and a "time" column containing the time in s since the
+                start of that file, and
+                the second entry is the list of files, so that files[trial]
+                is the file a sample came from.
+    """
 
-    return data
+    return LoadFilesArrays(ListLogFiles(folder, excludeFailed))
+
+@Profiler.Profiled("analysis")
+def LoadFilesArrays(files: list[str]) -> Tuple[dict[str, np.ndarray], list[str]]:
+    """Loads a list of logs into one set of concatenated arrays.
+
+    Parameters:
+        files: list[str]
+            The log files to load, which may come from several folders.
+
+    Returns:
+        Tuple[dict[str, np.ndarray], list[str]]:
+            The concatenated columns and the list of files,
+            in the same form as LoadFolderArrays.
+    """
+
+    logs = [LoadLogArrays(fileName) for fileName in files]
+
+    # Concatenates each column across all of the logs, giving empty columns if there are none.
+    columns = logs[0].keys() if logs else [column for column in LOG_COLUMNS.split(",") if column != "uri"]
+    data = {}
+    for column in columns:
+        data[column] = np.concatenate([log[column] for log in logs] + [np.zeros(0)])
+
+    # Labels each sample with the index of the file it came from.
+    lengths = [len(log["timestamp"]) for log in logs]
+    data["trial"] = np.repeat(np.arange(len(logs)), lengths)
+
+    # Shifts the timestamps of each trial to start at 0 and converts them to seconds.
+    # Logs with only a header have no samples, so their first timestamp is never used.
+    firstTimestamps = np.array([log["timestamp"][0] if len(log["timestamp"]) else 0.0 for log in logs] + [0.0])
+    data["time"] = (data["timestamp"] - firstTimestamps[data["trial"]]) / 1000.0
+
+    return data, files
+
+@Profiler.Profiled("analysis")
+def LoadDeduplicatedArrays(folders: list[str], indexFile: str=None, threshold: float=None, excludeFailed: bool=False) -> Tuple[dict[str, np.ndarray], list[str]]:
+    """Loads the logs of several folders into one set of arrays, counting each trial once.
+
+    Logs whose data rows also appear in an earlier folder are left out,
+    see DedupIndex.DedupIndex.GetUniqueFiles.
+
+    Parameters:
+        folders: list[str]
+            The folders (or bundles) containing the logs, in order of preference.
+        indexFile: str
+            The .json file to keep the fingerprints in, so that unchanged logs
+            aren't fingerprinted again. The logs are fingerprinted every time by default.
+        threshold: float
+            If given, near-duplicates with at least this fraction of shared rows are also left out.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control.
+
+    Returns:
+        Tuple[dict[str, np.ndarray], list[str]]:
+            The concatenated columns and the list of files,
+            in the same form as LoadFolderArrays.
+    """
+
+    # Imported here since DedupIndex uses ParseData.
+    from DedupIndex import DedupIndex
+
+    index = DedupIndex.Load(indexFile) if indexFile is not None and os.path.exists(indexFile) else DedupIndex()
+    files = index.GetUniqueFiles(folders, threshold, excludeFailed)
+    if (indexFile is not None):
+        index.Save(indexFile)
+
+    return LoadFilesArrays(files)
 
 def CreateTrendline(x: list[float], y: list[float]) -> list[float]:
     """Creates a trendline given a set of input data.
@@ -100,7 +344,8 @@ def CreateTrendline(x: list[float], y: list[float]) -> list[float]:
             in the list.
     """
 
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+    # Fits with numpy rather than scipy.stats.linregress, since scipy is slow to import.
+    slope, intercept = np.polyfit(x, y, 1)
 
     return [slope * t + intercept for t in x]
 
@@ -118,10 +363,12 @@ def GetRSquared(x: list[float], y: list[float]) -> float:
             The R^2 value of the linear regression.
     """
 
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+    # The R^2 of a least squares line is the square of the correlation coefficient.
+    r_value = np.corrcoef(x, y)[0, 1]
 
-    return r_value**2
+    return float(r_value**2)
 
+@Profiler.Profiled("analysis")
 def GetAllRSquaredValues(logFolder: str) -> list[float]:
     """Gets all of the R^2 values from a folder of logs.
     
@@ -136,8 +383,7 @@ def GetAllRSquaredValues(logFolder: str) -> list[float]:
     """
     output = []
 
-    for file in os.listdir(logFolder):
-        fileName = f"{logFolder}/{file}"
+    for fileName in ListLogFiles(logFolder):
         timestamps, batteryLevels = ExtractBatteryUsageDataFromFile(fileName)
         rSquared = GetRSquared(timestamps, batteryLevels)
         output.append(rSquared)
@@ -158,35 +404,162 @@ def ExtractHeaderFromFile(fileName: str) -> Tuple[float, float, float, bool, int
             the drone was the leading drone, and the trial number.
     """
 
-    file = open(fileName, "r")
+    metadata = ReadLogMetadata(fileName)
 
-    # Stores the lines as an array.
-    lines = file.readlines()
+    # Checks that every field needed to identify the trial is in the header.
+    for field in ("velocity", "horizontalSeparation", "verticalSeparation", "leading", "trial"):
+        if (getattr(metadata, field) is None):
+            raise ValueError(f"The header of {fileName} has no {field}")
 
-    velocity = lines[5].split(":")
-    velocity = float(velocity[1])
+    return metadata.velocity, metadata.horizontalSeparation, metadata.verticalSeparation, metadata.leading, metadata.trial
 
-    horizontalSeparation = lines[6].split(":")
-    horizontalSeparation = float(horizontalSeparation[1])
+def ExtractStartTimeFromFile(fileName: str) -> datetime.datetime:
+    """Extracts the date and time a trial started from the header of a .csv file.
 
-    verticalSeparation = lines[7].split(":")
-    verticalSeparation = float(verticalSeparation[1])
+    Parameters:
+        fileName: str
+            The file to parse.
 
-    heightAboveDefault = lines[8].split(":")
-    heightAboveDefault = float(heightAboveDefault[1])
+    Returns:
+        datetime.datetime:
+            The date and time written to the header when the log was created.
+    """
 
-    # Determines whether the drone was leading or trailing based on its extra vertical height.
-    if (heightAboveDefault == 0.0):
-        leading = False
-    else:
-        leading = True
-    
-    trialNum = lines[9].split(":")
-    trialNum = int(trialNum[1])
+    startTime = ReadLogMetadata(fileName).GetStartTime()
+    if (startTime is None):
+        raise ValueError(f"The header of {fileName} has no date or time")
+
+    return startTime
+
+@Profiler.Profiled("analysis")
+def PairLeaderTrailerFiles(folder: str, tolerance: float=60.0) -> list[Tuple[str, str]]:
+    """Pairs the logs of the leading and trailing drones that flew together.
+
+    Logs are paired if they have the same configuration and trial number and
+    were created within the tolerance of each other. Each leading log is
+    paired with the closest trailing log in time.
+
+    Parameters:
+        folder: str
+            The folder containing the logs.
+        tolerance: float
+            The largest difference in s between the creation times of two paired logs.
+
+    Returns:
+        list[Tuple[str, str]]:
+            A list of (leadingFile, trailingFile) pairs. Logs without
+            a partner are left out.
+    """
+
+    leading = []
+    trailing = {}
+    for fileName in ListLogFiles(folder):
+        vel, hSep, vSep, lead, trialNum = ExtractHeaderFromFile(fileName)
+        key = (vel, hSep, vSep, trialNum)
+        startTime = ExtractStartTimeFromFile(fileName)
+
+        if (lead):
+            leading.append((key, startTime, fileName))
+        elif key in trailing.keys():
+            trailing[key].append((startTime, fileName))
+        else:
+            trailing[key] = [(startTime, fileName),]
+
+    pairs = []
+    for key, startTime, fileName in leading:
+        candidates = trailing.get(key, [])
+        if (len(candidates) == 0):
+            continue
 
-    return velocity, horizontalSeparation, verticalSeparation, leading, trialNum
+        # Finds the trailing log created closest in time to this one.
+        closest = min(candidates, key=lambda candidate: abs((candidate[0] - startTime).total_seconds()))
+        if (abs((closest[0] - startTime).total_seconds()) <= tolerance):
+            pairs.append((fileName, closest[1]))
+            candidates.remove(closest)
 
-def ExtractBatteryUsageFromFolder(folder: str, percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE) -> dict[tuple[float, float, float, bool], float]:
+    return pairs
+
+@Profiler.Profiled("analysis")
+def ExtractTrialRatesFromFolder(folder: str, percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE,
+                                estimator: str="ols", prefilter: str=None, excludeFailed: bool=False) -> Tuple[list[tuple[float, float, float, bool]], np.ndarray, list[str]]:
+    """Gets the battery usage rate of every trial in a folder.
+
+    Every trial is fitted at once, without averaging trials
+    of the same configuration. If the estimator supports weights, each
+    sample is weighted by the period it was logged at, so that the parts
+    of a trial logged at a faster rate don't count for more.
+
+    Parameters:
+        folder: str
+            The folder where the data is stored.
+        percentage: bool
+            Determines whether to return the rates in V/s or %/s.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting,
+            from SlopeEstimators.FILTERS.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control.
+
+    Returns:
+        Tuple[list[tuple[float, float, float, bool]], np.ndarray, list[str]]:
+            A tuple containing the (velocity, horizontalSeparation, verticalSeparation, leading)
+            configuration of each trial, the battery usage rate of each trial in V/s or %/s,
+            and the file of each trial.
+    """
+
+    return ExtractTrialRatesFromFiles(ListLogFiles(folder, excludeFailed), percentage, minVoltage, maxVoltage, estimator, prefilter)
+
+def ExtractTrialRatesFromFiles(files: list[str], percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE,
+                               estimator: str="ols", prefilter: str=None) -> Tuple[list[tuple[float, float, float, bool]], np.ndarray, list[str]]:
+    """Gets the battery usage rate of every trial in a list of logs.
+
+    Fits the trials the same way as ExtractTrialRatesFromFolder, so that
+    the rates of a few new logs can be added to those of a whole folder.
+
+    Parameters:
+        files: list[str]
+            The log files, which may come from several folders.
+        percentage: bool
+            Determines whether to return the rates in V/s or %/s.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting,
+            from SlopeEstimators.FILTERS.
+
+    Returns:
+        Tuple[list[tuple[float, float, float, bool]], np.ndarray, list[str]]:
+            The configurations, rates and files, as given by ExtractTrialRatesFromFolder.
+    """
+
+    data, files = LoadFilesArrays(files)
+    weights = data["period"] if estimator in WEIGHTED_ESTIMATORS else None
+    rates = EstimateSlopes(data["trial"], data["time"], data["batteryV"], len(files), estimator, prefilter, weights)
+
+    # If desired, we convert from V/s to %/s.
+    if (percentage):
+        rates = rates * 100 / (maxVoltage - minVoltage)
+
+    keys = []
+    for fileName in files:
+        vel, horiz, vert, leading, trialNum = ExtractHeaderFromFile(fileName)
+        keys.append((vel, horiz, vert, leading))
+
+    return keys, rates, files
+
+@Profiler.Profiled("analysis")
+def ExtractBatteryUsageFromFolder(folder: str, percentage: bool=False, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE,
+                                  estimator: str="ols", prefilter: str=None, excludeFailed: bool=False) -> dict[tuple[float, float, float, bool], float]:
     """Extracts the battery usage for each trial from a folder.
 
     Automatically averages all the trials for the same configuration
@@ -195,13 +568,22 @@ def ExtractBatteryUsageFromFolder(folder: str, percentage: bool=False, minVoltag
     Parameters:
         folder: str
             The folder where the data is stored.
-            Assumes the only thing in this folder is valid .csv files.
+            Assumes every .csv file in this folder is a valid log.
         percentage: bool
             Determines whether to return the rates in V/s or %/s.
         minVoltage: float
             The voltage corresponding to a fully uncharged battery.
         maxVoltage: float
             The voltage corresponding to a fully charged battery.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+            Uses ordinary least squares by default.
+        prefilter: str
+            The filter to apply to the battery levels before fitting,
+            from SlopeEstimators.FILTERS. No filter is applied by default.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control, as
+            recorded in the folder's manifest. The logs aren't rescanned.
 
     Returns:
         dict[list[float, float, float, bool], (float, float)]:
@@ -213,17 +595,35 @@ def ExtractBatteryUsageFromFolder(folder: str, percentage: bool=False, minVoltag
                 that configuration in V/s or %/s, and the variance of that configuration.
     """
 
+    keys, rates, files = ExtractTrialRatesFromFolder(folder, percentage, minVoltage, maxVoltage, estimator, prefilter, excludeFailed)
+
+    return GroupRatesByConfiguration(keys, rates)
+
+def GroupRatesByConfiguration(keys: list[tuple[float, float, float, bool]], rates: list[float]) -> dict[tuple[float, float, float, bool], float]:
+    """Averages the battery usage rates of the trials with the same configuration.
+
+    Parameters:
+        keys: list[tuple[float, float, float, bool]]
+            The (velocity, horizontalSeparation, verticalSeparation, leading) configuration of each trial.
+        rates: list[float]
+            The battery usage rate of each trial.
+
+    Returns:
+        dict[tuple[float, float, float, bool], (float, float)]:
+            The (mean, std. dev.) of each configuration, in the order
+            that the configurations first appear, as given by ExtractBatteryUsageFromFolder.
+            Configurations whose trials have no rate are left out.
+    """
+
     # Stores the list of the battery rates in each configuration.
     batteryRates = {}
 
-    for file in os.listdir(folder):
-        vel, horiz, vert, leading, trialNum = ExtractHeaderFromFile(folder + "/" + file)
-        key = (vel, horiz, vert, leading)
+    for key, rate in zip(keys, rates):
+        rate = float(rate)
 
-        rate = ExtractBatteryUsageRateFromFile(folder + "/" + file)
-        # If desired, we convert from V/s to %/s.
-        if (percentage):
-            rate = rate * 100 / (maxVoltage - minVoltage)
+        # Leaves out trials without a rate, such as logs with only a header.
+        if (np.isnan(rate)):
+            continue
 
         # If we've already seen this entry before, append it to the
         # corresponding list.
@@ -238,7 +638,11 @@ def ExtractBatteryUsageFromFolder(folder: str, percentage: bool=False, minVoltag
     for key in batteryRates.keys():
         currentList = batteryRates[key]
         mean = statistics.mean(currentList)
-        stddev = statistics.stdev(currentList)
+        # The std. dev. is undefined when a configuration only has one trial.
+        if (len(currentList) > 1):
+            stddev = statistics.stdev(currentList)
+        else:
+            stddev = float("nan")
         batteryRates[key] = (mean, stddev)
 
     return batteryRates
@@ -277,7 +681,30 @@ def FilterDronePositions(rates: dict[tuple[float, float, float, bool], float], f
 
     return output
 
-def SaveBatteryPlotToFolder(fileName: str, outputFolder: str, convertToPercentage: bool=True, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE) -> None:
+def FormatRates(ratesVoltage: dict[tuple[float, float, float, bool], float], ratesPercentage: dict[tuple[float, float, float, bool], float]) -> str:
+    """Formats the mean battery usage rate of each configuration in the format of rates.csv.
+
+    Parameters:
+        ratesVoltage: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration in V/s, as given by ExtractBatteryUsageFromFolder.
+        ratesPercentage: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration in %/s.
+
+    Returns:
+        str:
+            A line per configuration, followed by the number of configurations.
+    """
+
+    lines = ["(velocity (m/s),horizontal (m),vertical (m),leading),rate (V/s),stddev (V/s), rate (%/s),stddev (%/s)"]
+    for key in ratesVoltage.keys():
+        vel, hSep, vSep, lead = key
+        lines.append(f"({vel},{hSep},{vSep},{lead}),{ratesVoltage[key][0]},{ratesVoltage[key][1]},{ratesPercentage[key][0]},{ratesPercentage[key][1]}")
+    lines.append("")
+    lines.append(f"Total number of unique datasets: {len(ratesVoltage.keys())}")
+
+    return "\n".join(lines)
+
+def SaveBatteryPlotToFolder(fileName: str, outputFolder: str, convertToPercentage: bool=True, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE) -> str:
     """Plots the battery level over time and saves it to a folder.
 
     Parameters:
@@ -291,11 +718,42 @@ def SaveBatteryPlotToFolder(fileName: str, outputFolder: str, convertToPercentag
             The voltage corresponding to a fully uncharged battery.
         maxVoltage: float
             The voltage corresponding to a fully charged battery.
+
+    Returns:
+        str:
+            The file the plot was saved to, named after the trial's header.
     """
     
     # Extracts the data from the file.
     timestamps, batteryLevels = ExtractBatteryUsageDataFromFile(fileName)
-    
+
+    return SaveBatteryPlot(timestamps, batteryLevels, ExtractHeaderFromFile(fileName), outputFolder, convertToPercentage, minVoltage, maxVoltage)
+
+def SaveBatteryPlot(timestamps: list[float], batteryLevels: list[float], header: Tuple[float, float, float, bool, int], outputFolder: str,
+                    convertToPercentage: bool=True, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE) -> str:
+    """Plots the battery level over time of a trial which has already been read, and saves it to a folder.
+
+    Parameters:
+        timestamps: list[float]
+            The time in s of each sample since the start of the trial.
+        batteryLevels: list[float]
+            The battery level in volts of each sample.
+        header: Tuple[float, float, float, bool, int]
+            The header of the trial, as given by ExtractHeaderFromFile.
+        outputFolder: str
+            The folder to save the plot to.
+        convertToPercentage: bool
+            Whether to plot the battery level in percentage or volts.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+
+    Returns:
+        str:
+            The file the plot was saved to, named after the trial's header.
+    """
+
     # Converts the voltages to percentages if desired.
     if (convertToPercentage):
         batteryLevels = [(bat - minVoltage) / (maxVoltage - minVoltage) for bat in batteryLevels]
@@ -304,11 +762,14 @@ def SaveBatteryPlotToFolder(fileName: str, outputFolder: str, convertToPercentag
     trendlineBatteryLevels = CreateTrendline(timestamps, batteryLevels)
 
     # Gets the file label.
-    vel, hSep, vSep, isLead, trialNum = ExtractHeaderFromFile(fileName)
+    vel, hSep, vSep, isLead, trialNum = header
 
     # Determines the next valid file name.
     outputFileName = f"({vel}, {hSep}, {vSep}, {isLead})-{trialNum}"
 
+    # Imported here since matplotlib is slow to import and most tasks don't plot.
+    import matplotlib.pyplot as plt
+
     # Plots the curve.
     plt.plot(timestamps, batteryLevels, 'o', color="black", markersize=3)
     # Plots the trendline.
@@ -327,9 +788,13 @@ def SaveBatteryPlotToFolder(fileName: str, outputFolder: str, convertToPercentag
     plt.legend(loc="lower right")
 
     # Saves the figure to the output folder.
-    plt.savefig(outputFolder + "/" + outputFileName + ".png")
+    outputFileName = outputFolder + "/" + outputFileName + ".png"
+    plt.savefig(outputFileName)
     plt.clf()
 
+    return outputFileName
+
+@Profiler.Profiled("analysis")
 def PlotBatteryFromFolder(folderName: str, outputFolder: str, convertToPercentage: bool=True, minVoltage: float=MIN_VOLTAGE, maxVoltage: float=MAX_VOLTAGE) -> None:
     """Plots the battery level over time of all the trial files in a folder.
     
@@ -346,14 +811,15 @@ def PlotBatteryFromFolder(folderName: str, outputFolder: str, convertToPercentag
             The voltage corresponding to a fully charged battery.
     """ 
 
-    for file in os.listdir(folderName):
-        SaveBatteryPlotToFolder(folderName + "/" + file, outputFolder, convertToPercentage, minVoltage, maxVoltage)
+    for fileName in ListLogFiles(folderName):
+        SaveBatteryPlotToFolder(fileName, outputFolder, convertToPercentage, minVoltage, maxVoltage)
 
 def ReplaceLineInFile(fileName: str, lineNumber: int, text: str) -> None:
     """Replaces a line in a file with the desired text.
     
     Used once to fix the header files of old trials that weren't originally used.
     Not currently used in any code, left here for transparency and bookkeeping.
+    Use HeaderMigration.MigrateHeaders to change the headers of logs instead.
     
     Parameters:
         fileName: str
@@ -378,6 +844,7 @@ def ReplaceLineInFile(fileName: str, lineNumber: int, text: str) -> None:
     for line in lines:
         file.write(line)
 
+@Profiler.Profiled("analysis")
 def DetermineMinAndMaxFromFolder(folderName: str) -> tuple[float, float]:
     """Determines the minimum and maximum battery voltage that occurs in a folder of .csv files.
     
@@ -394,16 +861,17 @@ def DetermineMinAndMaxFromFolder(folderName: str) -> tuple[float, float]:
     maxs = []
 
     # Loops through the files in the folder.
-    for file in os.listdir(folderName):
+    for fileName in ListLogFiles(folderName):
         # Gets the min and max battery level in volts from the file.
-        timestamps, batteryLevels = ExtractBatteryUsageDataFromFile(f"{folderName}/{file}")
+        timestamps, batteryLevels = ExtractBatteryUsageDataFromFile(fileName)
         mins.append(min(batteryLevels))
         maxs.append(max(batteryLevels))
 
     # Returns the overall min and max.
     return min(mins), max(maxs)
 
-def PlotBatteryConsumptionTable(convertToPercentage: bool, logFolder: str=LOG_FOLDER, outputFolder: str=OUTPUT_FOLDER,ncludeBarChart: bool=False) -> None:
+@Profiler.Profiled("analysis")
+def PlotBatteryConsumptionTable(convertToPercentage: bool, logFolder: str=LOG_FOLDER, outputFolder: str=OUTPUT_FOLDER, includeBarChart: bool=False) -> None:
     """Plots the battery consumption values as a table from a folder.
     
     Parameters:
@@ -418,7 +886,79 @@ def PlotBatteryConsumptionTable(convertToPercentage: bool, logFolder: str=LOG_FO
     """
 
     # Gets the battery usage rates in V/s or %/s.
-    rates = ExtractBatteryUsageFromFolder(LOG_FOLDER, convertToPercentage)
+    rates = ExtractBatteryUsageFromFolder(logFolder, convertToPercentage)
+
+    SaveConsumptionTable(rates, outputFolder)
+    if (includeBarChart):
+        SaveConsumptionBarChart(rates, outputFolder)
+
+def SaveConsumptionBarChart(rates: dict[tuple[float, float, float, bool], float], outputFolder: str=OUTPUT_FOLDER,
+                            width: float=0.25) -> str:
+    """Plots the trailing drones' battery consumption values as a bar chart and saves it to a folder.
+
+    Parameters:
+        rates: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration, as given by ExtractBatteryUsageFromFolder.
+        outputFolder: str
+            The folder to output the bar chart to.
+        width: float
+            The width of each bar.
+
+    Returns:
+        str:
+            The file the bar chart was saved to.
+    """
+
+    # Imported here since matplotlib is slow to import and most tasks don't plot.
+    import matplotlib.pyplot as plt
+
+    # Filters out all of the leading drones, so we are left with only trailing drones.
+    rates = FilterDronePositions(rates, False)
+
+    # Uses the same configurations as the table, with a group of bars per vertical separation.
+    possibleVelocities = (0.5, 0.75, 1.0)
+    possibleVerticalSeparations = (0.25, 0.5, 0.75)
+    x = np.arange(len(possibleVerticalSeparations))
+
+    fig, ax = plt.subplots(layout='constrained')
+    ax.grid(axis='y')
+    ax.set_axisbelow(True)
+
+    for i, vel in enumerate(possibleVelocities):
+        # Configurations without any trials yet are drawn as empty bars.
+        entries = [rates.get((vel, 1.0, sep, False)) for sep in possibleVerticalSeparations]
+        means = [entry[0] if entry is not None else 0.0 for entry in entries]
+        errors = [entry[1] if entry is not None else 0.0 for entry in entries]
+        ax.bar(x + width * i, means, width, yerr=errors, capsize=3, label=f"{vel} m/s")
+
+    ax.set_ylabel("Battery Consumption Rate")
+    ax.set_xlabel("Vertical Separation (m)")
+    ax.set_xticks(x + width * (len(possibleVelocities) - 1) / 2, [str(sep) for sep in possibleVerticalSeparations])
+    ax.legend(loc='upper left')
+
+    # Saves the figure.
+    outputFileName = f"{outputFolder}/ConsumptionBarChart.png"
+    plt.savefig(outputFileName)
+    plt.close(fig)
+
+    return outputFileName
+
+def SaveConsumptionTable(rates: dict[tuple[float, float, float, bool], float], outputFolder: str=OUTPUT_FOLDER) -> str:
+    """Plots the trailing drones' battery consumption values as a table and saves it to a folder.
+
+    Parameters:
+        rates: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration, as given by ExtractBatteryUsageFromFolder.
+        outputFolder: str
+            The folder to output the table to.
+
+    Returns:
+        str:
+            The file the table was saved to.
+    """
+
+    # Imported here since matplotlib is slow to import and most tasks don't plot.
+    import matplotlib.pyplot as plt
 
     # Filters out all of the leading drones, so we are left with only trailing drones.
     rates = FilterDronePositions(rates, False)
@@ -429,11 +969,12 @@ def PlotBatteryConsumptionTable(convertToPercentage: bool, logFolder: str=LOG_FO
 
     # Defines the data.
     # Reminder: keys for rates dictionary are of the form (vel, hsep, vsep, lead).
-    data = [[rates[(vel, 1.0, 0.25, False)] for vel in possibleVelocities],
-            [rates[(vel, 1.0, 0.5, False)] for vel in possibleVelocities],
-            [rates[(vel, 1.0, 0.75, False)] for vel in possibleVelocities]]
+    data = [[rates.get((vel, 1.0, 0.25, False)) for vel in possibleVelocities],
+            [rates.get((vel, 1.0, 0.5, False)) for vel in possibleVelocities],
+            [rates.get((vel, 1.0, 0.75, False)) for vel in possibleVelocities]]
     
-    data = [[f"{0:1.1f}".format(entry) for entry in row] for row in data]
+    # Shows the mean and std. dev. of each configuration, leaving those without any trials yet blank.
+    data = [[f"{entry[0]:.2f} ± {entry[1]:.2f}" if entry is not None else "-" for entry in row] for row in data]
 
     # Defines the row and column headers.
     columns = [str(vel) for vel in possibleVelocities]
@@ -449,8 +990,13 @@ def PlotBatteryConsumptionTable(convertToPercentage: bool, logFolder: str=LOG_FO
     plt.box(on=None)
 
     # Saves the figure.
-    plt.savefig(f"{outputFolder}/ConsumptionTable.png")
+    outputFileName = f"{outputFolder}/ConsumptionTable.png"
+    plt.savefig(outputFileName)
+    plt.clf()
+
+    return outputFileName
 
+@Profiler.Profiled("analysis")
 def CalculatePositionVariance(logFolder: str) -> list[float]:
     """Calculates the variance in the position parameters from what they were meant to be.
     
@@ -466,8 +1012,8 @@ def CalculatePositionVariance(logFolder: str) -> list[float]:
     yResiduals = []
     zResiduals = []
 
-    for file in os.listdir(logFolder):
-        vel, hSep, vSep, lead, trialNum = ExtractHeaderFromFile(f"{logFolder}/{file}")
+    for fileName in ListLogFiles(logFolder):
+        vel, hSep, vSep, lead, trialNum = ExtractHeaderFromFile(fileName)
         
         # Determines the desired coordinates y and z positions during the trial.
         desiredY = 0
@@ -477,8 +1023,8 @@ def CalculatePositionVariance(logFolder: str) -> list[float]:
             desiredZ = 0.5
 
         # Extracts the columns.
-        y = ExtractColumnFromLog(f"{logFolder}/{file}", "y")
-        z = ExtractColumnFromLog(f"{logFolder}/{file}", "z")
+        y = ExtractColumnFromLog(fileName, "y")
+        z = ExtractColumnFromLog(fileName, "z")
 
         # Appends the list of square errors to the residuals list.
         yResiduals += [(realY - desiredY)**2 for realY in y]
@@ -493,31 +1039,6 @@ def CalculatePositionVariance(logFolder: str) -> list[float]:
 
 # ===========================================================================================================
 
-# posVar = CalculatePositionVariance(LOG_FOLDER)
-# print(f"Y Variance: {posVar[0]}, Z Variance: {posVar[1]}")
-# rSquareds = GetAllRSquaredValues(LOG_FOLDER)
-# mean = statistics.mean(rSquareds)
-# var = statistics.variance(rSquareds)
-# print(f"Mean R^2: {mean}, Variance of R^2: {var}, Max: {max(rSquareds)}, Min: {min(rSquareds)}")
-
-# file = open("rates.csv", 'w')
-
-# # Gets the battery usage rates in V/s and %/s.
-# ratesVoltage = ExtractBatteryUsageFromFolder(LOG_FOLDER)
-# ratesPercentage = ExtractBatteryUsageFromFolder(LOG_FOLDER, True)
-
-# # Filters out all of the leading drones, so we are left with only trailing drones.
-# ratesVoltage = FilterDronePositions(ratesVoltage, False)
-# ratesPercentage = FilterDronePositions(ratesPercentage, False)
-
-# # Writes it to the file.
-# file.write("(velocity (m/s), horizontal (m), vertical (m), leading), rate (V/s), stddev (V/s), rate (%/s), stddev (%/s)\n")
-# for key in ratesVoltage.keys():
-#     file.write(f"{key}, {ratesVoltage[key][0]}, {ratesVoltage[key][1]}, {ratesPercentage[key][0]}, {ratesPercentage[key][1]}\n")
-
-# file.write(f"\nTotal number of unique datasets: {len(ratesVoltage.keys())}")
-
-# PlotBatteryFromFolder(LOG_FOLDER, OUTPUT_FOLDER + "/volts", False)
-# PlotBatteryFromFolder(LOG_FOLDER, OUTPUT_FOLDER + "/percentage")
-
-PlotBatteryConsumptionTable(True, LOG_FOLDER)
\ No newline at end of file
+if __name__ == "__main__":
+    # The other analyses are run from cli.py, e.g. python cli.py rates --output rates.csv
+    PlotBatteryConsumptionTable(True, LOG_FOLDER)
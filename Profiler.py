@@ -0,0 +1,306 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+from AtomicWrite import AtomicWrite
+
+"""Records spans, instants and counters on a timeline, for finding where trials and analysis are slow.
+
+Profiling is off by default, and every call returns straight away while it is
+off, so the hooks can stay in the hot paths (logs.LogCallback,
+CommanderFlight.UpdateState, the setpoint loops and the ParseData folder
+functions). Turn it on with Enable, or by setting the PROFILE_TRACE environment
+variable to a file, in which case the trace is written there when the program exits.
+
+The timeline is exported in the Chrome trace event format, which can be
+opened in chrome://tracing or https://ui.perfetto.dev, with a row per thread.
+
+Usage:
+    Profiler.Enable()
+    with Profiler.Span("MoveToPosition", "flight"):
+        ...
+    Profiler.ExportTrace("trace.json")
+
+Methods:
+    Enable:
+        Starts recording events.
+    Disable:
+        Stops recording events.
+    IsEnabled:
+        Checks whether events are being recorded.
+    Reset:
+        Throws away every recorded event.
+    Span:
+        Records how long a block of code takes.
+    Profiled:
+        Records how long every call of a function takes.
+    Instant:
+        Records that something happened.
+    Count:
+        Adds to a counter.
+    GetEvents:
+        Gets every recorded event.
+    Summarise:
+        Totals the time spent in each span.
+    ExportTrace:
+        Writes the recorded events to a Chrome trace file.
+"""
+
+# The environment variable which, if set to a file, turns profiling on and writes the trace there at exit.
+TRACE_ENVIRONMENT_VARIABLE = "PROFILE_TRACE"
+
+_enabled = False
+_events = []
+_counters = {}
+_threadNames = {}
+_lock = threading.Lock()
+# The time that event timestamps are measured from.
+_origin = time.perf_counter()
+
+class _NullSpan:
+    """A span which records nothing, returned while profiling is off.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    """A span which records how long the block of code inside it takes.
+    """
+
+    def __init__(self, name: str, category: str, args: dict):
+        """Initialises a _Span object.
+
+        Parameters:
+            name: str
+                The name of the span.
+            category: str
+                The category of the span, e.g. "flight".
+            args: dict
+                Any values to attach to the span.
+        """
+
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter()
+        _Record({
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start - _origin) * 1e6,
+            "dur": (end - self.start) * 1e6,
+            "args": self.args,
+        })
+        return False
+
+def _Record(event: dict) -> None:
+    """Adds an event to the timeline, labelled with the current process and thread.
+
+    Parameters:
+        event: dict
+            The event, in the Chrome trace event format.
+    """
+
+    thread = threading.current_thread()
+    event["pid"] = os.getpid()
+    event["tid"] = thread.ident
+    _threadNames[thread.ident] = thread.name
+    _events.append(event)
+
+def Enable() -> None:
+    """Starts recording events.
+    """
+
+    global _enabled
+    _enabled = True
+
+def Disable() -> None:
+    """Stops recording events. Events that were already recorded are kept.
+    """
+
+    global _enabled
+    _enabled = False
+
+def IsEnabled() -> bool:
+    """Checks whether events are being recorded.
+
+    Returns:
+        bool:
+            Whether profiling is on.
+    """
+
+    return _enabled
+
+def Reset() -> None:
+    """Throws away every recorded event and counter.
+    """
+
+    with _lock:
+        _events.clear()
+        _counters.clear()
+        _threadNames.clear()
+
+def Span(name: str, category: str="", **args):
+    """Records how long a block of code takes.
+
+    Parameters:
+        name: str
+            The name of the span.
+        category: str
+            The category of the span, e.g. "logging", "flight" or "analysis".
+        **args:
+            Any values to attach to the span.
+
+    Returns:
+        A context manager which records the span when it exits.
+    """
+
+    if (not _enabled):
+        return _NULL_SPAN
+
+    return _Span(name, category, args)
+
+def Profiled(category: str=""):
+    """Records how long every call of a function takes.
+
+    Parameters:
+        category: str
+            The category of the spans.
+
+    Returns:
+        A decorator which wraps a function in a span named after it.
+    """
+
+    def Decorator(function):
+        @functools.wraps(function)
+        def Wrapper(*args, **kwargs):
+            if (not _enabled):
+                return function(*args, **kwargs)
+
+            with _Span(function.__name__, category, {}):
+                return function(*args, **kwargs)
+
+        return Wrapper
+
+    return Decorator
+
+def Instant(name: str, category: str="", **args) -> None:
+    """Records that something happened.
+
+    Parameters:
+        name: str
+            The name of the event.
+        category: str
+            The category of the event.
+        **args:
+            Any values to attach to the event.
+    """
+
+    if (not _enabled):
+        return
+
+    _Record({
+        "name": name,
+        "cat": category,
+        "ph": "i",
+        "s": "t",
+        "ts": (time.perf_counter() - _origin) * 1e6,
+        "args": args,
+    })
+
+def Count(name: str, value: float=1) -> None:
+    """Adds to a counter, recording its new total on the timeline.
+
+    Parameters:
+        name: str
+            The name of the counter.
+        value: float
+            The amount to add.
+    """
+
+    if (not _enabled):
+        return
+
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+
+    _Record({
+        "name": name,
+        "ph": "C",
+        "ts": (time.perf_counter() - _origin) * 1e6,
+        "args": {name: total},
+    })
+
+def GetEvents() -> list[dict]:
+    """Gets every recorded event.
+
+    Returns:
+        list[dict]:
+            The events in the Chrome trace event format, with timestamps and durations in μs.
+    """
+
+    with _lock:
+        return list(_events)
+
+def Summarise() -> dict[str, dict]:
+    """Totals the time spent in each span.
+
+    Returns:
+        dict[str, dict]:
+            For each span name, the number of calls, and the total, mean and max time in s.
+    """
+
+    summary = {}
+    for event in GetEvents():
+        if (event["ph"] != "X"):
+            continue
+
+        duration = event["dur"] / 1e6
+        entry = summary.setdefault(event["name"], {"calls": 0, "total": 0.0, "max": 0.0})
+        entry["calls"] += 1
+        entry["total"] += duration
+        entry["max"] = max(entry["max"], duration)
+
+    for entry in summary.values():
+        entry["mean"] = entry["total"] / entry["calls"]
+
+    return summary
+
+def ExportTrace(fileName: str) -> None:
+    """Writes the recorded events to a Chrome trace file.
+
+    Parameters:
+        fileName: str
+            The .json file to write the trace to.
+    """
+
+    events = GetEvents()
+
+    # Names each thread's row on the timeline.
+    for threadId, threadName in list(_threadNames.items()):
+        events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": threadId, "args": {"name": threadName}})
+
+    with AtomicWrite(fileName) as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+# Turns profiling on for the whole run if the environment variable is set.
+if (os.environ.get(TRACE_ENVIRONMENT_VARIABLE)):
+    Enable()
+    atexit.register(ExportTrace, os.environ[TRACE_ENVIRONMENT_VARIABLE])
@@ -0,0 +1,153 @@
+import os
+import numpy as np
+
+from LogFolder import LoadManifest, SaveManifest
+from ParseData import ListLogFiles, LoadFilesArrays, ExtractHeaderFromFile, MIN_VOLTAGE, MAX_VOLTAGE
+
+"""Checks the quality of every trial in a log folder.
+
+Every log in the folder is checked in a single vectorised pass, and the
+verdict for each trial is stored in the folder's manifest, so that
+ParseData.ExtractBatteryUsageFromFolder can leave out the failed trials
+without rescanning the logs.
+
+The checks are
+    "overshoot": the drone travelled too far above the target velocity too often,
+    "deviation": the drone strayed too far from the planned path,
+    "packetLoss": too many packets went missing,
+    "short": the log has too few samples, and
+    "voltage": the battery voltage is out of range or jumps suddenly.
+
+Methods:
+    RunQualityControl:
+        Checks every trial in a folder and records the verdicts in its manifest.
+"""
+
+# The fraction above the target velocity which counts as overshooting. Matches logs.StartLogging.
+VELOCITY_THRESHOLD = 0.1
+# The largest fraction of samples which may overshoot the target velocity.
+MAX_OVERSHOOT_FRACTION = 0.1
+# The largest distance in m from the planned path.
+MAX_DEVIATION = 0.25
+# The largest fraction of packets which may go missing.
+MAX_PACKET_LOSS = 0.05
+# The smallest number of samples in a usable log.
+MIN_SAMPLES = 15
+# The largest change in voltage between two samples.
+MAX_VOLTAGE_JUMP = 0.15
+
+def RunQualityControl(folder: str, velocityThreshold: float=VELOCITY_THRESHOLD, maxOvershootFraction: float=MAX_OVERSHOOT_FRACTION,
+                      maxDeviation: float=MAX_DEVIATION, maxPacketLoss: float=MAX_PACKET_LOSS,
+                      minSamples: int=MIN_SAMPLES, maxVoltageJump: float=MAX_VOLTAGE_JUMP, minVoltage: float=MIN_VOLTAGE,
+                      maxVoltage: float=MAX_VOLTAGE, files: list[str]=None) -> dict[str, dict]:
+    """Checks every trial in a folder and records the verdicts in its manifest.
+
+    The planned path is the straight line flown by flight.RunOneTrial, at y = 0
+    and at the height used by ParseData.CalculatePositionVariance.
+
+    Parameters:
+        folder: str
+            The folder containing the logs.
+        velocityThreshold: float
+            The fraction above the target velocity which counts as overshooting.
+        maxOvershootFraction: float
+            The largest fraction of samples which may overshoot the target velocity.
+        maxDeviation: float
+            The largest distance in m from the planned path.
+        maxPacketLoss: float
+            The largest fraction of packets which may go missing.
+        minSamples: int
+            The smallest number of samples in a usable log.
+        maxVoltageJump: float
+            The largest change in voltage between two samples.
+        minVoltage: float
+            The lowest valid battery voltage.
+        maxVoltage: float
+            The highest valid battery voltage.
+        files: list[str]
+            The logs in the folder to check, e.g. only the logs that are new.
+            The records of the other logs in the manifest are kept.
+            Checks every log in the folder by default.
+
+    Returns:
+        dict[str, dict]:
+            A dictionary mapping the name of each checked log file to its quality record,
+            which contains the "verdict" ("pass" or "fail"), the list of "flags"
+            which were raised, and the measurements behind each check.
+    """
+
+    if (files is None):
+        files = ListLogFiles(folder)
+    data, files = LoadFilesArrays(files)
+    trial = data["trial"]
+    numTrials = len(files)
+
+    # Gets the target velocity and planned height of every trial.
+    velocities = np.zeros(numTrials)
+    plannedHeights = np.zeros(numTrials)
+    for i, fileName in enumerate(files):
+        vel, hSep, vSep, lead, trialNum = ExtractHeaderFromFile(fileName)
+        velocities[i] = vel
+        plannedHeights[i] = 0.5 + vSep if lead else 0.5
+
+    samples = np.bincount(trial, minlength=numTrials)
+
+    # Counts the samples which overshoot the target velocity.
+    overshoots = np.bincount(trial, data["vx"] >= velocities[trial] * (1 + velocityThreshold), minlength=numTrials)
+    overshootFractions = overshoots / samples
+
+    # Gets the largest distance from the planned path.
+    deviations = np.hypot(data["y"], data["z"] - plannedHeights[trial])
+    maxDeviations = np.zeros(numTrials)
+    np.maximum.at(maxDeviations, trial, deviations)
+
+    # Counts the packets which should have arrived between each pair of samples but didn't,
+    # using the period that each sample was logged at.
+    sameTrial = trial[1:] == trial[:-1]
+    gaps = np.diff(data["timestamp"])[sameTrial]
+    missing = np.maximum(np.round(gaps / data["period"][1:][sameTrial]) - 1, 0)
+    missingPackets = np.bincount(trial[1:][sameTrial], missing, minlength=numTrials)
+    packetLoss = missingPackets / (samples + missingPackets)
+    maxGaps = np.zeros(numTrials)
+    np.maximum.at(maxGaps, trial[1:][sameTrial], gaps)
+
+    # Counts the samples that are out of range or jump from the previous sample.
+    outOfRange = (data["batteryV"] < minVoltage) | (data["batteryV"] > maxVoltage)
+    jumps = np.zeros(len(trial), dtype=bool)
+    jumps[1:] = sameTrial & (np.abs(np.diff(data["batteryV"])) > maxVoltageJump)
+    voltageAnomalies = np.bincount(trial, outOfRange | jumps, minlength=numTrials)
+
+    # Updates the manifest with the records.
+    manifest = LoadManifest(folder)
+    output = {}
+    for i, fileName in enumerate(files):
+        flags = []
+        if (overshootFractions[i] > maxOvershootFraction):
+            flags.append("overshoot")
+        if (maxDeviations[i] > maxDeviation):
+            flags.append("deviation")
+        if (packetLoss[i] > maxPacketLoss):
+            flags.append("packetLoss")
+        if (samples[i] < minSamples):
+            flags.append("short")
+        if (voltageAnomalies[i] > 0):
+            flags.append("voltage")
+
+        record = {
+            "verdict": "fail" if flags else "pass",
+            "flags": flags,
+            "samples": int(samples[i]),
+            "overshootFraction": float(overshootFractions[i]),
+            "maxDeviation": float(maxDeviations[i]),
+            "missingPackets": int(missingPackets[i]),
+            "maxGap": float(maxGaps[i]),
+            "voltageAnomalies": int(voltageAnomalies[i]),
+        }
+
+        name = os.path.basename(fileName)
+        manifest.setdefault(name, {}).update(record)
+        output[name] = record
+
+    SaveManifest(folder, manifest)
+
+    return output
@@ -0,0 +1,708 @@
+import os
+import hashlib
+import json
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable
+
+import numpy as np
+
+import ParseData
+import OtherPlots
+from AtomicWrite import AtomicWrite
+from LogArchive import OpenLog
+from SlopeEstimators import EstimateSlopes, WEIGHTED_ESTIMATORS
+
+"""Builds the report (rates.csv, the consumption table and every plot) as a graph of cached steps.
+
+Each step of the report is a node: reading a log, parsing it, fitting its
+battery usage rate, averaging the rates of each configuration, and writing
+each table and figure. Every node has a key, which is a hash of its function,
+its parameters and the keys of the nodes it depends on, and the key of a log
+is a hash of its contents. So a node's key only changes if something it was
+built from changed.
+
+The value of every node is stored in the cache folder under its key, and the
+key each file was last written with is recorded, so a build only runs the nodes
+whose key isn't in the cache. Changing one log reparses, refits and replots
+only that log before averaging and writing the rates and table again, and
+changing the parameters of one figure only redraws that figure.
+
+The nodes that need running are run in parallel once the nodes they depend on
+are done. matplotlib's pyplot keeps the figure being drawn in global state, so
+the nodes which draw are marked exclusive and only run one at a time.
+
+Usage:
+    python cli.py report
+    python ReportPipeline.py --folder ./350mAh_logs --plots ./plots --rates rates.csv
+
+Methods:
+    Node:
+        A step of a pipeline.
+    Pipeline:
+        Runs the nodes of a graph whose keys aren't cached.
+    HashLog:
+        Gets the key of a log from its contents.
+    ParseLog:
+        Parses the columns and header of a log.
+    FitLog:
+        Fits the battery usage rate of a parsed log.
+    PlotLog:
+        Plots the battery level of a parsed log.
+    AggregateRates:
+        Averages the rates of the trials with the same configuration.
+    WriteRates:
+        Writes the trailing drones' rates to a .csv file.
+    PlotTable:
+        Plots the trailing drones' rates as a table.
+    PlotComparison:
+        Plots a bar chart comparing the experimental and simulated rates.
+    CreateReportPipeline:
+        Creates the pipeline for the report of a log folder.
+"""
+
+# The folder the values of the nodes are cached in.
+CACHE_FOLDER = "./report_cache"
+# The file in the cache folder recording the key and files of every node that writes files.
+ARTIFACTS_FILE = "artifacts.json"
+# Changed whenever the output of a node function changes, so old cached values are thrown away.
+PIPELINE_VERSION = 1
+
+class Node:
+    """A step of a pipeline.
+
+    The node's function is called with the value of each of its inputs,
+    in order, followed by its parameters as keyword arguments.
+
+    Attributes:
+        name: str
+            The unique name of the node, e.g. "fit:2025-05-10-0.csv".
+        function: Callable
+            The function computing the node's value, or None for a log.
+        inputs: list[str]
+            The names of the nodes whose values are passed to the function.
+        params: dict
+            The keyword arguments passed to the function, which must be JSON serialisable.
+        artifact: bool
+            Whether the function writes files and returns their paths,
+            rather than returning a value.
+        exclusive: bool
+            Whether the function draws with pyplot, so can't run alongside other exclusive nodes.
+        source: str
+            The log file which is the node's value, or None for a computed node.
+    """
+
+    def __init__(self, name: str, function: Callable=None, inputs: list[str]=None, params: dict=None, artifact: bool=False,
+                 exclusive: bool=False, source: str=None):
+        """Initialises a Node object.
+
+        Parameters:
+            name: str
+                The unique name of the node.
+            function: Callable
+                The function computing the node's value. Leave as None for a log.
+            inputs: list[str]
+                The names of the nodes whose values are passed to the function.
+            params: dict
+                The keyword arguments passed to the function.
+            artifact: bool
+                Whether the function writes files and returns their paths.
+            exclusive: bool
+                Whether the function draws with pyplot.
+            source: str
+                The log file which is the node's value. Only used if there is no function.
+        """
+
+        if ((function is None) == (source is None)):
+            raise ValueError(f"Node {name} must have either a function or a source")
+
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs or [])
+        self.params = dict(params or {})
+        self.artifact = artifact
+        self.exclusive = exclusive
+        self.source = source
+
+class Pipeline:
+    """Runs the nodes of a graph whose keys aren't cached.
+
+    Attributes:
+        nodes: dict[str, Node]
+            The nodes of the graph, keyed by name.
+        cacheFolder: str
+            The folder the values of the nodes are cached in.
+        workers: int
+            The most nodes that are run at once, or None for ThreadPoolExecutor's default.
+
+    Methods:
+        Add:
+            Adds a node to the graph.
+        GetOrder:
+            Orders the nodes so that every node comes after its inputs.
+        GetKeys:
+            Gets the key of every node.
+        Build:
+            Runs the nodes whose keys aren't cached.
+    """
+
+    def __init__(self, cacheFolder: str=CACHE_FOLDER, workers: int=None):
+        """Initialises a Pipeline with no nodes.
+
+        Parameters:
+            cacheFolder: str
+                The folder to cache the values of the nodes in. Created if it doesn't exist.
+            workers: int
+                The most nodes to run at once. Uses ThreadPoolExecutor's default by default.
+        """
+
+        self.nodes = {}
+        self.cacheFolder = cacheFolder
+        self.workers = workers
+        # Keeps the nodes which draw with pyplot from running at the same time.
+        self._plotLock = threading.Lock()
+
+    def Add(self, node: Node) -> Node:
+        """Adds a node to the graph.
+
+        Parameters:
+            node: Node
+                The node to add, whose name must not already be in the graph.
+
+        Returns:
+            Node:
+                The node, so that its name can be used as an input.
+        """
+
+        if (node.name in self.nodes):
+            raise ValueError(f"The pipeline already has a node called {node.name}")
+
+        self.nodes[node.name] = node
+        return node
+
+    def GetOrder(self, targets: list[str]=None) -> list[str]:
+        """Orders the nodes so that every node comes after its inputs.
+
+        Parameters:
+            targets: list[str]
+                The nodes to build. Every node is built by default.
+
+        Returns:
+            list[str]:
+                The names of the targets and every node they depend on, inputs first.
+        """
+
+        order = []
+        # Maps each visited node to whether all of its inputs have been ordered.
+        visited = {}
+
+        # Walks the graph depth first without recursion, since a folder can have many logs.
+        for target in (targets if targets is not None else self.nodes.keys()):
+            stack = [(target, False)]
+            while (stack):
+                name, expanded = stack.pop()
+                if (expanded):
+                    visited[name] = True
+                    order.append(name)
+                    continue
+                if (name not in self.nodes):
+                    raise ValueError(f"The pipeline has no node called {name}")
+                if (visited.get(name) is True):
+                    continue
+                if (name in visited):
+                    raise ValueError(f"The pipeline has a cycle through {name}")
+
+                visited[name] = False
+                stack.append((name, True))
+                for inputName in reversed(self.nodes[name].inputs):
+                    if (visited.get(inputName) is False):
+                        raise ValueError(f"The pipeline has a cycle through {inputName}")
+                    if (inputName not in visited):
+                        stack.append((inputName, False))
+
+        return order
+
+    def GetKeys(self, order: list[str]) -> dict[str, str]:
+        """Gets the key of every node.
+
+        Parameters:
+            order: list[str]
+                The names of the nodes, inputs first, as given by GetOrder.
+
+        Returns:
+            dict[str, str]:
+                The hex key of each node.
+        """
+
+        keys = {}
+        for name in order:
+            node = self.nodes[name]
+            if (node.function is None):
+                keys[name] = HashLog(node.source)
+                continue
+
+            # Identifies the function by name, so the key is the same in every run.
+            description = json.dumps([PIPELINE_VERSION, f"{node.function.__module__}.{node.function.__qualname__}",
+                                      node.artifact, node.params, [keys[inputName] for inputName in node.inputs]], sort_keys=True)
+            keys[name] = hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+        return keys
+
+    def Build(self, targets: list[str]=None) -> list[str]:
+        """Runs the nodes whose keys aren't cached, in parallel where they don't depend on each other.
+
+        Parameters:
+            targets: list[str]
+                The nodes to build. Every node is built by default.
+
+        Returns:
+            list[str]:
+                The names of the nodes that were run, in the order they finished.
+        """
+
+        os.makedirs(self.cacheFolder, exist_ok=True)
+        order = self.GetOrder(targets)
+        keys = self.GetKeys(order)
+        artifacts = self._LoadArtifacts()
+
+        # Finds the nodes whose value isn't cached, and whose files are missing or were written with another key.
+        stale = set()
+        for name in order:
+            node = self.nodes[name]
+            if (node.function is None):
+                continue
+            if (node.artifact):
+                record = artifacts.get(name)
+                if (record is None or record["key"] != keys[name] or not all(os.path.exists(path) for path in record["outputs"])):
+                    stale.add(name)
+            elif (not os.path.exists(self._GetValuePath(keys[name]))):
+                stale.add(name)
+
+        # Counts the stale inputs of every stale node, which must run before it.
+        waiting = {name: sum(inputName in stale for inputName in self.nodes[name].inputs) for name in stale}
+        dependents = {name: [] for name in stale}
+        for name in stale:
+            for inputName in self.nodes[name].inputs:
+                if (inputName in stale):
+                    dependents[inputName].append(name)
+
+        values = {}
+        finished = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                running = {}
+                ready = [name for name in order if name in stale and waiting[name] == 0]
+                while (ready or running):
+                    for name in ready:
+                        inputValues = [self._GetValue(inputName, keys, values, artifacts) for inputName in self.nodes[name].inputs]
+                        running[executor.submit(self._Run, self.nodes[name], inputValues)] = name
+                    ready = []
+
+                    done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if (future.exception() is not None):
+                            # Stops the nodes which haven't started, rather than running them to throw them away.
+                            executor.shutdown(cancel_futures=True)
+                            raise future.exception()
+                        value = future.result()
+
+                        # Stores the value, so the nodes which need it don't have to load it.
+                        if (self.nodes[name].artifact):
+                            artifacts[name] = {"key": keys[name], "outputs": list(value)}
+                        else:
+                            self._SaveValue(keys[name], value)
+                        values[name] = value
+                        finished.append(name)
+
+                        for dependent in dependents[name]:
+                            waiting[dependent] -= 1
+                            if (waiting[dependent] == 0):
+                                ready.append(dependent)
+        finally:
+            # Records the files written before any failure, so they aren't written again.
+            self._SaveArtifacts(artifacts)
+
+        return finished
+
+    def _Run(self, node: Node, inputValues: list):
+        """Runs the function of a node.
+
+        Parameters:
+            node: Node
+                The node to run.
+            inputValues: list
+                The value of each of its inputs.
+
+        Returns:
+            The value of the node.
+        """
+
+        if (node.exclusive):
+            with self._plotLock:
+                return node.function(*inputValues, **node.params)
+
+        return node.function(*inputValues, **node.params)
+
+    def _GetValue(self, name: str, keys: dict[str, str], values: dict[str, object], artifacts: dict[str, dict]):
+        """Gets the value of a node which has been built, loading it from the cache if it wasn't built in this run.
+
+        Parameters:
+            name: str
+                The name of the node.
+            keys: dict[str, str]
+                The key of every node, as given by GetKeys.
+            values: dict[str, object]
+                The values of the nodes built in this run, which loaded values are added to.
+            artifacts: dict[str, dict]
+                The key and files of every node that writes files.
+
+        Returns:
+            The value of the node.
+        """
+
+        if (name not in values):
+            node = self.nodes[name]
+            if (node.function is None):
+                values[name] = node.source
+            elif (node.artifact):
+                values[name] = artifacts[name]["outputs"]
+            else:
+                file = open(self._GetValuePath(keys[name]), "rb")
+                values[name] = pickle.load(file)
+                file.close()
+
+        return values[name]
+
+    def _GetValuePath(self, key: str) -> str:
+        """Gets the path of the cached value with a key.
+
+        Parameters:
+            key: str
+                The key of the value.
+
+        Returns:
+            str:
+                The path of the .pkl file, which may not exist.
+        """
+
+        return f"{self.cacheFolder}/{key}.pkl"
+
+    def _SaveValue(self, key: str, value) -> None:
+        """Caches the value of a node under its key.
+
+        Parameters:
+            key: str
+                The key of the node.
+            value:
+                The value of the node, which must be picklable.
+        """
+
+        path = self._GetValuePath(key)
+        with AtomicWrite(path, "wb") as file:
+            pickle.dump(value, file)
+
+    def _LoadArtifacts(self) -> dict[str, dict]:
+        """Loads the key and files that every node that writes files was last built with.
+
+        Returns:
+            dict[str, dict]:
+                Maps the name of each node to its "key" and "outputs", or is empty if nothing has been built.
+        """
+
+        path = f"{self.cacheFolder}/{ARTIFACTS_FILE}"
+        if (not os.path.exists(path)):
+            return {}
+
+        file = open(path, "r")
+        artifacts = json.load(file)
+        file.close()
+
+        return artifacts
+
+    def _SaveArtifacts(self, artifacts: dict[str, dict]) -> None:
+        """Saves the key and files that every node that writes files was last built with.
+
+        Parameters:
+            artifacts: dict[str, dict]
+                Maps the name of each node to its "key" and "outputs".
+        """
+
+        path = f"{self.cacheFolder}/{ARTIFACTS_FILE}"
+        with AtomicWrite(path) as file:
+            json.dump(artifacts, file, indent=4, sort_keys=True)
+
+def HashLog(fileName: str) -> str:
+    """Gets the key of a log from its name and contents.
+
+    The name is included since the parsed log keeps the file it came from.
+
+    Parameters:
+        fileName: str
+            The log file, which may be compressed or in a bundle.
+
+    Returns:
+        str:
+            The hex SHA-256 of the name and contents.
+    """
+
+    digest = hashlib.sha256(os.path.basename(fileName).encode("utf-8"))
+    file = OpenLog(fileName)
+    digest.update(file.read().encode("utf-8"))
+    file.close()
+
+    return digest.hexdigest()
+
+def ParseLog(fileName: str) -> dict:
+    """Parses the columns and header of a log.
+
+    Parameters:
+        fileName: str
+            The log file.
+
+    Returns:
+        dict:
+            The "file", its "header" as given by ParseData.ExtractHeaderFromFile,
+            and its "columns" as given by ParseData.LoadLogArrays.
+    """
+
+    return {
+        "file": fileName,
+        "header": ParseData.ExtractHeaderFromFile(fileName),
+        "columns": ParseData.LoadLogArrays(fileName),
+    }
+
+def FitLog(log: dict, estimator: str="ols", prefilter: str=None) -> dict:
+    """Fits the battery usage rate of a parsed log.
+
+    Gives the same rate as ParseData.ExtractTrialRatesFromFiles.
+
+    Parameters:
+        log: dict
+            The parsed log, as given by ParseLog.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting, from SlopeEstimators.FILTERS.
+
+    Returns:
+        dict:
+            The (velocity, horizontalSeparation, verticalSeparation, leading) "key" of
+            the trial, and its "rate" in V/s.
+    """
+
+    columns = log["columns"]
+    times = (columns["timestamp"] - columns["timestamp"][0]) / 1000.0
+    weights = columns["period"] if estimator in WEIGHTED_ESTIMATORS else None
+
+    # Fits the log as a single group.
+    groups = np.zeros(len(times), dtype=int)
+    rate = EstimateSlopes(groups, times, columns["batteryV"], 1, estimator, prefilter, weights)[0]
+
+    return {"key": tuple(log["header"][:4]), "rate": float(rate)}
+
+def PlotLog(log: dict, outputFolder: str, convertToPercentage: bool=True, minVoltage: float=ParseData.MIN_VOLTAGE,
+            maxVoltage: float=ParseData.MAX_VOLTAGE) -> list[str]:
+    """Plots the battery level of a parsed log, as ParseData.SaveBatteryPlotToFolder does.
+
+    Parameters:
+        log: dict
+            The parsed log, as given by ParseLog.
+        outputFolder: str
+            The folder to save the plot to. Created if it doesn't exist.
+        convertToPercentage: bool
+            Whether to plot the battery level in percentage or volts.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+
+    Returns:
+        list[str]:
+            The file the plot was saved to.
+    """
+
+    columns = log["columns"]
+    timestamps = ((columns["timestamp"] - columns["timestamp"][0]) / 1000.0).tolist()
+
+    os.makedirs(outputFolder, exist_ok=True)
+    return [ParseData.SaveBatteryPlot(timestamps, columns["batteryV"].tolist(), log["header"], outputFolder,
+                                      convertToPercentage, minVoltage, maxVoltage)]
+
+def AggregateRates(*fits: dict, percentage: bool=False, minVoltage: float=ParseData.MIN_VOLTAGE,
+                   maxVoltage: float=ParseData.MAX_VOLTAGE) -> dict[tuple[float, float, float, bool], float]:
+    """Averages the rates of the trials with the same configuration.
+
+    Gives the same result as ParseData.ExtractBatteryUsageFromFolder when the fits are in the order of the logs.
+
+    Parameters:
+        fits: dict
+            The fit of every trial, as given by FitLog.
+        percentage: bool
+            Determines whether to return the rates in V/s or %/s.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+
+    Returns:
+        dict[tuple[float, float, float, bool], (float, float)]:
+            The (mean, std. dev.) of each configuration, as given by ParseData.GroupRatesByConfiguration.
+    """
+
+    rates = [fit["rate"] for fit in fits]
+    if (percentage):
+        rates = [rate * 100 / (maxVoltage - minVoltage) for rate in rates]
+
+    return ParseData.GroupRatesByConfiguration([fit["key"] for fit in fits], rates)
+
+def WriteRates(ratesVoltage: dict[tuple[float, float, float, bool], float], ratesPercentage: dict[tuple[float, float, float, bool], float],
+               outputFile: str) -> list[str]:
+    """Writes the trailing drones' rates to a .csv file, as `python cli.py rates --output` does.
+
+    Parameters:
+        ratesVoltage: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration in V/s, as given by AggregateRates.
+        ratesPercentage: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration in %/s.
+        outputFile: str
+            The .csv file to write to, e.g. rates.csv.
+
+    Returns:
+        list[str]:
+            The file the rates were written to.
+    """
+
+    text = ParseData.FormatRates(ParseData.FilterDronePositions(ratesVoltage, False), ParseData.FilterDronePositions(ratesPercentage, False))
+
+    with AtomicWrite(outputFile) as file:
+        file.write(text)
+
+    return [outputFile]
+
+def PlotTable(rates: dict[tuple[float, float, float, bool], float], outputFolder: str) -> list[str]:
+    """Plots the trailing drones' rates as a table, as ParseData.PlotBatteryConsumptionTable does.
+
+    Parameters:
+        rates: dict[tuple[float, float, float, bool], float]
+            The (mean, std. dev.) of each configuration, as given by AggregateRates.
+        outputFolder: str
+            The folder to save the table to. Created if it doesn't exist.
+
+    Returns:
+        list[str]:
+            The file the table was saved to.
+    """
+
+    os.makedirs(outputFolder, exist_ok=True)
+    return [ParseData.SaveConsumptionTable(rates, outputFolder)]
+
+def PlotComparison(separations: list[str], measurements: dict[str, list[float]], outputFile: str) -> list[str]:
+    """Plots a bar chart comparing the experimental and simulated rates, as OtherPlots does.
+
+    Parameters:
+        separations: list[str]
+            The label of each group of bars.
+        measurements: dict[str, list[float]]
+            The rate in %/s at each separation, keyed by the label of the series.
+        outputFile: str
+            The .png file to save the chart to. Its folder is created if it doesn't exist.
+
+    Returns:
+        list[str]:
+            The file the chart was saved to.
+    """
+
+    os.makedirs(os.path.dirname(outputFile) or ".", exist_ok=True)
+    return [OtherPlots.PlotComparison(separations, measurements, outputFile)]
+
+def CreateReportPipeline(folder: str=ParseData.LOG_FOLDER, outputFolder: str=ParseData.OUTPUT_FOLDER, ratesFile: str="rates.csv",
+                         estimator: str="ols", prefilter: str=None, excludeFailed: bool=False, minVoltage: float=ParseData.MIN_VOLTAGE,
+                         maxVoltage: float=ParseData.MAX_VOLTAGE, comparisons: dict[str, dict[str, tuple[float]]]=OtherPlots.COMPARISONS,
+                         cacheFolder: str=CACHE_FOLDER, workers: int=None) -> Pipeline:
+    """Creates the pipeline for the report of a log folder.
+
+    The report is the trailing drones' rates, the consumption table, the
+    plots of every trial in volts and percent, and OtherPlots' comparison
+    charts, which are saved beside the other plots.
+
+    Parameters:
+        folder: str
+            The folder (or bundle) containing the logs.
+        outputFolder: str
+            The folder to save the plots to, with the trials' plots in its volts and percentage folders.
+        ratesFile: str
+            The .csv file to write the rates to.
+        estimator: str
+            The slope estimator to use, from SlopeEstimators.ESTIMATORS.
+        prefilter: str
+            The filter to apply to the battery levels before fitting, from SlopeEstimators.FILTERS.
+        excludeFailed: bool
+            Whether to leave out the trials that failed quality control.
+        minVoltage: float
+            The voltage corresponding to a fully uncharged battery.
+        maxVoltage: float
+            The voltage corresponding to a fully charged battery.
+        comparisons: dict[str, dict[str, tuple[float]]]
+            The rates of each comparison chart, keyed by the speed in m/s, as in OtherPlots.COMPARISONS.
+        cacheFolder: str
+            The folder to cache the values of the nodes in.
+        workers: int
+            The most nodes to run at once.
+
+    Returns:
+        Pipeline:
+            The pipeline, whose Build writes the report.
+    """
+
+    pipeline = Pipeline(cacheFolder, workers)
+    voltage = {"minVoltage": minVoltage, "maxVoltage": maxVoltage}
+
+    # Adds the nodes of each log, in the order of ParseData.ListLogFiles so the rates are averaged in the same order.
+    fits = []
+    for fileName in ParseData.ListLogFiles(folder, excludeFailed):
+        name = os.path.basename(fileName)
+        log = pipeline.Add(Node(f"log:{name}", source=fileName))
+        parsed = pipeline.Add(Node(f"parse:{name}", ParseLog, [log.name]))
+        fits.append(pipeline.Add(Node(f"fit:{name}", FitLog, [parsed.name], {"estimator": estimator, "prefilter": prefilter})).name)
+
+        pipeline.Add(Node(f"volts:{name}", PlotLog, [parsed.name], {"outputFolder": f"{outputFolder}/volts", "convertToPercentage": False, **voltage},
+                          artifact=True, exclusive=True))
+        pipeline.Add(Node(f"percentage:{name}", PlotLog, [parsed.name], {"outputFolder": f"{outputFolder}/percentage", "convertToPercentage": True, **voltage},
+                          artifact=True, exclusive=True))
+
+    ratesVoltage = pipeline.Add(Node("rates:volts", AggregateRates, fits, {"percentage": False, **voltage}))
+    ratesPercentage = pipeline.Add(Node("rates:percentage", AggregateRates, fits, {"percentage": True, **voltage}))
+    pipeline.Add(Node("rates.csv", WriteRates, [ratesVoltage.name, ratesPercentage.name], {"outputFile": ratesFile}, artifact=True))
+    pipeline.Add(Node("table", PlotTable, [ratesPercentage.name], {"outputFolder": outputFolder}, artifact=True, exclusive=True))
+
+    for speed, measurements in comparisons.items():
+        pipeline.Add(Node(f"comparison:{speed}", PlotComparison, [],
+                          {"separations": list(OtherPlots.SEPARATIONS), "measurements": {label: list(rates) for label, rates in measurements.items()},
+                           "outputFile": f"{outputFolder}/{speed} m s Comparison.png"}, artifact=True, exclusive=True))
+
+    return pipeline
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Builds the report, only rebuilding what has changed.")
+    parser.add_argument("--folder", default=ParseData.LOG_FOLDER, help="The folder (or bundle) containing the logs.")
+    parser.add_argument("--plots", default=ParseData.OUTPUT_FOLDER, help="The folder to save the plots to.")
+    parser.add_argument("--rates", default="rates.csv", help="The .csv file to write the rates to.")
+    parser.add_argument("--estimator", default="ols", help="The slope estimator, from SlopeEstimators.ESTIMATORS.")
+    parser.add_argument("--prefilter", help="The filter to apply before fitting, from SlopeEstimators.FILTERS.")
+    parser.add_argument("--exclude-failed", action="store_true", help="Leaves out the trials that failed quality control.")
+    parser.add_argument("--cache", default=CACHE_FOLDER, help="The folder to cache the values of the steps in.")
+    parser.add_argument("--workers", type=int, help="The most steps to run at once.")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    pipeline = CreateReportPipeline(arguments.folder, arguments.plots, arguments.rates, arguments.estimator, arguments.prefilter,
+                                    arguments.exclude_failed, cacheFolder=arguments.cache, workers=arguments.workers)
+    built = pipeline.Build()
+    print(f"Built {len(built)} of {len(pipeline.nodes)} steps in {time.perf_counter() - start:.2f} s.")
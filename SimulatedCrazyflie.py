@@ -0,0 +1,420 @@
+import heapq
+import math
+import random
+import threading
+import time
+
+from cflib.crazyflie.log import CMD_START_LOGGING, CMD_STOP_LOGGING
+
+"""A local stand-in for a Crazyflie, used to test the logging and flight code without a drone.
+
+SimulatedSyncCrazyflie can be passed to CommanderFlight in place of a
+SyncCrazyflie. Log configs added to it are started and stopped through
+cflib's own LogConfig.start and LogConfig.stop, and it sends synthetic log
+packets for each started block at the block's period. The drone follows the
+position setpoints sent to its commander with a first-order lag, and its
+battery drains faster while flying and moving.
+"""
+
+# The time constant in s that the simulated drone follows its setpoints with.
+RESPONSE_TIME = 0.2
+# The drain in V/s while on the ground, hovering, and per m/s of speed.
+IDLE_DRAIN = 0.0001
+HOVER_DRAIN = 0.002
+SPEED_DRAIN = 0.001
+# The heights below which the drone counts as landed.
+GROUND_HEIGHT = 0.05
+
+class SimulatedCommander:
+    """Stands in for cflib's Commander, recording the setpoints that are sent.
+
+    Attributes:
+        crazyflie: SimulatedCrazyflie
+            The simulated Crazyflie that the commander controls.
+        setpoints: int
+            The number of setpoints that have been sent.
+
+    Methods:
+        send_position_setpoint:
+            Sets the position the drone moves towards.
+        send_hover_setpoint:
+            Sets the velocity the drone moves at and the height it hovers at.
+        send_notify_setpoint_stop:
+            Does nothing, as there is no high level commander to hand back to.
+        send_stop_setpoint:
+            Stops the motors.
+    """
+
+    def __init__(self, crazyflie: "SimulatedCrazyflie"):
+        """Initialises a SimulatedCommander object.
+
+        Parameters:
+            crazyflie: SimulatedCrazyflie
+                The simulated Crazyflie that the commander controls.
+        """
+
+        self.crazyflie = crazyflie
+        self.setpoints = 0
+
+    def send_position_setpoint(self, x: float, y: float, z: float, yaw: float) -> None:
+        self.setpoints += 1
+        self.crazyflie.SetTarget([x, y, z])
+
+    def send_hover_setpoint(self, vx: float, vy: float, yawrate: float, zdistance: float) -> None:
+        self.setpoints += 1
+        self.crazyflie.SetTarget(None, [vx, vy], zdistance)
+
+    def send_notify_setpoint_stop(self, remain_valid_milliseconds: int=0) -> None:
+        pass
+
+    def send_stop_setpoint(self) -> None:
+        self.setpoints += 1
+        self.crazyflie.SetTarget([self.crazyflie.x, self.crazyflie.y, 0.0])
+
+class SimulatedLog:
+    """Stands in for cflib's Log, registering log configs with the simulated Crazyflie.
+
+    Attributes:
+        crazyflie: SimulatedCrazyflie
+            The simulated Crazyflie that the log configs are added to.
+        configs: list[LogConfig]
+            The log configs that have been added.
+
+    Methods:
+        add_config:
+            Adds a log config.
+    """
+
+    def __init__(self, crazyflie: "SimulatedCrazyflie"):
+        """Initialises a SimulatedLog object.
+
+        Parameters:
+            crazyflie: SimulatedCrazyflie
+                The simulated Crazyflie that the log configs are added to.
+        """
+
+        self.crazyflie = crazyflie
+        self.configs = []
+
+    def add_config(self, config) -> None:
+        """Adds a log config.
+
+        Marks the config as already added, so that LogConfig.start only
+        sends the start command to the simulated Crazyflie.
+
+        Parameters:
+            config: LogConfig
+                The log config to add.
+        """
+
+        config.cf = self.crazyflie
+        config.id = len(self.configs)
+        config.added = True
+        config.valid = True
+        self.configs.append(config)
+
+class SimulatedParam:
+    """Stands in for cflib's Param, storing the values that are set.
+
+    Attributes:
+        values: dict[str, str]
+            The value of every parameter that has been set.
+
+    Methods:
+        set_value:
+            Sets a parameter.
+    """
+
+    def __init__(self):
+        """Initialises a SimulatedParam object.
+        """
+
+        self.values = {}
+
+    def set_value(self, name: str, value) -> None:
+        self.values[name] = str(value)
+
+class SimulatedCrazyflie:
+    """Stands in for cflib's Crazyflie.
+
+    Attributes:
+        link_uri: str
+            The URI of the simulated Crazyflie.
+        link:
+            Not None while the link is open, so that LogConfig sends its commands.
+        commander: SimulatedCommander
+            The commander of the simulated Crazyflie.
+        log: SimulatedLog
+            The log of the simulated Crazyflie.
+        param: SimulatedParam
+            The parameters of the simulated Crazyflie.
+        x, y, z: float
+            The position of the drone in m.
+        vx, vy, vz: float
+            The velocity of the drone in m/s.
+        batV: float
+            The battery level in volts.
+        lossRate: float
+            The fraction of log packets which are randomly dropped.
+        sentPackets: int
+            The number of log packets which have been sent, including dropped packets.
+
+    Methods:
+        SetTarget:
+            Sets the position or velocity that the drone moves towards.
+        send_packet:
+            Receives the start and stop commands for the log blocks.
+        Open:
+            Starts the clock and the thread which sends the log packets.
+        Close:
+            Stops sending log packets.
+    """
+
+    def __init__(self, uri: str, startVoltage: float=4.2, lossRate: float=0.0, seed: int=None, position: list[float]=None):
+        """Initialises a SimulatedCrazyflie object.
+
+        Parameters:
+            uri: str
+                The URI of the simulated Crazyflie.
+            startVoltage: float
+                The battery voltage at the start.
+            lossRate: float
+                The fraction of log packets which are randomly dropped.
+            seed: int
+                The seed of the random packet loss.
+            position: list[float]
+                The [x, y, z] position the drone starts at.
+        """
+
+        self.link_uri = uri
+        self.link = None
+        self.commander = SimulatedCommander(self)
+        self.log = SimulatedLog(self)
+        self.param = SimulatedParam()
+
+        self.x, self.y, self.z = position if position is not None else [0.0, 0.0, 0.0]
+        self.vx = self.vy = self.vz = 0.0
+        self.batV = startVoltage
+        self.startVoltage = startVoltage
+        self.lossRate = lossRate
+        self.sentPackets = 0
+
+        self._random = random.Random(seed)
+        self._target = [self.x, self.y, self.z]
+        self._velocity = None
+        self._startTime = None
+        self._lastUpdate = None
+        self._blocks = {}
+        self._schedule = []
+        self._starts = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def SetTarget(self, position: list[float]=None, velocity: list[float]=None, height: float=None) -> None:
+        """Sets the position or velocity that the drone moves towards.
+
+        Parameters:
+            position: list[float]
+                The [x, y, z] position to move towards, or None to move at a velocity.
+            velocity: list[float]
+                The [vx, vy] velocity in m/s to move at, if no position is given.
+            height: float
+                The height to hover at, if no position is given.
+        """
+
+        with self._lock:
+            self._Update(time.time())
+            if (position is not None):
+                self._target = list(position)
+                self._velocity = None
+            else:
+                self._target[2] = height
+                self._velocity = list(velocity)
+
+    def _Update(self, now: float) -> None:
+        """Moves the drone and drains the battery up to the current time.
+
+        Parameters:
+            now: float
+                The current time in s, from time.time().
+        """
+
+        if (self._lastUpdate is None):
+            self._lastUpdate = now
+            return
+
+        dt = now - self._lastUpdate
+        if (dt <= 0):
+            return
+        self._lastUpdate = now
+
+        # Moves at the commanded velocity by moving the target with it.
+        if (self._velocity is not None):
+            self._target[0] = self.x + self._velocity[0] * RESPONSE_TIME
+            self._target[1] = self.y + self._velocity[1] * RESPONSE_TIME
+
+        # Moves towards the target with a first-order lag.
+        alpha = 1 - math.exp(-dt / RESPONSE_TIME)
+        oldPosition = (self.x, self.y, self.z)
+        self.x += alpha * (self._target[0] - self.x)
+        self.y += alpha * (self._target[1] - self.y)
+        self.z += alpha * (self._target[2] - self.z)
+        self.vx = (self.x - oldPosition[0]) / dt
+        self.vy = (self.y - oldPosition[1]) / dt
+        self.vz = (self.z - oldPosition[2]) / dt
+
+        # Drains the battery.
+        drain = IDLE_DRAIN
+        if (self.z > GROUND_HEIGHT):
+            drain = HOVER_DRAIN + SPEED_DRAIN * math.sqrt(self.vx**2 + self.vy**2 + self.vz**2)
+        self.batV -= drain * dt
+
+    def _GetValue(self, name: str) -> float:
+        """Gets the value of a logged variable.
+
+        Parameters:
+            name: str
+                The complete name of the variable, e.g. stateEstimate.x.
+
+        Returns:
+            float:
+                The value of the variable, or 0 if it isn't simulated.
+        """
+
+        values = {
+            "stateEstimate.x": self.x,
+            "stateEstimate.y": self.y,
+            "stateEstimate.z": self.z,
+            "stateEstimate.vx": self.vx,
+            "stateEstimate.vy": self.vy,
+            "stateEstimate.vz": self.vz,
+            "pm.vbat": self.batV,
+            "pm.batteryLevel": 100 * max(min((self.batV - 3.0) / (self.startVoltage - 3.0), 1.0), 0.0),
+        }
+
+        return values.get(name, 0.0)
+
+    def send_packet(self, pk, expected_reply=None) -> None:
+        """Receives the start and stop commands for the log blocks.
+
+        Parameters:
+            pk: CRTPPacket
+                The packet sent by LogConfig.start or LogConfig.stop.
+            expected_reply:
+                Ignored.
+        """
+
+        command = pk.data[0]
+        blockId = pk.data[1]
+        config = self.log.configs[blockId]
+
+        with self._lock:
+            if (command == CMD_START_LOGGING):
+                # Uses the period sent in the packet, which is in units of 10 ms.
+                period = pk.data[2] * 10
+                # Numbers each start so that the schedule of an earlier start is thrown away.
+                self._starts += 1
+                self._blocks[blockId] = (config, period, self._starts)
+                heapq.heappush(self._schedule, (time.time() + period / 1000.0, blockId, self._starts))
+                config.started = True
+            elif (command == CMD_STOP_LOGGING):
+                self._blocks.pop(blockId, None)
+                config.started = False
+
+        self._wake.set()
+
+    def Open(self) -> None:
+        """Starts the clock and the thread which sends the log packets.
+        """
+
+        self.link = self
+        self._startTime = time.time()
+        self._lastUpdate = self._startTime
+        self._thread = threading.Thread(target=self._Run, daemon=True)
+        self._thread.start()
+
+    def Close(self) -> None:
+        """Stops sending log packets.
+        """
+
+        self.link = None
+        self._wake.set()
+        if (self._thread is not None):
+            self._thread.join()
+            self._thread = None
+
+    def _Run(self) -> None:
+        """Sends the log packets of every started block at its period until the link is closed.
+        """
+
+        while (self.link is not None):
+            self._wake.clear()
+
+            with self._lock:
+                # Throws away the schedule of blocks which were stopped or restarted at a new period.
+                while (self._schedule and self._blocks.get(self._schedule[0][1], (None, None, None))[2] != self._schedule[0][2]):
+                    heapq.heappop(self._schedule)
+                nextTime = self._schedule[0][0] if self._schedule else None
+
+            if (nextTime is None or nextTime > time.time()):
+                self._wake.wait(timeout=None if nextTime is None else nextTime - time.time())
+                continue
+
+            with self._lock:
+                dueTime, blockId, start = heapq.heappop(self._schedule)
+                config, period, start = self._blocks[blockId]
+                heapq.heappush(self._schedule, (dueTime + period / 1000.0, blockId, start))
+
+                self._Update(dueTime)
+                timestamp = int(round((dueTime - self._startTime) * 1000))
+                data = {variable.name: self._GetValue(variable.name) for variable in config.variables}
+                self.sentPackets += 1
+                dropped = self._random.random() < self.lossRate
+
+            if (not dropped):
+                config.data_received_cb.call(timestamp, data, config)
+
+class SimulatedSyncCrazyflie:
+    """Stands in for cflib's SyncCrazyflie.
+
+    Attributes:
+        cf: SimulatedCrazyflie
+            The simulated Crazyflie.
+
+    Methods:
+        open_link:
+            Opens the link to the simulated Crazyflie.
+        close_link:
+            Closes the link to the simulated Crazyflie.
+        is_link_open:
+            Checks whether the link is open.
+    """
+
+    def __init__(self, uri: str, **kwargs):
+        """Initialises a SimulatedSyncCrazyflie object.
+
+        Parameters:
+            uri: str
+                The URI of the simulated Crazyflie.
+            **kwargs:
+                Passed on to SimulatedCrazyflie.
+        """
+
+        self.cf = SimulatedCrazyflie(uri, **kwargs)
+
+    def open_link(self) -> None:
+        self.cf.Open()
+
+    def close_link(self) -> None:
+        self.cf.Close()
+
+    def is_link_open(self) -> bool:
+        return self.cf.link is not None
+
+    def __enter__(self):
+        self.open_link()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close_link()
@@ -0,0 +1,533 @@
+import numpy as np
+from typing import Tuple
+
+"""Stores the estimators used to fit the battery usage rate of the trials.
+
+Battery voltage under load is noisy and sags, so ordinary least squares
+can be thrown off by a few bad samples. This module provides more robust
+slope estimators and filters which can be applied to the battery voltage
+before fitting.
+
+Every function works on many groups of samples (usually one group per trial)
+at once. The samples of each group must be contiguous and in time order,
+which is how ParseData.LoadFolderArrays returns them.
+
+Methods:
+    GroupedLinearRegression:
+        Fits a separate linear regression to every group of samples at once.
+    OrdinaryLeastSquaresSlopes:
+        Gets the least squares slope of every group.
+    TheilSenSlopes:
+        Gets the Theil-Sen (median pairwise) slope of every group.
+    HuberSlopes:
+        Gets the Huber regression slope of every group.
+    SavitzkyGolayFilter:
+        Smooths every group with a Savitzky-Golay filter.
+    ExponentialFilter:
+        Smooths every group with exponential smoothing.
+    EstimateSlopes:
+        Filters and fits every group with the chosen filter and estimator.
+"""
+
+# The most samples a group can have for TheilSenSlopes to compute all of its pairwise slopes.
+# Bisecting on the slope is faster for larger groups.
+MAX_PAIRWISE_SAMPLES = 3000
+# The most pairwise slopes that TheilSenSlopes holds in memory at once.
+PAIRWISE_CHUNK = 2 ** 22
+
+def GroupedLinearRegression(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, weights: np.ndarray=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Fits a separate linear regression to every group of samples at once.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        weights: np.ndarray
+            The weight of each sample. Every sample has
+            a weight of 1 by default.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            The slope and intercept of each group. Groups with fewer
+            than two distinct x-coordinates have a slope and intercept of NaN.
+    """
+
+    if (weights is None):
+        weights = np.ones(len(x))
+
+    # Calculates the weighted mean of each group.
+    totalWeights = np.bincount(groups, weights, minlength=numGroups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        meanX = np.bincount(groups, weights * x, minlength=numGroups) / totalWeights
+        meanY = np.bincount(groups, weights * y, minlength=numGroups) / totalWeights
+
+    # Centres the data about the group means to keep the sums well conditioned.
+    dx = x - meanX[groups]
+    dy = y - meanY[groups]
+    sxx = np.bincount(groups, weights * dx * dx, minlength=numGroups)
+    sxy = np.bincount(groups, weights * dx * dy, minlength=numGroups)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slopes = np.where(sxx > 0, sxy / sxx, np.nan)
+    intercepts = meanY - slopes * meanX
+
+    return slopes, intercepts
+
+def OrdinaryLeastSquaresSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, weights: np.ndarray=None) -> np.ndarray:
+    """Gets the least squares slope of every group.
+
+    Without weights, gives the same slopes as scipy.stats.linregress.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        weights: np.ndarray
+            The weight of each sample. Every sample has the same weight by default.
+
+    Returns:
+        np.ndarray:
+            The slope of each group.
+    """
+
+    slopes, intercepts = GroupedLinearRegression(groups, x, y, numGroups, weights)
+    return slopes
+
+def _CountInversions(values: np.ndarray, groups: np.ndarray, numGroups: int) -> np.ndarray:
+    """Counts the pairs i < j where values[i] > values[j] within each group.
+
+    Uses a bottom-up merge sort, where every level of the merge is done for
+    all blocks at once with numpy.
+
+    Parameters:
+        values: np.ndarray
+            The values to check, with the samples of each group contiguous.
+        groups: np.ndarray
+            The group of each value, in ascending order.
+        numGroups: int
+            The total number of groups.
+
+    Returns:
+        np.ndarray:
+            The number of inversions in each group.
+    """
+
+    n = len(values)
+    positions = np.arange(n)
+
+    # Replaces the values with their ranks. Since the groups are sorted,
+    # every rank stays within its own group's positions, so no pair
+    # from different groups is ever counted as an inversion.
+    order = np.lexsort((values, groups))
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = positions
+
+    counts = np.zeros(numGroups)
+    width = 1
+    while (width < n):
+        # Splits the array into blocks of twice the width, each made of
+        # a sorted left half and a sorted right half.
+        blocks = positions // (2 * width)
+        isRight = (positions % (2 * width)) >= width
+
+        # Offsets each block so that all of the left halves together are sorted.
+        keys = blocks * n + ranks
+        leftKeys = keys[~isRight]
+        rightKeys = keys[isRight]
+        rightBlocks = blocks[isRight]
+
+        # For every value in a right half, counts the values in its
+        # left half which are larger than it.
+        leftEnds = np.searchsorted(leftKeys, (rightBlocks + 1) * n)
+        larger = leftEnds - np.searchsorted(leftKeys, rightKeys, side="right")
+        counts += np.bincount(groups[ranks[isRight]], larger, minlength=numGroups)
+
+        # Merges each pair of halves for the next level.
+        ranks = np.sort(keys, kind="stable") - blocks * n
+        width *= 2
+
+    return counts
+
+def _PairwiseTheilSenSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, selected: np.ndarray) -> np.ndarray:
+    """Gets the Theil-Sen slope of the selected groups from every pairwise slope.
+
+    The groups of each size are stacked into a matrix, so the pairwise slopes
+    of many groups are computed and sorted with one numpy call per chunk.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        selected: np.ndarray
+            Whether to fit each group.
+
+    Returns:
+        np.ndarray:
+            The slope of each selected group, as given by TheilSenSlopes, and NaN for the rest.
+    """
+
+    order = np.argsort(groups, kind="stable")
+    sizes = np.bincount(groups, minlength=numGroups)
+    starts = np.cumsum(sizes) - sizes
+    slopes = np.full(numGroups, np.nan)
+
+    for size in np.unique(sizes[selected & (sizes >= 2)]):
+        first, second = np.triu_indices(size, 1)
+        members = np.flatnonzero(selected & (sizes == size))
+
+        # Fits as many groups at once as fit in PAIRWISE_CHUNK slopes.
+        rowsPerChunk = max(PAIRWISE_CHUNK // len(first), 1)
+        for chunk in range(0, len(members), rowsPerChunk):
+            rows = members[chunk:chunk + rowsPerChunk]
+            indices = order[starts[rows][:, np.newaxis] + np.arange(size)]
+            groupX = x[indices]
+            groupY = y[indices]
+            dx = groupX[:, second] - groupX[:, first]
+            dy = groupY[:, second] - groupY[:, first]
+
+            # Pairs with the same x-coordinate have no slope, so are sorted to the end and left out.
+            distinct = dx != 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                pairSlopes = np.where(distinct, dy / dx, np.inf)
+            pairSlopes.sort(axis=1)
+
+            # Averages the two middle slopes (which are the same slope for an odd number of pairs).
+            counts = np.count_nonzero(distinct, axis=1)
+            positions = np.arange(len(rows))
+            medians = (pairSlopes[positions, np.maximum((counts - 1) // 2, 0)] + pairSlopes[positions, counts // 2]) / 2
+            slopes[rows] = np.where(counts > 0, medians, np.nan)
+
+    return slopes
+
+def _BisectedTheilSenSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, iterations: int=50) -> np.ndarray:
+    """Gets the Theil-Sen slope of every group by bisecting on the slope.
+
+    The number of pairwise slopes below a trial slope s is the number of
+    inversions in y - s * x, which is counted in O(n log^2 n) for every group
+    at once, so no group's O(n^2) pairwise slopes are ever held in memory.
+    The x-coordinates must be in ascending order within each group.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        iterations: int
+            The number of bisection steps. Each step halves
+            the uncertainty in the slopes.
+
+    Returns:
+        np.ndarray:
+            The slope of each group, as given by TheilSenSlopes.
+    """
+
+    sizes = np.bincount(groups, minlength=numGroups)
+
+    # Finds the runs of samples in the same group with the same x-coordinate.
+    newRun = np.ones(len(x), dtype=bool)
+    newRun[1:] = (groups[1:] != groups[:-1]) | (x[1:] != x[:-1])
+    runs = np.cumsum(newRun) - 1
+    runSizes = np.bincount(runs)
+    runGroups = groups[newRun]
+
+    # Leaves out the pairs within each run, and the inversions between them, which
+    # are counted whatever the slope since y - s * x only differs by y within a run.
+    tiedPairs = np.bincount(runGroups, runSizes * (runSizes - 1) / 2, minlength=numGroups)
+    tiedInversions = np.bincount(runGroups, _CountInversions(y, runs, len(runSizes)), minlength=numGroups)
+    numPairs = sizes * (sizes - 1) / 2 - tiedPairs
+
+    # The steepest and shallowest pairwise slopes are always between neighbouring samples with different x-coordinates.
+    distinct = (groups[1:] == groups[:-1]) & (x[1:] != x[:-1])
+    neighbourSlopes = np.diff(y)[distinct] / np.diff(x)[distinct]
+    neighbourGroups = groups[1:][distinct]
+    low = np.full(numGroups, np.inf)
+    high = np.full(numGroups, -np.inf)
+    np.minimum.at(low, neighbourGroups, neighbourSlopes)
+    np.maximum.at(high, neighbourGroups, neighbourSlopes)
+
+    valid = numPairs > 0
+    low[~valid] = 0.0
+    high[~valid] = 0.0
+
+    # Finds the two middle order statistics (1-indexed), which are the same for an odd number of pairs.
+    medians = []
+    for target in (np.floor((numPairs + 1) / 2), np.floor(numPairs / 2) + 1):
+        targetLow = low.copy()
+        targetHigh = high.copy()
+        for i in range(iterations):
+            middle = (targetLow + targetHigh) / 2
+            # Counts the pairwise slopes below the middle of each bracket.
+            below = _CountInversions(y - middle[groups] * x, groups, numGroups) - tiedInversions
+            tooLow = below < target
+            targetLow = np.where(tooLow, middle, targetLow)
+            targetHigh = np.where(tooLow, targetHigh, middle)
+        medians.append((targetLow + targetHigh) / 2)
+
+    return np.where(valid, (medians[0] + medians[1]) / 2, np.nan)
+
+def TheilSenSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, iterations: int=50) -> np.ndarray:
+    """Gets the Theil-Sen slope of every group.
+
+    The Theil-Sen slope is the median of the slopes between every pair of
+    samples, which ignores up to 29% of the samples being outliers. Pairs of
+    samples with the same x-coordinate (e.g. repeated timestamps) have no
+    slope, so are left out, as scipy.stats.theilslopes does. Groups of up to
+    MAX_PAIRWISE_SAMPLES samples, which is every trial in practice, are fitted
+    from all of their pairwise slopes at once. Larger groups are bisected on
+    the slope instead, which needs the x-coordinates to be in ascending order
+    within each group.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        iterations: int
+            The number of bisection steps for the larger groups. Each step
+            halves the uncertainty in the slopes.
+
+    Returns:
+        np.ndarray:
+            The slope of each group. For groups with an even number of
+            pairwise slopes, this is the mean of the two middle slopes.
+            Groups without two samples at different x-coordinates have a slope of NaN.
+    """
+
+    sizes = np.bincount(groups, minlength=numGroups)
+    small = sizes <= MAX_PAIRWISE_SAMPLES
+    slopes = _PairwiseTheilSenSlopes(groups, x, y, numGroups, small)
+
+    if (not small.all()):
+        large = ~small[groups]
+        slopes[~small] = _BisectedTheilSenSlopes(groups[large], x[large], y[large], numGroups, iterations)[~small]
+
+    return slopes
+
+def _GroupedMedians(values: np.ndarray, groups: np.ndarray, numGroups: int) -> np.ndarray:
+    """Gets the median of each group.
+
+    Parameters:
+        values: np.ndarray
+            The values to take the median of.
+        groups: np.ndarray
+            The group of each value.
+        numGroups: int
+            The total number of groups.
+
+    Returns:
+        np.ndarray:
+            The median of each group, or NaN for empty groups.
+    """
+
+    # Sorts the values by group, then by value.
+    sortedValues = values[np.lexsort((values, groups))]
+    sizes = np.bincount(groups, minlength=numGroups)
+    starts = np.cumsum(sizes) - sizes
+
+    # Averages the two middle values (which are the same value for odd sizes).
+    lower = np.clip(starts + (sizes - 1) // 2, 0, len(values) - 1)
+    upper = np.clip(starts + sizes // 2, 0, len(values) - 1)
+    return np.where(sizes > 0, (sortedValues[lower] + sortedValues[upper]) / 2, np.nan)
+
+def HuberSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, weights: np.ndarray=None, tuning: float=1.345, iterations: int=20) -> np.ndarray:
+    """Gets the Huber regression slope of every group.
+
+    Fits with iteratively reweighted least squares, where samples with residuals
+    larger than the tuning constant times the residual scale are down-weighted.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        weights: np.ndarray
+            The weight of each sample, which is multiplied by its Huber weight.
+            Every sample has the same weight by default.
+        tuning: float
+            The number of residual scales beyond which a sample is down-weighted.
+            1.345 gives 95% of the efficiency of least squares on normal noise.
+        iterations: int
+            The number of reweighting steps.
+
+    Returns:
+        np.ndarray:
+            The slope of each group.
+    """
+
+    if (weights is None):
+        weights = np.ones(len(x))
+
+    slopes, intercepts = GroupedLinearRegression(groups, x, y, numGroups, weights)
+
+    for i in range(iterations):
+        residuals = np.abs(y - (slopes[groups] * x + intercepts[groups]))
+
+        # Estimates the scale of the residuals from their median absolute deviation.
+        scales = 1.4826 * _GroupedMedians(residuals, groups, numGroups)
+        limits = tuning * scales[groups]
+
+        # Samples within the limit keep their full weight.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            huberWeights = np.where(residuals > limits, limits / residuals, 1.0)
+        huberWeights[~np.isfinite(huberWeights) | (limits <= 0)] = 1.0
+
+        slopes, intercepts = GroupedLinearRegression(groups, x, y, numGroups, weights * huberWeights)
+
+    return slopes
+
+def SavitzkyGolayFilter(groups: np.ndarray, y: np.ndarray, window: int=9, order: int=2) -> np.ndarray:
+    """Smooths every group with a Savitzky-Golay filter.
+
+    The filter is applied to every group at once as a single convolution.
+    Samples within half a window of the start or end of a group are
+    left unfiltered so that no group is smoothed with another group's samples.
+
+    Parameters:
+        groups: np.ndarray
+            The group of each sample.
+        y: np.ndarray
+            The data to smooth.
+        window: int
+            The number of samples in the filter window. Must be odd.
+        order: int
+            The order of the polynomial fitted within each window.
+
+    Returns:
+        np.ndarray:
+            The smoothed data.
+    """
+
+    # Imported here since scipy is slow to import and only the filters need it.
+    from scipy import signal
+
+    coefficients = signal.savgol_coeffs(window, order)
+    smoothed = np.convolve(y, coefficients, mode="same")
+
+    # Finds how far each sample is from the edges of its group.
+    positions = np.arange(len(y))
+    newGroup = np.concatenate(([True], groups[1:] != groups[:-1]))
+    starts = np.maximum.accumulate(np.where(newGroup, positions, 0))
+    endOfGroup = np.concatenate((groups[1:] != groups[:-1], [True]))
+    ends = np.minimum.accumulate(np.where(endOfGroup, positions, len(y))[::-1])[::-1]
+
+    halfWindow = window // 2
+    nearEdge = (positions - starts < halfWindow) | (ends - positions < halfWindow)
+    return np.where(nearEdge, y, smoothed)
+
+def ExponentialFilter(groups: np.ndarray, y: np.ndarray, alpha: float=0.2) -> np.ndarray:
+    """Smooths every group with exponential smoothing.
+
+    The whole array is filtered at once, and then the part of each group's
+    output which was carried over from the previous group is removed, so the
+    result is the same as smoothing each group separately starting from its first sample.
+
+    Parameters:
+        groups: np.ndarray
+            The group of each sample.
+        y: np.ndarray
+            The data to smooth.
+        alpha: float
+            The weight, from 0 to 1, of each new sample.
+
+    Returns:
+        np.ndarray:
+            The smoothed data.
+    """
+
+    # Imported here since scipy is slow to import and only the filters need it.
+    from scipy import signal
+
+    decay = 1 - alpha
+    smoothed = signal.lfilter([alpha], [1, -decay], y)
+
+    # Finds the first sample of each group and the output just before it.
+    positions = np.arange(len(y))
+    newGroup = np.concatenate(([True], groups[1:] != groups[:-1]))
+    starts = np.maximum.accumulate(np.where(newGroup, positions, 0))
+    previous = np.where(starts > 0, smoothed[starts - 1], 0.0)
+
+    # Each group should start at its first sample rather than the previous output,
+    # and that difference decays by the same factor every sample.
+    return smoothed - decay ** (positions - starts + 1) * (previous - y[starts])
+
+# The available estimators and filters, by name.
+ESTIMATORS = {
+    "ols": OrdinaryLeastSquaresSlopes,
+    "theilsen": TheilSenSlopes,
+    "huber": HuberSlopes,
+}
+FILTERS = {
+    "savgol": SavitzkyGolayFilter,
+    "exponential": ExponentialFilter,
+}
+
+# The estimators which accept a weight for each sample.
+WEIGHTED_ESTIMATORS = ("ols", "huber")
+
+def EstimateSlopes(groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int, estimator: str="ols", prefilter: str=None,
+                   weights: np.ndarray=None) -> np.ndarray:
+    """Filters and fits every group with the chosen filter and estimator.
+
+    Parameters:
+        groups: np.ndarray
+            The integer group (from 0 to numGroups - 1) of each sample.
+        x: np.ndarray
+            The x-coordinates of the data.
+        y: np.ndarray
+            The y-coordinates of the data.
+        numGroups: int
+            The total number of groups.
+        estimator: str
+            The name of the estimator in ESTIMATORS to use.
+        prefilter: str
+            The name of the filter in FILTERS to apply to y before fitting,
+            or None to fit the raw data.
+        weights: np.ndarray
+            The weight of each sample, or None to weight every sample equally.
+            Only the estimators in WEIGHTED_ESTIMATORS support weights.
+
+    Returns:
+        np.ndarray:
+            The slope of each group.
+    """
+
+    if (estimator not in ESTIMATORS):
+        raise ValueError(f"Unknown estimator {estimator}, expected one of {list(ESTIMATORS.keys())}")
+    if (prefilter is not None):
+        if (prefilter not in FILTERS):
+            raise ValueError(f"Unknown filter {prefilter}, expected one of {list(FILTERS.keys())}")
+        y = FILTERS[prefilter](groups, y)
+
+    if (weights is not None):
+        if (estimator not in WEIGHTED_ESTIMATORS):
+            raise ValueError(f"Estimator {estimator} does not support weights, expected one of {list(WEIGHTED_ESTIMATORS)}")
+        return ESTIMATORS[estimator](groups, x, y, numGroups, weights)
+
+    return ESTIMATORS[estimator](groups, x, y, numGroups)
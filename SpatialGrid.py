@@ -0,0 +1,242 @@
+import numpy as np
+from typing import Tuple
+
+from ParseData import LoadLogArrays, PairLeaderTrailerFiles
+
+"""Bins the trailing drone's telemetry into a 3D grid around the leading drone.
+
+Used to find where in the leading drone's wake (e.g. its downwash)
+the trailing drone loses stability or uses more battery.
+
+Methods:
+    LoadRelativeSamples:
+        Gets the trailing drone's samples relative to the leading drone for every pair of logs.
+"""
+
+def LoadRelativeSamples(pairs: list[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Gets the trailing drone's samples relative to the leading drone for every pair of logs.
+
+    Both drones start logging at the same time, so the logs are aligned by the
+    time since their first sample, and the leading drone's position is
+    interpolated to the times of the trailing drone's samples. Every pair is
+    interpolated in a single call by offsetting each pair's times.
+
+    Parameters:
+        pairs: list[Tuple[str, str]]
+            The (leadingFile, trailingFile) pairs, as given by ParseData.PairLeaderTrailerFiles.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            A tuple containing an (n, 3) array of the trailing drone's position
+            minus the leading drone's position, the trailing drone's vertical
+            velocity, and the local battery slope in V/s of each sample.
+    """
+
+    leaders = [LoadLogArrays(leadingFile) for leadingFile, trailingFile in pairs]
+    trailers = [LoadLogArrays(trailingFile) for leadingFile, trailingFile in pairs]
+
+    def Concatenate(logs: list[dict[str, np.ndarray]]) -> Tuple[dict[str, np.ndarray], np.ndarray]:
+        # Joins the logs together, with each pair's times offset far past the previous pair.
+        data = {column: np.concatenate([log[column] for log in logs]) for column in ("timestamp", "x", "y", "z", "vz", "batteryV")}
+        pair = np.repeat(np.arange(len(logs)), [len(log["timestamp"]) for log in logs])
+        firstTimestamps = np.array([log["timestamp"][0] for log in logs])
+        data["time"] = (data["timestamp"] - firstTimestamps[pair]) / 1000.0
+        return data, pair
+
+    leader, leaderPair = Concatenate(leaders)
+    trailer, trailerPair = Concatenate(trailers)
+
+    # Makes the times increase across pairs so they can be interpolated together.
+    span = max(leader["time"].max(), trailer["time"].max()) + 1.0
+    leaderTimes = leader["time"] + leaderPair * span
+    trailerTimes = trailer["time"] + trailerPair * span
+
+    offsets = np.column_stack([trailer[axis] - np.interp(trailerTimes, leaderTimes, leader[axis]) for axis in ("x", "y", "z")])
+
+    # Gets the change in battery voltage since the previous sample of the same log.
+    slopes = np.zeros(len(trailerTimes))
+    samePair = trailerPair[1:] == trailerPair[:-1]
+    dt = np.diff(trailer["time"])
+    valid = samePair & (dt > 0)
+    slopes[1:][valid] = np.diff(trailer["batteryV"])[valid] / dt[valid]
+
+    return offsets, trailer["vz"], slopes
+
+class SpatialGrid:
+    """Accumulates the trailing drone's samples into a 3D grid around the leading drone.
+
+    The grid only stores sums and counts, so grids built from different logs can
+    be merged by adding them together, and new logs can be added at any time.
+
+    Attributes:
+        lower: np.ndarray
+            The (dx, dy, dz) offset in m of the lower corner of the grid.
+        cellSize: float
+            The length in m of each side of a cell.
+        shape: tuple[int, int, int]
+            The number of cells along each axis.
+        counts: np.ndarray
+            The number of samples in each cell.
+        sumAbsVz: np.ndarray
+            The sum of |vz| of the samples in each cell.
+        sumSlopes: np.ndarray
+            The sum of the local battery slopes of the samples in each cell.
+        files: set[str]
+            The trailing logs which have already been added.
+
+    Methods:
+        AddSamples:
+            Adds samples to the grid.
+        AddFolder:
+            Adds every pair of logs in a folder that hasn't been added yet.
+        Merge:
+            Adds another grid's samples to this grid.
+        GetMeanAbsVz:
+            Gets the mean |vz| of each cell.
+        GetMeanSlopes:
+            Gets the mean battery slope of each cell.
+        Save:
+            Saves the grid to a file.
+        Load:
+            Loads a grid from a file.
+    """
+
+    def __init__(self, lower: tuple[float, float, float]=(-2.0, -0.5, -1.0), upper: tuple[float, float, float]=(1.0, 0.5, 0.25), cellSize: float=0.05):
+        """Initialises an empty SpatialGrid.
+
+        Parameters:
+            lower: tuple[float, float, float]
+                The lowest (dx, dy, dz) offset from the leading drone in m to include.
+            upper: tuple[float, float, float]
+                The highest (dx, dy, dz) offset from the leading drone in m to include.
+            cellSize: float
+                The length in m of each side of a cell.
+        """
+
+        self.lower = np.array(lower, dtype=float)
+        self.cellSize = cellSize
+        self.shape = tuple(int(n) for n in np.ceil((np.array(upper) - self.lower) / cellSize - 1e-9))
+        self.counts = np.zeros(self.shape)
+        self.sumAbsVz = np.zeros(self.shape)
+        self.sumSlopes = np.zeros(self.shape)
+        self.files = set()
+
+    def AddSamples(self, offsets: np.ndarray, vz: np.ndarray, slopes: np.ndarray) -> None:
+        """Adds samples to the grid.
+
+        Samples outside of the grid are ignored.
+
+        Parameters:
+            offsets: np.ndarray
+                An (n, 3) array of the trailing drone's position relative to the leading drone.
+            vz: np.ndarray
+                The vertical velocity of each sample.
+            slopes: np.ndarray
+                The local battery slope of each sample.
+        """
+
+        # Finds the cell of each sample.
+        cells = np.floor((offsets - self.lower) / self.cellSize).astype(int)
+        inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        flatCells = np.ravel_multi_index(tuple(cells[inside].T), self.shape)
+
+        # Accumulates every sample into its cell at once.
+        size = self.counts.size
+        self.counts += np.bincount(flatCells, minlength=size).reshape(self.shape)
+        self.sumAbsVz += np.bincount(flatCells, np.abs(vz[inside]), minlength=size).reshape(self.shape)
+        self.sumSlopes += np.bincount(flatCells, slopes[inside], minlength=size).reshape(self.shape)
+
+    def AddFolder(self, folder: str) -> int:
+        """Adds every pair of logs in a folder that hasn't been added yet.
+
+        Parameters:
+            folder: str
+                The folder containing the logs.
+
+        Returns:
+            int:
+                The number of pairs that were added.
+        """
+
+        pairs = [pair for pair in PairLeaderTrailerFiles(folder) if pair[1] not in self.files]
+        if (len(pairs) == 0):
+            return 0
+
+        self.AddSamples(*LoadRelativeSamples(pairs))
+        self.files.update(trailingFile for leadingFile, trailingFile in pairs)
+
+        return len(pairs)
+
+    def Merge(self, other: "SpatialGrid") -> None:
+        """Adds another grid's samples to this grid.
+
+        Parameters:
+            other: SpatialGrid
+                The grid to merge in. Must have the same bounds and cell size.
+        """
+
+        if (other.shape != self.shape or other.cellSize != self.cellSize or not np.allclose(other.lower, self.lower)):
+            raise ValueError("Cannot merge grids with different bounds or cell sizes")
+
+        self.counts += other.counts
+        self.sumAbsVz += other.sumAbsVz
+        self.sumSlopes += other.sumSlopes
+        self.files.update(other.files)
+
+    def GetMeanAbsVz(self) -> np.ndarray:
+        """Gets the mean |vz| of each cell.
+
+        Returns:
+            np.ndarray:
+                The mean |vz| in m/s of each cell, or NaN for empty cells.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sumAbsVz / self.counts, np.nan)
+
+    def GetMeanSlopes(self) -> np.ndarray:
+        """Gets the mean battery slope of each cell.
+
+        Returns:
+            np.ndarray:
+                The mean battery slope in V/s of each cell, or NaN for empty cells.
+        """
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sumSlopes / self.counts, np.nan)
+
+    def Save(self, fileName: str) -> None:
+        """Saves the grid to a file.
+
+        Parameters:
+            fileName: str
+                The .npz file to save the grid to.
+        """
+
+        np.savez(fileName, lower=self.lower, cellSize=self.cellSize, counts=self.counts, sumAbsVz=self.sumAbsVz,
+                 sumSlopes=self.sumSlopes, files=np.array(sorted(self.files), dtype=str))
+
+    @staticmethod
+    def Load(fileName: str) -> "SpatialGrid":
+        """Loads a grid from a file.
+
+        Parameters:
+            fileName: str
+                The .npz file the grid was saved to.
+
+        Returns:
+            SpatialGrid:
+                The loaded grid.
+        """
+
+        data = np.load(fileName)
+
+        grid = SpatialGrid(cellSize=float(data["cellSize"]))
+        grid.lower = data["lower"]
+        grid.shape = data["counts"].shape
+        grid.counts = data["counts"]
+        grid.sumAbsVz = data["sumAbsVz"]
+        grid.sumSlopes = data["sumSlopes"]
+        grid.files = set(data["files"].tolist())
+
+        return grid
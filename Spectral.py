@@ -0,0 +1,234 @@
+import numpy as np
+from typing import Tuple
+
+from ParseData import LoadFolderArrays, LoadLogArrays, PairLeaderTrailerFiles
+
+"""Analyses the oscillation of the drones' positions in the frequency domain.
+
+The logs are sampled roughly every 100 ms, but packets can arrive late or
+go missing, so every trial is first resampled onto a uniform time grid.
+The trials are then stacked into one 2D array (padded with NaN) so that
+the FFTs of every trial are done at once.
+
+Methods:
+    ResampleTrials:
+        Resamples the columns of every trial onto a uniform time grid.
+    WelchPSD:
+        Gets the Welch power spectral density of every trial.
+    GetDominantFrequencies:
+        Gets the frequency with the most power in each trial.
+    AnalyseFolderSpectra:
+        Gets the power spectral density and dominant frequency of every trial in a folder.
+    EstimateDownwashDelays:
+        Estimates the delay between the leading and trailing drones' heights for every pair of logs.
+"""
+
+# The rate in Hz that the logs are resampled to.
+SAMPLE_RATE = 10.0
+
+def ResampleTrials(data: dict[str, np.ndarray], columns: tuple[str], sampleRate: float=SAMPLE_RATE) -> Tuple[dict[str, np.ndarray], np.ndarray]:
+    """Resamples the columns of every trial onto a uniform time grid.
+
+    Every trial is interpolated in a single call by offsetting each trial's times.
+
+    Parameters:
+        data: dict[str, np.ndarray]
+            The concatenated logs, as given by ParseData.LoadFolderArrays.
+        columns: tuple[str]
+            The columns to resample.
+        sampleRate: float
+            The rate in Hz of the uniform time grid.
+
+    Returns:
+        Tuple[dict[str, np.ndarray], np.ndarray]:
+            A tuple where
+                the first entry maps each column to a (numTrials, maxLength) array of
+                the resampled trials, padded with NaN after the end of each trial, and
+                the second entry is the number of resampled samples in each trial.
+    """
+
+    trial = data["trial"]
+    numTrials = trial.max() + 1
+
+    # Gets the duration of each trial.
+    durations = np.zeros(numTrials)
+    np.maximum.at(durations, trial, data["time"])
+    lengths = np.floor(durations * sampleRate).astype(int) + 1
+    maxLength = lengths.max()
+
+    # Builds the uniform grid of every trial, with each trial offset
+    # past the end of the previous one.
+    span = durations.max() + 1.0
+    rows, steps = np.divmod(np.arange(numTrials * maxLength), maxLength)
+    valid = steps < lengths[rows]
+    gridTimes = steps[valid] / sampleRate + rows[valid] * span
+    sampleTimes = data["time"] + trial * span
+
+    output = {}
+    for column in columns:
+        resampled = np.full(numTrials * maxLength, np.nan)
+        resampled[valid] = np.interp(gridTimes, sampleTimes, data[column])
+        output[column] = resampled.reshape(numTrials, maxLength)
+
+    return output, lengths
+
+def WelchPSD(signals: np.ndarray, lengths: np.ndarray, sampleRate: float=SAMPLE_RATE, segmentLength: int=16, overlap: float=0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """Gets the Welch power spectral density of every trial.
+
+    Each trial is split into overlapping Hann-windowed segments, and the
+    periodograms of the segments are averaged. The segments of every trial
+    are transformed in a single FFT.
+
+    Parameters:
+        signals: np.ndarray
+            A (numTrials, maxLength) array of uniformly sampled trials, padded with NaN.
+        lengths: np.ndarray
+            The number of samples in each trial.
+        sampleRate: float
+            The rate in Hz of the samples.
+        segmentLength: int
+            The number of samples in each segment.
+        overlap: float
+            The fraction of each segment which overlaps the next.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            The frequencies in Hz, and a (numTrials, numFrequencies) array of
+            the power spectral density of each trial. Trials shorter than
+            one segment have a density of NaN.
+    """
+
+    step = max(int(segmentLength * (1 - overlap)), 1)
+
+    # Pads the signals so that every trial has room for at least one segment.
+    if (signals.shape[1] < segmentLength):
+        signals = np.pad(signals, ((0, 0), (0, segmentLength - signals.shape[1])), constant_values=np.nan)
+
+    # Cuts every trial into segments, keeping only the segments
+    # which fit within their trial.
+    segments = np.lib.stride_tricks.sliding_window_view(signals, segmentLength, axis=1)[:, ::step]
+    starts = np.arange(segments.shape[1]) * step
+    valid = starts[None, :] + segmentLength <= lengths[:, None]
+
+    # Removes the mean of each segment and applies the window.
+    window = np.hanning(segmentLength + 1)[:-1]
+    segments = np.where(valid[:, :, None], segments, 0.0)
+    segments = (segments - segments.mean(axis=2, keepdims=True)) * window
+
+    # Gets the one-sided periodogram of every segment.
+    spectra = np.abs(np.fft.rfft(segments, axis=2))**2 / (sampleRate * np.sum(window**2))
+    spectra[:, :, 1:] *= 2
+    if (segmentLength % 2 == 0):
+        spectra[:, :, -1] /= 2
+
+    # Averages the valid segments of each trial.
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        psd = np.sum(spectra * valid[:, :, None], axis=1) / counts[:, None]
+
+    return np.fft.rfftfreq(segmentLength, 1 / sampleRate), psd
+
+def GetDominantFrequencies(frequencies: np.ndarray, psd: np.ndarray) -> np.ndarray:
+    """Gets the frequency with the most power in each trial, ignoring the mean.
+
+    Parameters:
+        frequencies: np.ndarray
+            The frequencies in Hz.
+        psd: np.ndarray
+            A (numTrials, numFrequencies) array of power spectral densities.
+
+    Returns:
+        np.ndarray:
+            The dominant frequency in Hz of each trial, or NaN if its density is NaN.
+    """
+
+    power = np.where(np.isnan(psd[:, 1:]), -np.inf, psd[:, 1:])
+    dominant = frequencies[1:][np.argmax(power, axis=1)]
+
+    return np.where(np.isnan(psd).all(axis=1), np.nan, dominant)
+
+def AnalyseFolderSpectra(folder: str, columns: tuple[str]=("y", "z", "vz"), sampleRate: float=SAMPLE_RATE,
+                         segmentLength: int=16) -> Tuple[dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], list[str]]:
+    """Gets the power spectral density and dominant frequency of every trial in a folder.
+
+    Parameters:
+        folder: str
+            The folder containing the logs.
+        columns: tuple[str]
+            The columns to analyse.
+        sampleRate: float
+            The rate in Hz to resample the logs at.
+        segmentLength: int
+            The number of samples in each Welch segment.
+
+    Returns:
+        Tuple[dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], list[str]]:
+            A tuple where
+                the first entry maps each column to a tuple containing the frequencies,
+                the (numTrials, numFrequencies) power spectral densities and the
+                dominant frequency of each trial, and
+                the second entry is the list of files, in the same order as the trials.
+    """
+
+    data, files = LoadFolderArrays(folder)
+    resampled, lengths = ResampleTrials(data, columns, sampleRate)
+
+    output = {}
+    for column in columns:
+        frequencies, psd = WelchPSD(resampled[column], lengths, sampleRate, segmentLength)
+        output[column] = (frequencies, psd, GetDominantFrequencies(frequencies, psd))
+
+    return output, files
+
+def EstimateDownwashDelays(folder: str, sampleRate: float=SAMPLE_RATE, maxDelay: float=2.0) -> Tuple[np.ndarray, list[Tuple[str, str]]]:
+    """Estimates the delay between the leading and trailing drones' heights for every pair of logs.
+
+    The heights are cross-correlated with FFTs, and the delay is the lag
+    with the highest correlation. The cross-correlations of every pair
+    are done at once.
+
+    Parameters:
+        folder: str
+            The folder containing the logs.
+        sampleRate: float
+            The rate in Hz to resample the logs at.
+        maxDelay: float
+            The largest delay in s, either way, to search for.
+
+    Returns:
+        Tuple[np.ndarray, list[Tuple[str, str]]]:
+            A tuple containing the delay in s of each pair, where a positive delay means
+            the trailing drone's height follows the leading drone's, and the
+            (leadingFile, trailingFile) pairs in the same order.
+    """
+
+    pairs = PairLeaderTrailerFiles(folder)
+
+    # Stacks the leading logs followed by the trailing logs so they
+    # can be resampled together.
+    logs = [LoadLogArrays(leadingFile) for leadingFile, trailingFile in pairs] + [LoadLogArrays(trailingFile) for leadingFile, trailingFile in pairs]
+    data = {"z": np.concatenate([log["z"] for log in logs])}
+    data["trial"] = np.repeat(np.arange(len(logs)), [len(log["z"]) for log in logs])
+    firstTimestamps = np.array([log["timestamp"][0] for log in logs])
+    data["time"] = (np.concatenate([log["timestamp"] for log in logs]) - firstTimestamps[data["trial"]]) / 1000.0
+
+    resampled, lengths = ResampleTrials(data, ("z",), sampleRate)
+    heights = resampled["z"]
+
+    # Removes the mean of each trial and zeroes the padding.
+    heights = heights - np.nanmean(heights, axis=1, keepdims=True)
+    heights = np.nan_to_num(heights)
+    leading = heights[:len(pairs)]
+    trailing = heights[len(pairs):]
+
+    # Pads to at least twice the length so the correlation doesn't wrap around.
+    size = 1 << int(np.ceil(np.log2(2 * heights.shape[1])))
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(leading, size, axis=1)) * np.fft.rfft(trailing, size, axis=1), size, axis=1)
+
+    # Only searches lags up to the maximum delay either way.
+    maxLag = int(maxDelay * sampleRate)
+    lags = np.concatenate((np.arange(0, maxLag + 1), np.arange(-maxLag, 0)))
+    # Slices the negative lags explicitly, since correlation[:, -0:] would be the whole array.
+    window = np.concatenate((correlation[:, :maxLag + 1], correlation[:, -maxLag:] if maxLag > 0 else correlation[:, :0]), axis=1)
+
+    return lags[np.argmax(window, axis=1)] / sampleRate, pairs
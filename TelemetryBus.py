@@ -0,0 +1,403 @@
+import collections
+import json
+import os
+import socket
+import threading
+from typing import NamedTuple
+
+"""Fans out the telemetry of every drone to live views and monitors while it is logged.
+
+logs.LogCallback publishes every sample to the TelemetryBus of its
+CommanderFlight, if it has one. Each subscriber gets its own bounded queue,
+so publishing never waits on a subscriber: when a subscriber falls behind,
+its queue drops samples according to its policy and counts them, and the
+log callback carries on at the same speed.
+
+Other processes can attach to a running swarm through a TelemetryServer,
+which streams the samples over a Unix socket as one JSON object per line.
+
+Usage:
+    bus = TelemetryBus()
+    for com in coms:
+        com.telemetryBus = bus
+    subscription = bus.Subscribe(maxSize=100)
+    while ((sample := subscription.Get(1.0)) is not None):
+        print(sample.uri, sample.batteryV)
+
+Methods:
+    TelemetrySample:
+        A single sample of telemetry from a drone.
+    Subscription:
+        Queues the samples published to a TelemetryBus for one subscriber.
+    TelemetryBus:
+        Publishes samples to every subscriber.
+    TelemetryServer:
+        Streams the samples published to a TelemetryBus over a Unix socket.
+    ReadTelemetry:
+        Reads the samples streamed by a TelemetryServer.
+"""
+
+# What a full queue does with a new sample: "drop-oldest" throws away the
+# oldest queued sample, which suits live views, and "drop-newest" throws
+# away the new sample, which suits consumers that need every sample up to a gap.
+POLICIES = ("drop-oldest", "drop-newest")
+
+# The number of samples each subscriber can fall behind by default.
+DEFAULT_QUEUE_SIZE = 1000
+
+class TelemetrySample(NamedTuple):
+    """A single sample of telemetry from a drone, with the columns of a log file.
+    """
+
+    uri: str
+    timestamp: int
+    x: float
+    y: float
+    z: float
+    vx: float
+    vy: float
+    vz: float
+    batteryV: float
+    batteryPercent: float
+    period: float
+    # The time.time() that the sample arrived at.
+    received: float
+
+class Subscription:
+    """Queues the samples published to a TelemetryBus for one subscriber.
+
+    Attributes:
+        maxSize: int
+            The most samples that can be queued.
+        policy: str
+            What to do with a new sample when the queue is full, from POLICIES.
+        uris: set[str]
+            The URIs of the drones to receive samples from, or None for every drone.
+        dropped: int
+            The number of samples that have been dropped because the queue was full.
+        closed: bool
+            Whether the subscription has been closed.
+
+    Methods:
+        Offer:
+            Queues a sample without waiting.
+        Get:
+            Gets the next sample, waiting for one if necessary.
+        GetAll:
+            Gets every queued sample without waiting.
+        Close:
+            Stops the subscription.
+    """
+
+    def __init__(self, maxSize: int=DEFAULT_QUEUE_SIZE, policy: str="drop-oldest", uris: list[str]=None):
+        """Initialises a Subscription object.
+
+        Parameters:
+            maxSize: int
+                The most samples that can be queued.
+            policy: str
+                What to do with a new sample when the queue is full, from POLICIES.
+            uris: list[str]
+                The URIs of the drones to receive samples from. Receives from every drone by default.
+        """
+
+        if (policy not in POLICIES):
+            raise ValueError(f"Unknown policy {policy}, expected one of {', '.join(POLICIES)}")
+        if (maxSize < 1):
+            raise ValueError(f"The queue must hold at least 1 sample, not {maxSize}")
+
+        self.maxSize = maxSize
+        self.policy = policy
+        self.uris = set(uris) if uris is not None else None
+        self.dropped = 0
+        self.closed = False
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+
+    def Offer(self, sample: TelemetrySample) -> bool:
+        """Queues a sample without waiting, dropping a sample if the queue is full.
+
+        Parameters:
+            sample: TelemetrySample
+                The sample to queue.
+
+        Returns:
+            bool:
+                Whether the sample was queued.
+        """
+
+        if (self.uris is not None and sample.uri not in self.uris):
+            return False
+
+        with self._condition:
+            if (self.closed):
+                return False
+
+            if (len(self._queue) >= self.maxSize):
+                self.dropped += 1
+                if (self.policy == "drop-newest"):
+                    return False
+                self._queue.popleft()
+
+            self._queue.append(sample)
+            self._condition.notify()
+
+        return True
+
+    def Get(self, timeout: float=None) -> TelemetrySample:
+        """Gets the next sample, waiting for one if the queue is empty.
+
+        Parameters:
+            timeout: float
+                The longest time in s to wait. Waits until a sample arrives by default.
+
+        Returns:
+            TelemetrySample:
+                The next sample, or None if the timeout passed or the subscription was closed.
+        """
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self.closed, timeout)
+            if (not self._queue):
+                return None
+
+            return self._queue.popleft()
+
+    def GetAll(self) -> list[TelemetrySample]:
+        """Gets every queued sample without waiting.
+
+        Returns:
+            list[TelemetrySample]:
+                The queued samples, oldest first.
+        """
+
+        with self._condition:
+            samples = list(self._queue)
+            self._queue.clear()
+
+        return samples
+
+    def Close(self) -> None:
+        """Stops the subscription, waking anything waiting in Get.
+        """
+
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class TelemetryBus:
+    """Publishes samples to every subscriber.
+
+    Methods:
+        Subscribe:
+            Adds a subscriber.
+        Unsubscribe:
+            Removes a subscriber.
+        Publish:
+            Sends a sample to every subscriber without waiting.
+        GetDropped:
+            Gets the number of samples each subscriber has dropped.
+    """
+
+    def __init__(self):
+        """Initialises a TelemetryBus object with no subscribers.
+        """
+
+        self._subscriptions = ()
+        self._lock = threading.Lock()
+
+    def Subscribe(self, maxSize: int=DEFAULT_QUEUE_SIZE, policy: str="drop-oldest", uris: list[str]=None) -> Subscription:
+        """Adds a subscriber.
+
+        Parameters:
+            maxSize: int
+                The most samples that can be queued for the subscriber.
+            policy: str
+                What to do with a new sample when the queue is full, from POLICIES.
+            uris: list[str]
+                The URIs of the drones to receive samples from. Receives from every drone by default.
+
+        Returns:
+            Subscription:
+                The queue of samples for the subscriber.
+        """
+
+        subscription = Subscription(maxSize, policy, uris)
+
+        # Replaces the tuple rather than changing it, so Publish never needs the lock.
+        with self._lock:
+            self._subscriptions = self._subscriptions + (subscription,)
+
+        return subscription
+
+    def Unsubscribe(self, subscription: Subscription) -> None:
+        """Removes a subscriber and closes its subscription.
+
+        Parameters:
+            subscription: Subscription
+                The subscription returned by Subscribe.
+        """
+
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+
+        subscription.Close()
+
+    def Publish(self, sample: TelemetrySample) -> None:
+        """Sends a sample to every subscriber without waiting.
+
+        Parameters:
+            sample: TelemetrySample
+                The sample to send.
+        """
+
+        for subscription in self._subscriptions:
+            subscription.Offer(sample)
+
+    def GetDropped(self) -> list[int]:
+        """Gets the number of samples each subscriber has dropped.
+
+        Returns:
+            list[int]:
+                The number of dropped samples of each subscription, in the order they subscribed.
+        """
+
+        return [subscription.dropped for subscription in self._subscriptions]
+
+class TelemetryServer:
+    """Streams the samples published to a TelemetryBus over a Unix socket.
+
+    Every client that connects gets its own Subscription, and a thread which
+    sends it the samples as lines of JSON, so a slow client only drops its
+    own samples.
+
+    Attributes:
+        bus: TelemetryBus
+            The bus whose samples are streamed.
+        path: str
+            The path of the Unix socket.
+        maxSize: int
+            The most samples that can be queued for each client.
+
+    Methods:
+        Start:
+            Starts accepting clients.
+        Stop:
+            Disconnects every client and removes the socket.
+    """
+
+    def __init__(self, bus: TelemetryBus, path: str, maxSize: int=DEFAULT_QUEUE_SIZE):
+        """Initialises a TelemetryServer object.
+
+        Parameters:
+            bus: TelemetryBus
+                The bus whose samples are streamed.
+            path: str
+                The path of the Unix socket to create.
+            maxSize: int
+                The most samples that can be queued for each client.
+        """
+
+        self.bus = bus
+        self.path = path
+        self.maxSize = maxSize
+        self._server = None
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def Start(self) -> None:
+        """Starts accepting clients on a background thread.
+        """
+
+        # Removes the socket left behind by a previous run.
+        if (os.path.exists(self.path)):
+            os.remove(self.path)
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        threading.Thread(target=self._Accept, name="TelemetryServer", daemon=True).start()
+
+    def Stop(self) -> None:
+        """Disconnects every client and removes the socket.
+        """
+
+        if (self._server is None):
+            return
+
+        self._server.close()
+        self._server = None
+        with self._lock:
+            for subscription in self._subscriptions:
+                self.bus.Unsubscribe(subscription)
+            self._subscriptions = []
+
+        if (os.path.exists(self.path)):
+            os.remove(self.path)
+
+    def _Accept(self) -> None:
+        """Accepts clients until the server is stopped, starting a thread to send to each.
+        """
+
+        server = self._server
+        while (True):
+            try:
+                client, address = server.accept()
+            except OSError:
+                return
+
+            subscription = self.bus.Subscribe(self.maxSize)
+            with self._lock:
+                self._subscriptions.append(subscription)
+            threading.Thread(target=self._Send, args=(client, subscription), name="TelemetryClient", daemon=True).start()
+
+    def _Send(self, client: socket.socket, subscription: Subscription) -> None:
+        """Sends the samples of a subscription to a client until either is closed.
+
+        Parameters:
+            client: socket.socket
+                The connection to the client.
+            subscription: Subscription
+                The client's subscription.
+        """
+
+        try:
+            while ((sample := subscription.Get()) is not None):
+                # Sends every sample that queued up while waiting at once.
+                samples = [sample] + subscription.GetAll()
+                client.sendall("".join(json.dumps(s._asdict()) + "\n" for s in samples).encode())
+        except OSError:
+            pass
+        finally:
+            client.close()
+            with self._lock:
+                if (subscription in self._subscriptions):
+                    self._subscriptions.remove(subscription)
+            self.bus.Unsubscribe(subscription)
+
+def ReadTelemetry(path: str, timeout: float=None):
+    """Reads the samples streamed by a TelemetryServer.
+
+    Parameters:
+        path: str
+            The path of the server's Unix socket.
+        timeout: float
+            The longest time in s to wait for a sample before stopping. Waits forever by default.
+
+    Returns:
+        A generator of every TelemetrySample streamed until the server stops.
+    """
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    client.connect(path)
+    file = client.makefile("r")
+
+    try:
+        for line in file:
+            yield TelemetrySample(**json.loads(line))
+    except socket.timeout:
+        return
+    finally:
+        file.close()
+        client.close()
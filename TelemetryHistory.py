@@ -0,0 +1,199 @@
+import threading
+import numpy as np
+
+"""Keeps the recent telemetry of a drone in memory, for flight code that needs more than the latest sample.
+
+Every CommanderFlight has a TelemetryHistory which is filled by UpdateState,
+so the flight routines can ask for e.g. the mean velocity or the voltage
+trend over the last few seconds without reading the log file back.
+
+The samples are kept in a NumPy array allocated once, which is written to
+in a circle, so appending a sample is O(1) and the memory used stays the
+same however long the drone flies. Only the last capacity samples are kept.
+
+Methods:
+    TelemetryHistory:
+        Stores the most recent samples of a drone's telemetry.
+"""
+
+# The columns of every sample. The time is in s.
+COLUMNS = ("time", "x", "y", "z", "vx", "vy", "vz", "batteryV", "batteryPercent")
+
+# The number of samples kept by default, 2 minutes at the fastest period of logs.DEFAULT_RATE_PROFILE.
+DEFAULT_CAPACITY = 6000
+
+class TelemetryHistory:
+    """Stores the most recent samples of a drone's telemetry.
+
+    Samples must be appended in order of time. Window queries are measured
+    back from the time of the latest sample.
+
+    Attributes:
+        capacity: int
+            The most samples that are kept.
+        count: int
+            The number of samples currently kept.
+
+    Methods:
+        Append:
+            Adds a sample, overwriting the oldest sample if full.
+        Clear:
+            Throws away every sample.
+        GetWindow:
+            Gets the samples from the last few seconds.
+        Mean:
+            Gets the mean of a column over the last few seconds.
+        Variance:
+            Gets the variance of a column over the last few seconds.
+        Slope:
+            Gets the rate of change of a column over the last few seconds.
+    """
+
+    def __init__(self, capacity: int=DEFAULT_CAPACITY):
+        """Initialises an empty TelemetryHistory.
+
+        Parameters:
+            capacity: int
+                The most samples to keep.
+        """
+
+        if (capacity < 1):
+            raise ValueError(f"The history must hold at least 1 sample, not {capacity}")
+
+        self.capacity = capacity
+        self.count = 0
+        # The row that the next sample is written to.
+        self._next = 0
+        self._data = np.full((capacity, len(COLUMNS)), np.nan)
+        self._lock = threading.Lock()
+
+    def Append(self, time: float, position: list[float], velocity: list[float], batV: float, batP: float) -> None:
+        """Adds a sample, overwriting the oldest sample if the history is full.
+
+        Parameters:
+            time: float
+                The time of the sample in s.
+            position: list[float]
+                The position as an [x, y, z] list.
+            velocity: list[float]
+                The velocity as an [vx, vy, vz] list.
+            batV: float
+                The battery of the drone in volts.
+            batP: float
+                The battery of the drone as a percentage.
+        """
+
+        with self._lock:
+            row = self._data[self._next]
+            row[0] = time
+            row[1:4] = position
+            row[4:7] = velocity
+            row[7] = batV
+            row[8] = batP
+
+            self._next = (self._next + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def Clear(self) -> None:
+        """Throws away every sample.
+        """
+
+        with self._lock:
+            self.count = 0
+            self._next = 0
+
+    def GetWindow(self, seconds: float=None) -> np.ndarray:
+        """Gets the samples from the last few seconds.
+
+        Parameters:
+            seconds: float
+                How far back from the latest sample to go, in s. Gets every kept sample by default.
+
+        Returns:
+            np.ndarray:
+                A copy of the samples, oldest first, with a row per sample and a column per COLUMNS.
+        """
+
+        with self._lock:
+            # The kept samples are in two runs, the older from _next to the end of the
+            # array (only once the array is full) and the newer from the start to _next.
+            older = self._data[self._next:self.count]
+            newer = self._data[:self._next]
+
+            if (seconds is None or self.count == 0):
+                return np.concatenate((older, newer))
+
+            # Finds the first sample in the window by searching whichever run it is in.
+            start = self._data[self._next - 1, 0] - seconds
+            if (len(older) > 0 and (len(newer) == 0 or newer[0, 0] >= start)):
+                return np.concatenate((older[np.searchsorted(older[:, 0], start):], newer))
+
+            return newer[np.searchsorted(newer[:, 0], start):].copy()
+
+    def Mean(self, column: str, seconds: float=None) -> float:
+        """Gets the mean of a column over the last few seconds.
+
+        Parameters:
+            column: str
+                The column, from COLUMNS.
+            seconds: float
+                How far back from the latest sample to go, in s. Uses every kept sample by default.
+
+        Returns:
+            float:
+                The mean, or NaN if there are no samples.
+        """
+
+        values = self.GetWindow(seconds)[:, COLUMNS.index(column)]
+        if (len(values) == 0):
+            return np.nan
+
+        return float(values.mean())
+
+    def Variance(self, column: str, seconds: float=None) -> float:
+        """Gets the variance of a column over the last few seconds.
+
+        Parameters:
+            column: str
+                The column, from COLUMNS.
+            seconds: float
+                How far back from the latest sample to go, in s. Uses every kept sample by default.
+
+        Returns:
+            float:
+                The population variance, or NaN if there are no samples.
+        """
+
+        values = self.GetWindow(seconds)[:, COLUMNS.index(column)]
+        if (len(values) == 0):
+            return np.nan
+
+        return float(values.var())
+
+    def Slope(self, column: str, seconds: float=None) -> float:
+        """Gets the rate of change of a column over the last few seconds.
+
+        Fits a least squares line against time, e.g. the voltage trend in V/s.
+
+        Parameters:
+            column: str
+                The column, from COLUMNS.
+            seconds: float
+                How far back from the latest sample to go, in s. Uses every kept sample by default.
+
+        Returns:
+            float:
+                The gradient per s, or NaN if there are fewer than 2 samples.
+        """
+
+        window = self.GetWindow(seconds)
+        if (len(window) < 2):
+            return np.nan
+
+        times = window[:, 0] - window[:, 0].mean()
+        values = window[:, COLUMNS.index(column)]
+        spread = (times * times).sum()
+        if (spread == 0):
+            return np.nan
+
+        return float((times * (values - values.mean())).sum() / spread)
@@ -0,0 +1,213 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+import numpy as np
+from scipy import stats
+from typing import Tuple
+
+# Allows the modules in the root of the repo to be imported.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SlopeEstimators
+
+"""Checks the grouped slope estimators against scipy and times them.
+
+Each case is a batch of synthetic groups shaped like the trials: noisy
+lines with some outliers, and optionally with repeated x-coordinates (e.g.
+repeated timestamps) and groups of different sizes. Every group is fitted
+once with the grouped estimator and once with scipy, one group at a time as
+the analysis used to, and any slope that differs by more than the tolerance
+is reported.
+
+Run after changing SlopeEstimators:
+    python benchmarks/CheckEstimators.py
+
+Methods:
+    GenerateGroups:
+        Generates a batch of noisy lines with outliers.
+    CheckEstimator:
+        Fits a batch with a grouped estimator and with scipy, and compares them.
+    FormatChecks:
+        Formats the results of the checks as a table.
+"""
+
+# The (groups, largest size, repeated x-coordinates, varying sizes) of each case.
+CASES = (
+    (300, 100, False, False),
+    (1000, 100, False, False),
+    (1000, 60, True, True),
+    (100, 3, True, True),
+    # Larger than SlopeEstimators.MAX_PAIRWISE_SAMPLES, so Theil-Sen bisects.
+    (3, 6000, False, False),
+)
+# The largest difference allowed between a grouped slope and scipy's.
+TOLERANCE = 1e-8
+
+def _ScipyTheilSen(x: np.ndarray, y: np.ndarray) -> float:
+    """Gets the Theil-Sen slope of one group with scipy.
+
+    Parameters:
+        x: np.ndarray
+            The x-coordinates of the group.
+        y: np.ndarray
+            The y-coordinates of the group.
+
+    Returns:
+        float:
+            The slope, or NaN if the group has fewer than two distinct x-coordinates.
+    """
+
+    if (len(np.unique(x)) < 2):
+        return np.nan
+
+    # scipy warns about the pairs with the same x-coordinate, which it leaves out.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return stats.theilslopes(y, x)[0]
+
+def _ScipyLeastSquares(x: np.ndarray, y: np.ndarray) -> float:
+    """Gets the least squares slope of one group with scipy.
+
+    Parameters:
+        x: np.ndarray
+            The x-coordinates of the group.
+        y: np.ndarray
+            The y-coordinates of the group.
+
+    Returns:
+        float:
+            The slope, or NaN if the group has fewer than two distinct x-coordinates.
+    """
+
+    if (len(np.unique(x)) < 2):
+        return np.nan
+
+    return stats.linregress(x, y).slope
+
+# The estimators that are checked, with the scipy function each is checked against.
+REFERENCES = {
+    "ols": _ScipyLeastSquares,
+    "theilsen": _ScipyTheilSen,
+}
+
+def GenerateGroups(numGroups: int, size: int, ties: bool=False, varySizes: bool=False, seed: int=0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Generates a batch of noisy lines with outliers.
+
+    Parameters:
+        numGroups: int
+            The number of groups.
+        size: int
+            The number of samples in each group, or the most samples if the sizes vary.
+        ties: bool
+            Whether to round the samples, so that x- and y-coordinates repeat.
+        varySizes: bool
+            Whether to give the groups between half and all of size samples.
+        seed: int
+            The seed of the noise.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            The group, x-coordinate and y-coordinate of each sample, with the
+            samples of each group contiguous and in ascending order of x.
+    """
+
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(max(size // 2, 1), size + 1, numGroups) if varySizes else np.full(numGroups, size)
+    groups = np.repeat(np.arange(numGroups), sizes)
+
+    x = np.concatenate([np.sort(rng.random(n) * n) for n in sizes])
+    y = 0.3 * x + rng.standard_normal(len(x))
+    # Adds outliers to 10% of the samples, as the voltage sags do.
+    y[rng.random(len(x)) < 0.1] += 20.0
+
+    if (ties):
+        x = np.floor(x)
+        y = np.round(y)
+
+    return groups, x, y
+
+def CheckEstimator(estimator: str, groups: np.ndarray, x: np.ndarray, y: np.ndarray, numGroups: int) -> dict:
+    """Fits a batch with a grouped estimator and with scipy, and compares them.
+
+    Parameters:
+        estimator: str
+            The estimator to check, from REFERENCES.
+        groups: np.ndarray
+            The group of each sample.
+        x: np.ndarray
+            The x-coordinates of the samples.
+        y: np.ndarray
+            The y-coordinates of the samples.
+        numGroups: int
+            The total number of groups.
+
+    Returns:
+        dict:
+            The "time" in s of the grouped estimator and of "scipy", the largest
+            "error" between their slopes, and whether the same groups were "undefined".
+    """
+
+    start = time.perf_counter()
+    slopes = SlopeEstimators.EstimateSlopes(groups, x, y, numGroups, estimator)
+    groupedTime = time.perf_counter() - start
+
+    # Fits each group separately, as the analysis did before it was grouped.
+    starts = np.searchsorted(groups, np.arange(numGroups + 1))
+    start = time.perf_counter()
+    reference = np.array([REFERENCES[estimator](x[starts[i]:starts[i + 1]], y[starts[i]:starts[i + 1]]) for i in range(numGroups)])
+    scipyTime = time.perf_counter() - start
+
+    defined = ~np.isnan(reference)
+    return {
+        "time": groupedTime,
+        "scipy": scipyTime,
+        "error": float(np.max(np.abs(slopes[defined] - reference[defined]), initial=0.0)),
+        "undefined": bool(np.array_equal(np.isnan(slopes), ~defined)),
+    }
+
+def FormatChecks(results: list[Tuple[str, tuple, dict]]) -> str:
+    """Formats the results of the checks as a table.
+
+    Parameters:
+        results: list[Tuple[str, tuple, dict]]
+            The estimator, case from CASES and result from CheckEstimator of each check.
+
+    Returns:
+        str:
+            One line per check.
+    """
+
+    lines = [f"{'estimator':<10}{'groups':>8}{'size':>6}{'ties':>6}{'vary':>6}{'time s':>10}{'scipy s':>10}{'speedup':>9}{'error':>11}"]
+    for estimator, (numGroups, size, ties, varySizes), result in results:
+        speedup = result["scipy"] / result["time"] if result["time"] > 0 else float("inf")
+        lines.append(f"{estimator:<10}{numGroups:>8}{size:>6}{str(ties):>6}{str(varySizes):>6}{result['time']:>10.3f}"
+                     f"{result['scipy']:>10.3f}{speedup:>8.1f}x{result['error']:>11.1e}")
+
+    return "\n".join(lines)
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the grouped slope estimators against scipy and times them.")
+    parser.add_argument("--estimators", nargs="+", default=list(REFERENCES.keys()), help="The estimators to check.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="The largest difference allowed from scipy's slopes.")
+    arguments = parser.parse_args()
+
+    results = []
+    for estimator in arguments.estimators:
+        for case in CASES:
+            groups, x, y = GenerateGroups(*case)
+            results.append((estimator, case, CheckEstimator(estimator, groups, x, y, case[0])))
+    print(FormatChecks(results))
+
+    failed = False
+    for estimator, case, result in results:
+        if (result["error"] > arguments.tolerance or not result["undefined"]):
+            print(f"MISMATCH {estimator} on {case}: slopes differ from scipy by up to {result['error']:.1e}, "
+                  f"{'same' if result['undefined'] else 'different'} groups undefined")
+            failed = True
+
+    if (failed):
+        sys.exit(1)
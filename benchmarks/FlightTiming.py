@@ -0,0 +1,299 @@
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+# Allows the modules in the root of the repo to be imported.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# logs has to be imported before CommanderFlight, since they import each other.
+import logs
+from CommanderFlight import CommanderFlight
+from SimulatedCrazyflie import SimulatedCommander, SimulatedSyncCrazyflie
+
+"""Measures how closely the CommanderFlight routines keep to their 10 Hz setpoint cadence.
+
+Every drone flies the same short routine (TakeOff, Hover, MoveToPosition, Land)
+against a SimulatedCrazyflie, all in one process with a thread per drone, as
+they would be flown by cflib's Swarm. The commander of each drone is replaced
+with a RecordingCommander, which timestamps every setpoint. From these, each
+routine is scored by its achieved setpoint rate, the jitter of the intervals
+between setpoints, how far its duration was from the intended duration, and,
+for MoveToPosition, how far the implied speed was from the commanded speed.
+
+Run before a lab session to check the flight code still keeps its timing:
+    python benchmarks/FlightTiming.py --drones 1 5 10 20
+
+Methods:
+    FlyRoutine:
+        Flies the benchmark routine with one drone.
+    GetIntendedDuration:
+        Gets how long a routine of the benchmark is meant to take.
+    RunFlightTiming:
+        Flies the benchmark routine with several drones at once.
+    SummariseTiming:
+        Works out the timing statistics of each routine.
+    CheckTiming:
+        Finds the routines whose timing is outside the limits.
+    FormatTiming:
+        Formats the timing statistics as a table.
+"""
+
+# The rate in Hz that the routines are meant to send setpoints at.
+TARGET_RATE = 10.0
+# The percentiles of the jitter to report.
+JITTER_PERCENTILES = (50, 95, 99)
+
+# The height in m, duration in s, and distance in m of each part of the routine.
+ROUTINE_HEIGHT = 0.5
+ROUTINE_TIME = 1.0
+ROUTINE_DISTANCE = 1.0
+ROUTINE_VELOCITY = 0.5
+
+# The limits outside of which a routine's timing counts as a regression.
+MIN_RATE = 9.5
+MAX_JITTER = 0.02
+MAX_DURATION_ERROR = 0.05
+MAX_SPEED_ERROR = 0.05
+
+# The numbers of drones flown at once by default.
+DEFAULT_DRONES = (1, 2, 5, 10, 20)
+
+class RecordingCommander(SimulatedCommander):
+    """Stands in for cflib's Commander, timestamping every position setpoint.
+
+    Attributes:
+        routine: str
+            The routine currently being flown, which each setpoint is labelled with.
+        records: list[Tuple[str, float]]
+            The (routine, time) of every position setpoint, with the time from time.perf_counter().
+    """
+
+    def __init__(self, crazyflie):
+        """Initialises a RecordingCommander object.
+
+        Parameters:
+            crazyflie: SimulatedCrazyflie
+                The simulated Crazyflie that the commander controls.
+        """
+
+        super().__init__(crazyflie)
+        self.routine = None
+        self.records = []
+
+    def send_position_setpoint(self, x: float, y: float, z: float, yaw: float) -> None:
+        self.records.append((self.routine, time.perf_counter()))
+        super().send_position_setpoint(x, y, z, yaw)
+
+def FlyRoutine(com: CommanderFlight, durations: dict[str, float]) -> None:
+    """Flies the benchmark routine with one drone.
+
+    Parameters:
+        com: CommanderFlight
+            The drone, whose commander is a RecordingCommander.
+        durations: dict[str, float]
+            Filled with the measured duration in s of each routine.
+    """
+
+    commander = com.commander
+    routines = [
+        ("TakeOff", lambda: com.TakeOff(ROUTINE_HEIGHT, ROUTINE_TIME)),
+        ("Hover", lambda: com.Hover(ROUTINE_TIME)),
+        ("MoveToPosition", lambda: com.MoveToPosition([com.x + ROUTINE_DISTANCE, com.y, com.z], ROUTINE_VELOCITY)),
+        ("Land", lambda: com.Land(ROUTINE_TIME)),
+    ]
+
+    for name, routine in routines:
+        commander.routine = name
+        start = time.perf_counter()
+        routine()
+        durations[name] = time.perf_counter() - start
+
+def GetIntendedDuration(routine: str) -> float:
+    """Gets how long a routine of the benchmark is meant to take.
+
+    Parameters:
+        routine: str
+            The name of the routine.
+
+    Returns:
+        float:
+            The intended duration in s.
+    """
+
+    if (routine == "MoveToPosition"):
+        return ROUTINE_DISTANCE / ROUTINE_VELOCITY
+
+    # Land stops sending setpoints 2 steps before the ground.
+    if (routine == "Land"):
+        return (int(ROUTINE_TIME * TARGET_RATE) - 2) / TARGET_RATE
+
+    return ROUTINE_TIME
+
+def RunFlightTiming(drones: int, logging: bool=True) -> list[dict]:
+    """Flies the benchmark routine with several drones at once.
+
+    Parameters:
+        drones: int
+            The number of drones to fly at once.
+        logging: bool
+            Whether each drone logs with logs.StartLogging while flying,
+            so that the log callbacks compete with the setpoint loops.
+
+    Returns:
+        list[dict]:
+            For each drone, the durations of its routines and its RecordingCommander records.
+    """
+
+    logFolder = tempfile.mkdtemp()
+    scfs = [SimulatedSyncCrazyflie(f"sim://{i}", seed=i) for i in range(drones)]
+    coms = []
+    for scf in scfs:
+        scf.cf.commander = RecordingCommander(scf.cf)
+        scf.open_link()
+        coms.append(CommanderFlight(scf))
+
+    try:
+        configs = []
+        if (logging):
+            for com in coms:
+                logFile = logs.CreateSimpleLogFile(logFolder)
+                configs.append((logs.StartLogging(com, logFile, 1000), logFile))
+
+        # Flies every drone at once, a thread each.
+        durations = [{} for com in coms]
+        threads = [threading.Thread(target=FlyRoutine, args=(com, durations[i])) for i, com in enumerate(coms)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for com, (config, logFile) in zip(coms, configs):
+            logs.StopLogging(com, config, logFile)
+    finally:
+        for scf in scfs:
+            scf.close_link()
+        shutil.rmtree(logFolder)
+
+    return [{"durations": durations[i], "records": com.commander.records} for i, com in enumerate(coms)]
+
+def SummariseTiming(runs: list[dict]) -> dict[str, dict]:
+    """Works out the timing statistics of each routine.
+
+    The statistics of every drone are pooled together.
+
+    Parameters:
+        runs: list[dict]
+            The runs of each drone, as given by RunFlightTiming.
+
+    Returns:
+        dict[str, dict]:
+            For each routine, the lowest achieved rate in Hz of any drone, the percentiles and
+            max of the jitter in s, the worst relative duration error, and the worst relative speed error.
+    """
+
+    summary = {}
+    for routine in ("TakeOff", "Hover", "MoveToPosition", "Land"):
+        rates = []
+        jitters = []
+        durationErrors = []
+        speedErrors = []
+        intended = GetIntendedDuration(routine)
+
+        for run in runs:
+            times = np.array([recordTime for name, recordTime in run["records"] if name == routine])
+            duration = run["durations"][routine]
+
+            # The jitter is how far each interval between setpoints is from the intended interval.
+            if (len(times) > 1):
+                intervals = np.diff(times)
+                rates.append((len(times) - 1) / (times[-1] - times[0]))
+                jitters.append(np.abs(intervals - 1 / TARGET_RATE))
+
+            durationErrors.append((duration - intended) / intended)
+            if (routine == "MoveToPosition"):
+                speedErrors.append((ROUTINE_DISTANCE / duration - ROUTINE_VELOCITY) / ROUTINE_VELOCITY)
+
+        jitter = np.concatenate(jitters) if jitters else np.zeros(1)
+        summary[routine] = {
+            "rate": min(rates) if rates else math.nan,
+            "jitter": {percentile: float(np.percentile(jitter, percentile)) for percentile in JITTER_PERCENTILES},
+            "maxJitter": float(jitter.max()),
+            "durationError": max(durationErrors, key=abs),
+            "speedError": max(speedErrors, key=abs) if speedErrors else None,
+        }
+
+    return summary
+
+def CheckTiming(summary: dict[str, dict]) -> list[str]:
+    """Finds the routines whose timing is outside the limits.
+
+    Parameters:
+        summary: dict[str, dict]
+            The timing statistics, as given by SummariseTiming.
+
+    Returns:
+        list[str]:
+            A description of every limit that was broken.
+    """
+
+    failures = []
+    for routine, stats in summary.items():
+        if (stats["rate"] < MIN_RATE):
+            failures.append(f"{routine} sent setpoints at {stats['rate']:.2f} Hz, below {MIN_RATE} Hz")
+        if (stats["jitter"][99] > MAX_JITTER):
+            failures.append(f"{routine} had a p99 jitter of {stats['jitter'][99] * 1000:.1f} ms, above {MAX_JITTER * 1000:.0f} ms")
+        if (abs(stats["durationError"]) > MAX_DURATION_ERROR):
+            failures.append(f"{routine} took {stats['durationError']:+.1%} longer than intended")
+        if (stats["speedError"] is not None and abs(stats["speedError"]) > MAX_SPEED_ERROR):
+            failures.append(f"{routine} flew {stats['speedError']:+.1%} off the commanded speed")
+
+    return failures
+
+def FormatTiming(drones: int, summary: dict[str, dict]) -> str:
+    """Formats the timing statistics as a table.
+
+    Parameters:
+        drones: int
+            The number of drones that were flown at once.
+        summary: dict[str, dict]
+            The timing statistics, as given by SummariseTiming.
+
+    Returns:
+        str:
+            One line per routine.
+    """
+
+    header = "".join(f"{f'p{percentile} ms':>10}" for percentile in JITTER_PERCENTILES)
+    lines = [f"{drones} drones", f"    {'routine':<16}{'rate Hz':>10}{header}{'max ms':>10}{'duration':>10}{'speed':>10}"]
+    for routine, stats in summary.items():
+        jitter = "".join(f"{stats['jitter'][percentile] * 1000:>10.2f}" for percentile in JITTER_PERCENTILES)
+        speed = f"{stats['speedError']:>+10.1%}" if stats["speedError"] is not None else f"{'-':>10}"
+        lines.append(f"    {routine:<16}{stats['rate']:>10.2f}{jitter}{stats['maxJitter'] * 1000:>10.2f}{stats['durationError']:>+10.1%}{speed}")
+
+    return "\n".join(lines)
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the setpoint timing of the CommanderFlight routines.")
+    parser.add_argument("--drones", type=int, nargs="+", default=list(DEFAULT_DRONES), help="The numbers of drones to fly at once.")
+    parser.add_argument("--no-logging", action="store_true", help="Flies without logging.")
+    arguments = parser.parse_args()
+
+    failed = False
+    for drones in arguments.drones:
+        summary = SummariseTiming(RunFlightTiming(drones, not arguments.no_logging))
+        print(FormatTiming(drones, summary))
+
+        for failure in CheckTiming(summary):
+            print(f"    REGRESSION {failure}")
+            failed = True
+
+    if (failed):
+        sys.exit(1)
@@ -0,0 +1,347 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Plots are only saved to files, so no display is needed.
+import matplotlib
+matplotlib.use("Agg")
+
+# resource is only available on Unix, so the peak memory isn't measured elsewhere.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Allows the modules in the root of the repo to be imported.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ParseData
+import SyntheticLogs
+from AtomicWrite import AtomicWrite
+
+"""Times the ParseData entry points on synthetic campaigns of different sizes.
+
+Each benchmark is run in a fresh process, so its peak memory is measured on
+its own and nothing is cached between runs. Results are compared against a
+stored baseline, and any benchmark that got slower or used more memory than
+the tolerance allows is reported as a regression.
+
+PlotBatteryFromFolder saves one plot per log, so it takes hours at 100k trials.
+Use --only to leave it out of the larger campaigns.
+
+Usage, from the root of the repo:
+    python benchmarks/RunBenchmarks.py --trials 100 10000
+    python benchmarks/RunBenchmarks.py --trials 100 --only ExtractBatteryUsageFromFolder --save-baseline
+
+Methods:
+    PrepareCampaign:
+        Generates a synthetic campaign, or reuses it if it was already generated.
+    RunBenchmark:
+        Times a single benchmark in a separate process.
+    RunBenchmarks:
+        Times every benchmark on campaigns of every size.
+    CompareToBaseline:
+        Finds the benchmarks which regressed against a baseline.
+    LoadBaseline:
+        Loads the stored baseline results.
+    SaveBaseline:
+        Stores results as the new baseline.
+    FormatResults:
+        Formats the results as a table.
+"""
+
+# The folder the synthetic campaigns are generated in.
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# The file the baseline results are stored in.
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# The file in each campaign folder recording how it was generated.
+CAMPAIGN_FILE = "campaign.json"
+
+# The number of trials in each campaign that is benchmarked by default.
+DEFAULT_TRIALS = (100, 10000, 100000)
+# The fraction a benchmark can be slower, or use more memory, than the baseline before it is a regression.
+DEFAULT_TOLERANCE = 0.2
+
+# The benchmarks, each taking the campaign folder and a folder to write any output to.
+BENCHMARKS = {
+    "ListLogFiles": lambda folder, outputFolder: ParseData.ListLogFiles(folder),
+    "LoadFolderArrays": lambda folder, outputFolder: ParseData.LoadFolderArrays(folder),
+    "ExtractTrialRatesFromFolder": lambda folder, outputFolder: ParseData.ExtractTrialRatesFromFolder(folder),
+    "ExtractBatteryUsageFromFolder": lambda folder, outputFolder: ParseData.ExtractBatteryUsageFromFolder(folder),
+    "PairLeaderTrailerFiles": lambda folder, outputFolder: ParseData.PairLeaderTrailerFiles(folder),
+    "GetAllRSquaredValues": lambda folder, outputFolder: ParseData.GetAllRSquaredValues(folder),
+    "DetermineMinAndMaxFromFolder": lambda folder, outputFolder: ParseData.DetermineMinAndMaxFromFolder(folder),
+    "CalculatePositionVariance": lambda folder, outputFolder: ParseData.CalculatePositionVariance(folder),
+    "PlotBatteryFromFolder": lambda folder, outputFolder: ParseData.PlotBatteryFromFolder(folder, outputFolder),
+}
+
+def _GetPeakRss() -> int:
+    """Gets the peak resident memory of the current process.
+
+    Returns:
+        int:
+            The peak memory in bytes, or None if it can't be measured on this platform.
+    """
+
+    if (resource is None):
+        return None
+
+    # ru_maxrss is in bytes on macOS and in kB everywhere else.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def PrepareCampaign(trials: int, dataFolder: str=DATA_FOLDER, duration: float=SyntheticLogs.DEFAULT_DURATION,
+                    period: int=SyntheticLogs.DEFAULT_PERIOD, noise: float=SyntheticLogs.DEFAULT_NOISE, seed: int=0) -> str:
+    """Generates a synthetic campaign, or reuses it if it was already generated.
+
+    Parameters:
+        trials: int
+            The number of logs in the campaign.
+        dataFolder: str
+            The folder to generate the campaign in.
+        duration: float
+            The length of each trial in s.
+        period: int
+            The period in ms between rows.
+        noise: float
+            The standard deviation in m of the position noise.
+        seed: int
+            The seed of the noise.
+
+    Returns:
+        str:
+            The folder containing the campaign's logs.
+    """
+
+    settings = {"trials": trials, "duration": duration, "period": period, "noise": noise, "seed": seed}
+    folder = os.path.join(dataFolder, f"{trials}-{duration}s-{period}ms-{noise}-{seed}")
+    campaignFile = os.path.join(folder, CAMPAIGN_FILE)
+
+    # Reuses the campaign if it was completely generated with the same settings.
+    if (os.path.exists(campaignFile)):
+        file = open(campaignFile, "r")
+        existing = json.load(file)
+        file.close()
+        if (existing == settings):
+            return folder
+
+    # Starts again from an empty folder, so an interrupted campaign isn't reused.
+    if (os.path.exists(folder)):
+        shutil.rmtree(folder)
+    SyntheticLogs.GenerateCampaign(folder, trials, duration, period, noise, seed=seed)
+
+    # Only records the settings once every log is written.
+    file = open(campaignFile, "w")
+    json.dump(settings, file)
+    file.close()
+
+    return folder
+
+def _Benchmark(name: str, folder: str, queue: multiprocessing.Queue) -> None:
+    """Times a benchmark and puts the result on a queue. Runs in its own process.
+
+    Parameters:
+        name: str
+            The benchmark to run, from BENCHMARKS.
+        folder: str
+            The campaign folder to run it on.
+        queue: multiprocessing.Queue
+            The queue to put the (seconds, peak memory before, peak memory after) on.
+    """
+
+    outputFolder = tempfile.mkdtemp()
+    try:
+        startRss = _GetPeakRss()
+        start = time.perf_counter()
+        BENCHMARKS[name](folder, outputFolder)
+        seconds = time.perf_counter() - start
+        queue.put((seconds, startRss, _GetPeakRss()))
+    finally:
+        shutil.rmtree(outputFolder)
+
+def RunBenchmark(name: str, folder: str, repeats: int=1) -> dict:
+    """Times a single benchmark in a separate process.
+
+    Parameters:
+        name: str
+            The benchmark to run, from BENCHMARKS.
+        folder: str
+            The campaign folder to run it on.
+        repeats: int
+            The number of times to run the benchmark. The fastest run is kept.
+
+    Returns:
+        dict:
+            The seconds taken, the throughput in trials per second, the peak
+            memory in bytes, and the peak memory above that of an idle process.
+    """
+
+    trials = len(ParseData.ListLogFiles(folder))
+
+    # Spawns a new interpreter for each run, so the peak memory of earlier runs isn't inherited.
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for i in range(repeats):
+        queue = context.Queue()
+        process = context.Process(target=_Benchmark, args=(name, folder, queue))
+        process.start()
+        process.join()
+        if (process.exitcode != 0):
+            raise RuntimeError(f"Benchmark {name} failed with exit code {process.exitcode}")
+        runs.append(queue.get())
+
+    seconds, startRss, peakRss = min(runs)
+    return {
+        "seconds": seconds,
+        "throughput": trials / seconds,
+        "peakRss": peakRss,
+        "extraRss": peakRss - startRss if peakRss is not None else None,
+    }
+
+def RunBenchmarks(trialCounts: list[int]=DEFAULT_TRIALS, names: list[str]=None, repeats: int=1, dataFolder: str=DATA_FOLDER) -> dict[str, dict]:
+    """Times every benchmark on campaigns of every size.
+
+    Parameters:
+        trialCounts: list[int]
+            The number of logs in each campaign.
+        names: list[str]
+            The benchmarks to run. Runs every benchmark by default.
+        repeats: int
+            The number of times to run each benchmark.
+        dataFolder: str
+            The folder to generate the campaigns in.
+
+    Returns:
+        dict[str, dict]:
+            The result of each benchmark, keyed by "name@trials".
+    """
+
+    if (names is None):
+        names = list(BENCHMARKS.keys())
+
+    results = {}
+    for trials in trialCounts:
+        folder = PrepareCampaign(trials, dataFolder)
+        for name in names:
+            results[f"{name}@{trials}"] = RunBenchmark(name, folder, repeats)
+
+    return results
+
+def CompareToBaseline(results: dict[str, dict], baseline: dict[str, dict], tolerance: float=DEFAULT_TOLERANCE) -> list[str]:
+    """Finds the benchmarks which regressed against a baseline.
+
+    Parameters:
+        results: dict[str, dict]
+            The results, as given by RunBenchmarks.
+        baseline: dict[str, dict]
+            The baseline results, in the same form.
+        tolerance: float
+            The fraction a benchmark can be slower, or use more memory, before it is a regression.
+
+    Returns:
+        list[str]:
+            A description of every regression. Benchmarks missing from the baseline are skipped.
+    """
+
+    regressions = []
+    for key, result in results.items():
+        if (key not in baseline):
+            continue
+
+        previous = baseline[key]
+        if (result["seconds"] > previous["seconds"] * (1 + tolerance)):
+            regressions.append(f"{key} took {result['seconds']:.3f} s, baseline {previous['seconds']:.3f} s")
+
+        if (result["extraRss"] is not None and previous.get("extraRss") is not None
+                and result["extraRss"] > previous["extraRss"] * (1 + tolerance)):
+            regressions.append(f"{key} used {result['extraRss'] / 2**20:.1f} MiB, baseline {previous['extraRss'] / 2**20:.1f} MiB")
+
+    return regressions
+
+def LoadBaseline(fileName: str=BASELINE_FILE) -> dict[str, dict]:
+    """Loads the stored baseline results.
+
+    Parameters:
+        fileName: str
+            The .json file the baseline is stored in.
+
+    Returns:
+        dict[str, dict]:
+            The baseline results, or an empty dictionary if there is no baseline.
+    """
+
+    if (not os.path.exists(fileName)):
+        return {}
+
+    file = open(fileName, "r")
+    baseline = json.load(file)
+    file.close()
+
+    return baseline
+
+def SaveBaseline(results: dict[str, dict], fileName: str=BASELINE_FILE) -> None:
+    """Stores results as the new baseline.
+
+    Benchmarks which weren't run keep their previous baseline.
+
+    Parameters:
+        results: dict[str, dict]
+            The results, as given by RunBenchmarks.
+        fileName: str
+            The .json file to store the baseline in.
+    """
+
+    baseline = LoadBaseline(fileName)
+    baseline.update(results)
+
+    with AtomicWrite(fileName) as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+
+def FormatResults(results: dict[str, dict]) -> str:
+    """Formats the results as a table.
+
+    Parameters:
+        results: dict[str, dict]
+            The results, as given by RunBenchmarks.
+
+    Returns:
+        str:
+            One line per benchmark with its time, throughput and memory.
+    """
+
+    lines = [f"{'benchmark':<45}{'seconds':>12}{'trials/s':>14}{'peak MiB':>12}{'extra MiB':>12}"]
+    for key, result in results.items():
+        peak = f"{result['peakRss'] / 2**20:.1f}" if result["peakRss"] is not None else "-"
+        extra = f"{result['extraRss'] / 2**20:.1f}" if result["extraRss"] is not None else "-"
+        lines.append(f"{key:<45}{result['seconds']:>12.3f}{result['throughput']:>14.1f}{peak:>12}{extra:>12}")
+
+    return "\n".join(lines)
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the ParseData entry points on synthetic campaigns.")
+    parser.add_argument("--trials", type=int, nargs="+", default=list(DEFAULT_TRIALS), help="The number of logs in each campaign.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS.keys()), help="The benchmarks to run.")
+    parser.add_argument("--repeats", type=int, default=1, help="The number of times to run each benchmark.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="The allowed slowdown before a regression.")
+    parser.add_argument("--save-baseline", action="store_true", help="Stores the results as the new baseline.")
+    arguments = parser.parse_args()
+
+    results = RunBenchmarks(arguments.trials, arguments.only, arguments.repeats)
+    print(FormatResults(results))
+
+    if (arguments.save_baseline):
+        SaveBaseline(results)
+        print(f"Saved the baseline to {BASELINE_FILE}")
+    else:
+        regressions = CompareToBaseline(results, LoadBaseline(), arguments.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if (regressions):
+            sys.exit(1)
@@ -0,0 +1,204 @@
+import datetime
+import itertools
+import os
+import sys
+import numpy as np
+
+# Allows the modules in the root of the repo to be imported.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LogHeader import WriteHeader
+
+"""Writes synthetic trial logs for benchmarking the analysis code.
+
+Each log has the same header and columns as a log made by logs.CreateLogFile,
+so it can be read by every ParseData function. Trials are generated in
+leader/trailer pairs with the same start time, cycling through every
+configuration in a grid, with the repetitions of each configuration
+numbered by the trial field of the header.
+
+The flight follows main.py: both drones move forward at the trial's velocity
+for TRIAL_DISTANCE plus the change in separation, then hover. The battery
+drains linearly at a rate which depends on the configuration, and is
+quantised like the Crazyflie's battery voltage.
+
+Methods:
+    GetConfigurations:
+        Lists every configuration in a grid.
+    GenerateLog:
+        Writes a single synthetic log.
+    GenerateCampaign:
+        Writes a folder of synthetic logs.
+"""
+
+# The values of each trial parameter in the grid, from the 350mAh campaign.
+DEFAULT_GRID = {
+    "velocity": (0.5, 0.75, 1.0),
+    "horizontalSeparation": (1.0, 0.75, 0.5, 0.25),
+    "verticalSeparation": (0.75, 0.5, 0.25, 0.0),
+}
+
+# The length in s of each trial. Matches the real logs.
+DEFAULT_DURATION = 4.0
+# The period in ms between rows. Matches logs.DEFAULT_PERIOD.
+DEFAULT_PERIOD = 100
+# The standard deviation in m of the position noise.
+DEFAULT_NOISE = 0.01
+
+# The URIs written to the logs of the leading and trailing drones. Matches main.py.
+LEADING_URI = "radio://1/80/2M/E7E7E7E7E4"
+TRAILING_URI = "radio://0/60/2M/E7E7E7E7E8"
+
+# The distance travelled by the leading drone when it's 1.0m away from the trailing drone. Matches main.py.
+TRIAL_DISTANCE = 2.0
+# The height in m that the trailing drone flies at.
+BASE_HEIGHT = 0.5
+# The x coordinate the trailing drone starts at. Matches flight.py.
+START_X = -1.5
+
+# The resolution in V of the logged battery voltage.
+VOLTAGE_STEP = 0.005278587341308594
+# The standard deviation in V of the battery voltage noise.
+VOLTAGE_NOISE = 0.003
+# The voltage drained per second while hovering, and per m/s of velocity.
+HOVER_DRAIN = 0.008
+SPEED_DRAIN = 0.003
+# The extra voltage drained per second by the trailing drone when directly below the leader,
+# which falls off as the vertical separation grows.
+DOWNWASH_DRAIN = 0.002
+DOWNWASH_FALLOFF = 0.25
+
+# The empty and full battery voltages. Matches ParseData.MIN_VOLTAGE and ParseData.MAX_VOLTAGE.
+MIN_VOLTAGE = 3.0
+MAX_VOLTAGE = 4.2
+
+def GetConfigurations(grid: dict[str, tuple[float]]) -> list[tuple[float, float, float]]:
+    """Lists every configuration in a grid.
+
+    Parameters:
+        grid: dict[str, tuple[float]]
+            The values of the velocity, horizontalSeparation and verticalSeparation.
+
+    Returns:
+        list[tuple[float, float, float]]:
+            Every (velocity, horizontalSeparation, verticalSeparation) combination.
+    """
+
+    return list(itertools.product(grid["velocity"], grid["horizontalSeparation"], grid["verticalSeparation"]))
+
+def GenerateLog(fileName: str, velocity: float, horizontalSeparation: float, verticalSeparation: float, leading: bool, trial: int,
+                startTime: datetime.datetime, rng: np.random.Generator, duration: float=DEFAULT_DURATION, period: int=DEFAULT_PERIOD,
+                noise: float=DEFAULT_NOISE) -> None:
+    """Writes a single synthetic log.
+
+    Parameters:
+        fileName: str
+            The log file to create.
+        velocity: float
+            The velocity in m/s of the trial.
+        horizontalSeparation: float
+            The horizontal separation between the drones in m.
+        verticalSeparation: float
+            The vertical separation between the drones in m.
+        leading: bool
+            Whether the log is of the leading drone.
+        trial: int
+            The repetition of the configuration.
+        startTime: datetime.datetime
+            The date and time to write to the header.
+        rng: np.random.Generator
+            The source of the noise.
+        duration: float
+            The length of the trial in s.
+        period: int
+            The period in ms between rows.
+        noise: float
+            The standard deviation in m of the position noise.
+    """
+
+    rows = max(int(duration * 1000 / period), 2)
+    t = np.arange(rows) * period / 1000.0
+    distance = TRIAL_DISTANCE + (1.0 - horizontalSeparation)
+
+    # Moves forward at the trial's velocity until the distance is covered, then hovers.
+    cruising = t < distance / velocity
+    vx = np.where(cruising, velocity, 0.0) + rng.normal(0, noise, rows)
+    vy = rng.normal(0, noise, rows)
+    vz = rng.normal(0, noise, rows)
+    x = START_X + (horizontalSeparation if leading else 0.0) + np.minimum(t * velocity, distance) + rng.normal(0, noise, rows)
+    y = rng.normal(0, noise, rows)
+    z = BASE_HEIGHT + (verticalSeparation if leading else 0.0) + rng.normal(0, noise, rows)
+
+    # Drains the battery faster at higher speeds, and in the leader's downwash.
+    drain = HOVER_DRAIN + SPEED_DRAIN * velocity
+    if (not leading):
+        drain += DOWNWASH_DRAIN * np.exp(-verticalSeparation / DOWNWASH_FALLOFF)
+    startVoltage = rng.uniform(3.7, 4.1)
+    voltage = startVoltage - drain * t + rng.normal(0, VOLTAGE_NOISE, rows)
+    voltage = np.round(voltage / VOLTAGE_STEP) * VOLTAGE_STEP
+    percentage = np.floor(np.clip((voltage - MIN_VOLTAGE) / (MAX_VOLTAGE - MIN_VOLTAGE) * 100, 0, 100) / 10) * 10
+
+    # The timestamps are in ms since the drone was turned on.
+    timestamps = int(rng.integers(20000, 40000)) + np.arange(rows) * period
+    uri = LEADING_URI if leading else TRAILING_URI
+
+    file = open(fileName, "w")
+    WriteHeader(file, {
+        "distance": distance,
+        "velocity": velocity,
+        "horizontalSeparation": horizontalSeparation,
+        "verticalSeparation": verticalSeparation,
+        "heightAboveDefault": verticalSeparation if leading else 0.0,
+        "trial": trial,
+    }, startTime)
+
+    columns = zip(timestamps.tolist(), x.tolist(), y.tolist(), z.tolist(), vx.tolist(), vy.tolist(), vz.tolist(), voltage.tolist(), percentage.tolist())
+    file.write("".join(f"{row[0]},{uri},{row[1]},{row[2]},{row[3]},{row[4]},{row[5]},{row[6]},{row[7]},{row[8]},{period}\n" for row in columns))
+    file.close()
+
+def GenerateCampaign(folder: str, trials: int, duration: float=DEFAULT_DURATION, period: int=DEFAULT_PERIOD, noise: float=DEFAULT_NOISE,
+                     grid: dict[str, tuple[float]]=DEFAULT_GRID, seed: int=0,
+                     startTime: datetime.datetime=datetime.datetime(2025, 5, 10, 9, 0, 0)) -> list[str]:
+    """Writes a folder of synthetic logs.
+
+    Parameters:
+        folder: str
+            The folder to write the logs to. Created if it doesn't exist.
+        trials: int
+            The number of logs to write, counting the leader and trailer separately.
+        duration: float
+            The length of each trial in s.
+        period: int
+            The period in ms between rows.
+        noise: float
+            The standard deviation in m of the position noise.
+        grid: dict[str, tuple[float]]
+            The values of the velocity, horizontalSeparation and verticalSeparation to cycle through.
+        seed: int
+            The seed of the noise, so the same campaign can be written again.
+        startTime: datetime.datetime
+            The start time of the first pair of trials.
+
+    Returns:
+        list[str]:
+            The paths to the logs, in the order they were written.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    configurations = GetConfigurations(grid)
+
+    files = []
+    for i in range(trials):
+        # Each pair of logs is one leader and one trailer flown together.
+        pair = i // 2
+        velocity, horizontalSeparation, verticalSeparation = configurations[pair % len(configurations)]
+        trial = pair // len(configurations)
+        pairStartTime = startTime + datetime.timedelta(seconds=pair * (duration + 60))
+
+        fileName = f"{folder}/{str(startTime.date())}-{i}.csv"
+        GenerateLog(fileName, velocity, horizontalSeparation, verticalSeparation, i % 2 == 0, trial,
+                    pairStartTime, rng, duration, period, noise)
+        files.append(fileName)
+
+    return files
@@ -0,0 +1,306 @@
+import argparse
+import sys
+
+"""Runs the analysis of the trial logs from the command line.
+
+Replaces uncommenting the blocks at the bottom of ParseData.py. Each task is
+a subcommand, e.g.
+    python cli.py list
+    python cli.py rates --output rates.csv
+    python cli.py plots --volts
+    python cli.py table
+    python cli.py variance
+    python cli.py r2
+    python cli.py minmax
+    python cli.py watch --output rates.csv
+    python cli.py report
+
+Each subcommand only imports what it needs, so scipy and matplotlib aren't
+loaded for quick queries, and list only reads the headers, so it doesn't load
+numpy or the parse cache either.
+The parsed columns of every log are cached beside the logs (see
+ParseData.EnableParseCache), so repeated runs don't parse the logs again.
+
+Methods:
+    BuildParser:
+        Builds the parser for the command line arguments.
+    RunList:
+        Lists the trials in a folder.
+    RunRates:
+        Prints the mean battery usage rate of each configuration.
+    RunPlots:
+        Plots the battery level of every trial.
+    RunTable:
+        Plots the battery usage rates as a table.
+    RunVariance:
+        Prints the variance of the y and z positions.
+    RunRSquared:
+        Prints statistics of the R^2 of every trial's battery fit.
+    RunMinMax:
+        Prints the lowest and highest battery voltage.
+    RunWatch:
+        Keeps the rates up to date while logs are recorded.
+    RunReport:
+        Builds the report, only rebuilding what has changed.
+    Main:
+        Runs a subcommand.
+"""
+
+# The folder analysed by default. Matches ParseData.LOG_FOLDER.
+LOG_FOLDER = "./350mAh_logs"
+# The folder plots are saved to by default. Matches ParseData.OUTPUT_FOLDER.
+OUTPUT_FOLDER = "./plots"
+
+def BuildParser() -> argparse.ArgumentParser:
+    """Builds the parser for the command line arguments.
+
+    Returns:
+        argparse.ArgumentParser:
+            The parser, with a subparser for each subcommand.
+    """
+
+    parser = argparse.ArgumentParser(description="Analyses the trial logs.")
+    parser.add_argument("--folder", default=LOG_FOLDER, help="The folder (or bundle) containing the logs.")
+    parser.add_argument("--no-cache", action="store_true", help="Parses every log again instead of using the parse cache.")
+    parser.add_argument("--trace", help="Writes a Chrome trace of the run to this file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparser = subparsers.add_parser("list", help="Lists the trials and their configurations.")
+    subparser.add_argument("--exclude-failed", action="store_true", help="Leaves out the trials that failed quality control.")
+    subparser.set_defaults(function=RunList, parsesLogs=False)
+
+    subparser = subparsers.add_parser("rates", help="Prints the mean battery usage rate of each configuration.")
+    subparser.add_argument("--drones", choices=("trailing", "leading", "all"), default="trailing", help="Which drones to include.")
+    subparser.add_argument("--estimator", default="ols", help="The slope estimator, from SlopeEstimators.ESTIMATORS.")
+    subparser.add_argument("--prefilter", help="The filter to apply before fitting, from SlopeEstimators.FILTERS.")
+    subparser.add_argument("--exclude-failed", action="store_true", help="Leaves out the trials that failed quality control.")
+    subparser.add_argument("--output", help="Writes the rates to this .csv file, e.g. rates.csv.")
+    subparser.set_defaults(function=RunRates)
+
+    subparser = subparsers.add_parser("plots", help="Plots the battery level of every trial.")
+    subparser.add_argument("--volts", action="store_true", help="Plots the battery level in volts instead of percent.")
+    subparser.add_argument("--output", help="The folder to save the plots to.")
+    subparser.set_defaults(function=RunPlots)
+
+    subparser = subparsers.add_parser("table", help="Plots the battery usage rates of the trailing drones as a table.")
+    subparser.add_argument("--volts", action="store_true", help="Tabulates the rates in V/s instead of %%/s.")
+    subparser.add_argument("--bar-chart", action="store_true", help="Also plots the rates as a bar chart.")
+    subparser.add_argument("--output", default=OUTPUT_FOLDER, help="The folder to save the table to.")
+    subparser.set_defaults(function=RunTable)
+
+    subparser = subparsers.add_parser("variance", help="Prints the variance of the y and z positions.")
+    subparser.set_defaults(function=RunVariance)
+
+    subparser = subparsers.add_parser("r2", help="Prints statistics of the R^2 of every trial's battery fit.")
+    subparser.set_defaults(function=RunRSquared)
+
+    subparser = subparsers.add_parser("minmax", help="Prints the lowest and highest battery voltage.")
+    subparser.set_defaults(function=RunMinMax)
+
+    subparser = subparsers.add_parser("watch", help="Keeps the rates up to date while logs are recorded.")
+    subparser.add_argument("--output", help="Writes the rates to this .csv file whenever logs land, e.g. rates.csv.")
+    subparser.add_argument("--table", help="Saves the consumption table to this folder whenever logs land.")
+    subparser.add_argument("--interval", type=float, default=2.0, help="The time in s between polls of the folder.")
+    subparser.add_argument("--settle", type=float, default=5.0, help="The time in s a log must go unchanged before it counts as finished.")
+    subparser.add_argument("--estimator", default="ols", help="The slope estimator, from SlopeEstimators.ESTIMATORS.")
+    subparser.add_argument("--prefilter", help="The filter to apply before fitting, from SlopeEstimators.FILTERS.")
+    subparser.add_argument("--exclude-failed", action="store_true", help="Leaves out the trials that fail quality control.")
+    subparser.set_defaults(function=RunWatch)
+
+    subparser = subparsers.add_parser("report", help="Builds the rates, table and plots, only rebuilding what has changed.")
+    subparser.add_argument("--plots", default=OUTPUT_FOLDER, help="The folder to save the plots to.")
+    subparser.add_argument("--rates", default="rates.csv", help="The .csv file to write the rates to.")
+    subparser.add_argument("--estimator", default="ols", help="The slope estimator, from SlopeEstimators.ESTIMATORS.")
+    subparser.add_argument("--prefilter", help="The filter to apply before fitting, from SlopeEstimators.FILTERS.")
+    subparser.add_argument("--exclude-failed", action="store_true", help="Leaves out the trials that failed quality control.")
+    subparser.add_argument("--cache", default="./report_cache", help="The folder to cache the values of the steps in.")
+    subparser.add_argument("--workers", type=int, help="The most steps to run at once.")
+    subparser.set_defaults(function=RunReport)
+
+    return parser
+
+def RunList(arguments: argparse.Namespace) -> None:
+    """Lists the trials in a folder with their configuration.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from LogFolder import ListLogFiles
+    from LogHeader import ReadLogMetadata
+
+    files = ListLogFiles(arguments.folder, arguments.exclude_failed)
+    for fileName in files:
+        metadata = ReadLogMetadata(fileName)
+        print(f"{fileName}, {metadata.GetStartTime()}, velocity={metadata.velocity}, horizontal={metadata.horizontalSeparation}, "
+              f"vertical={metadata.verticalSeparation}, leading={metadata.leading}, trial={metadata.trial}")
+
+    print(f"{len(files)} trials")
+
+def RunRates(arguments: argparse.Namespace) -> None:
+    """Prints the mean battery usage rate of each configuration, in the format of rates.csv.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from AtomicWrite import AtomicWrite
+    from ParseData import ExtractTrialRatesFromFolder, GroupRatesByConfiguration, FilterDronePositions, FormatRates, MIN_VOLTAGE, MAX_VOLTAGE
+
+    # Fits every trial once in V/s, and scales the rates to %/s rather than fitting them again.
+    keys, rates, files = ExtractTrialRatesFromFolder(arguments.folder, False, estimator=arguments.estimator,
+                                                     prefilter=arguments.prefilter, excludeFailed=arguments.exclude_failed)
+    ratesVoltage = GroupRatesByConfiguration(keys, rates)
+    ratesPercentage = GroupRatesByConfiguration(keys, rates * 100 / (MAX_VOLTAGE - MIN_VOLTAGE))
+
+    # Filters out the drones that weren't asked for.
+    if (arguments.drones != "all"):
+        ratesVoltage = FilterDronePositions(ratesVoltage, arguments.drones == "leading")
+        ratesPercentage = FilterDronePositions(ratesPercentage, arguments.drones == "leading")
+
+    text = FormatRates(ratesVoltage, ratesPercentage)
+    print(text)
+
+    if (arguments.output is not None):
+        with AtomicWrite(arguments.output) as file:
+            file.write(text)
+
+def RunPlots(arguments: argparse.Namespace) -> None:
+    """Plots the battery level of every trial.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from ParseData import PlotBatteryFromFolder
+
+    outputFolder = arguments.output
+    if (outputFolder is None):
+        outputFolder = OUTPUT_FOLDER + ("/volts" if arguments.volts else "/percentage")
+
+    PlotBatteryFromFolder(arguments.folder, outputFolder, not arguments.volts)
+
+def RunTable(arguments: argparse.Namespace) -> None:
+    """Plots the battery usage rates of the trailing drones as a table.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from ParseData import PlotBatteryConsumptionTable
+
+    PlotBatteryConsumptionTable(not arguments.volts, arguments.folder, arguments.output, arguments.bar_chart)
+
+def RunVariance(arguments: argparse.Namespace) -> None:
+    """Prints the variance of the y and z positions from where they were meant to be.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from ParseData import CalculatePositionVariance
+
+    posVar = CalculatePositionVariance(arguments.folder)
+    print(f"Y Variance: {posVar[0]}, Z Variance: {posVar[1]}")
+
+def RunRSquared(arguments: argparse.Namespace) -> None:
+    """Prints statistics of the R^2 of every trial's battery fit.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    import statistics
+    from ParseData import GetAllRSquaredValues
+
+    rSquareds = GetAllRSquaredValues(arguments.folder)
+    mean = statistics.mean(rSquareds)
+    var = statistics.variance(rSquareds)
+    print(f"Mean R^2: {mean}, Variance of R^2: {var}, Max: {max(rSquareds)}, Min: {min(rSquareds)}")
+
+def RunMinMax(arguments: argparse.Namespace) -> None:
+    """Prints the lowest and highest battery voltage in the folder.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from ParseData import DetermineMinAndMaxFromFolder
+
+    minimum, maximum = DetermineMinAndMaxFromFolder(arguments.folder)
+    print(f"Min: {minimum} V, Max: {maximum} V")
+
+def RunWatch(arguments: argparse.Namespace) -> None:
+    """Keeps the rates up to date while logs are recorded, until interrupted.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from LogWatcher import Watch
+
+    try:
+        Watch(arguments.folder, arguments.output, arguments.table, arguments.interval, arguments.settle,
+              arguments.estimator, arguments.prefilter, arguments.exclude_failed)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+def RunReport(arguments: argparse.Namespace) -> None:
+    """Builds the rates, table and plots, only rebuilding the steps whose inputs have changed.
+
+    Parameters:
+        arguments: argparse.Namespace
+            The parsed command line arguments.
+    """
+
+    from ReportPipeline import CreateReportPipeline
+
+    pipeline = CreateReportPipeline(arguments.folder, arguments.plots, arguments.rates, arguments.estimator, arguments.prefilter,
+                                    arguments.exclude_failed, cacheFolder=arguments.cache, workers=arguments.workers)
+    built = pipeline.Build()
+    print(f"Built {len(built)} of {len(pipeline.nodes)} steps.")
+    for name in built:
+        print(f"    {name}")
+
+def Main(argv: list[str]=None) -> None:
+    """Runs a subcommand.
+
+    Parameters:
+        argv: list[str]
+            The command line arguments, without the program name.
+            Uses sys.argv by default.
+    """
+
+    arguments = BuildParser().parse_args(argv)
+
+    if (arguments.trace is not None):
+        import Profiler
+        Profiler.Enable()
+
+    # Only loads ParseData for the subcommands which parse the logs, since it imports numpy.
+    parsesLogs = getattr(arguments, "parsesLogs", True)
+    if (parsesLogs):
+        import ParseData
+        if (not arguments.no_cache):
+            ParseData.EnableParseCache()
+
+    try:
+        arguments.function(arguments)
+    finally:
+        if (parsesLogs):
+            ParseData.SaveParseCaches()
+        if (arguments.trace is not None):
+            Profiler.ExportTrace(arguments.trace)
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    Main(sys.argv[1:])
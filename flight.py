@@ -4,6 +4,7 @@ from cflib.positioning.motion_commander import MotionCommander
 from cflib.positioning.position_hl_commander import PositionHlCommander
 from cflib.crazyflie.high_level_commander import HighLevelCommander
 from logs import *
+import Profiler
 
 DEFAULT_HEIGHT = 0.75
 DEFAULT_TIME = 3.0
@@ -64,7 +65,9 @@ def DiagnosticFlight(scf) -> None:
         time.sleep(DEFAULT_DELAY)
 
 
-def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, horizontalSeparation: float, extraHeight: float, takeOffTime: float, movementTime: float, repetition: int) -> None:
+@Profiler.Profiled("flight")
+def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, horizontalSeparation: float, extraHeight: float, takeOffTime: float, movementTime: float, repetition: int,
+                verticalSeparation: float, leading: bool) -> None:
     """Runs a single trial with the given parameters.
 
     A single trial consists of taking off, beginning logging,
@@ -94,6 +97,11 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
             The repetition for this trial that is being completed.
             Only passed through so that it can be sent to the
             log file header.
+        verticalSeparation: float
+            The vertical separation between the drones in this trial, written to the log file header.
+            The same for both drones, since extraHeight is 0 for the trailing drone.
+        leading: bool
+            Whether this drone is the leading drone, written to the log file header.
     """
 
     # Defines the height we are going to take off to.
@@ -108,7 +116,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
     commander = scf.cf.commander
 
     # Creates the required log file.
-    logFile = CreateLogFile(logFolder, distance, speed, horizontalSeparation, extraHeight, repetition)
+    logFile = CreateLogFile(logFolder, distance, speed, horizontalSeparation, extraHeight, repetition, verticalSeparation, leading)
 
     # If this is the leading drone,
     # it will move back.
@@ -121,6 +129,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Takes off to the desired height.
     print(f"{scf.cf.link_uri} taking off at {time.time()}...")
+    Profiler.Instant("takeoff", "flight", uri=scf.cf.link_uri)
     steps = 30
     for i in range(1, steps + 1):
         currentHeight = height * (i / steps)
@@ -129,18 +138,21 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Hovers in place to stabilise.
     print(f"{scf.cf.link_uri} hovering at {time.time()}...")
+    Profiler.Instant("hover", "flight", uri=scf.cf.link_uri)
     for y in range(30):
         commander.send_position_setpoint(initialX, 0, height, 0)
         time.sleep(0.1)
 
     # Continue hovering or moves back, depending on which drone it is. 
     print(f"{scf.cf.link_uri} moving to {newX} at {time.time()}...")
+    Profiler.Instant("reposition", "flight", uri=scf.cf.link_uri)
     for y in range(30):
         commander.send_position_setpoint(newX, 0, height, 0)
         time.sleep(0.1)
 
     # Hovers in place until the movement time.
     print(f"{scf.cf.link_uri} waiting to move at {time.time()}...")
+    Profiler.Instant("wait", "flight", uri=scf.cf.link_uri)
     while ((waitTime := movementTime - time.time()) > 0):
         commander.send_position_setpoint(newX, 0, height, 0)
         time.sleep(0.1)
@@ -150,6 +162,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Moves forward the desired distance at the desired speed.
     print(f"{scf.cf.link_uri} moving forward at time {time.time()}...")
+    Profiler.Instant("cruise", "flight", uri=scf.cf.link_uri)
     
     # Uses velocity inputs.
     # flightTime = time.time() + (distance / speed)
@@ -170,6 +183,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Hovers for 5 seconds at the desired position.
     print(f"{scf.cf.link_uri} hovering at time {time.time()}...")
+    Profiler.Instant("hover", "flight", uri=scf.cf.link_uri)
     hoverTime = time.time() + 5.0
     while ((waitTime := hoverTime - time.time()) > 0):
         commander.send_position_setpoint(newX + distance, 0, height, 0)
@@ -178,6 +192,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Moves back to the beginning.
     print(f"{scf.cf.link_uri} moving back to beginning at {time.time()}...")
+    Profiler.Instant("return", "flight", uri=scf.cf.link_uri)
     flightTime = time.time() + (distance / 1.0)
     while ((waitTime := flightTime - time.time()) > 0):
         commander.send_position_setpoint(initialX, 0, height, 0)
@@ -185,6 +200,7 @@ def RunOneTrial(scf, initialX, logFolder: str, distance: float, speed: float, ho
 
     # Lands the drone.
     print(f"{scf.cf.link_uri} landing at {time.time()}...")
+    Profiler.Instant("land", "flight", uri=scf.cf.link_uri)
     steps = 30
     for i in range(steps, 2, -1):
         currentHeight = height * (i / steps)
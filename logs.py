@@ -2,8 +2,14 @@ from CommanderFlight import CommanderFlight
 import datetime
 import os
 import time
+from typing import Tuple
 
 from cflib.crazyflie.log import LogConfig
+from LinkStats import LinkStats
+import Profiler
+from LogHeader import WriteHeader
+from TelemetryBus import TelemetrySample
+from LogBlocks import BlockMerger, DEFAULT_BLOCKS, LINK_PACKET_BUDGET, ValidateBlocks, CheckPacketBudget
 
 """Stores all the functions for logging.
 
@@ -15,12 +21,33 @@ Methods:
         Turns the LEDs red for 2 seconds.
     StartLogging:
         Tells the Crazyflie to begin logging the required variables.
+    StopLogging:
+        Tells the Crazyflie to stop logging and writes the link summary.
+    StartBlockLogging:
+        Tells the Crazyflie to begin logging the variables in several blocks at different rates.
+    StopBlockLogging:
+        Tells the Crazyflie to stop logging every block and writes the link summary.
+    SetLogPeriod:
+        Changes the period that the Crazyflie logs at.
     LogCallback:
-        Saves the drone data to a .csv every time a packet comes in.
+        Saves the drone data to a .csv every time a packet comes in,
+        and publishes it to the CommanderFlight's TelemetryBus if it has one.
     CreateLogFile:
         Creates the log file for a specific trial.
 """
 
+# The period in ms to log at when no rate profile is given.
+DEFAULT_PERIOD = 100
+
+# The period in ms to log at during each phase of CommanderFlight. Logs the cruise
+# legs quickly and the long hovers slowly.
+DEFAULT_RATE_PROFILE = {
+    "takeoff": 50,
+    "hover": 250,
+    "cruise": 20,
+    "land": 50,
+}
+
 def LightCheck(scf):
     """Turns the LEDS red for 2 seconds.
     """
@@ -29,11 +56,12 @@ def LightCheck(scf):
     time.sleep(1.0)
     scf.cf.param.set_value('led.bitmask', 0)
 
-def StartLogging(com: CommanderFlight, logFile: str, speed: float, threshold: float=0.1) -> LogConfig:
+def StartLogging(com: CommanderFlight, logFile: str, speed: float, threshold: float=0.1, rateProfile: dict[str, float]=None) -> LogConfig:
     """Tells the Crazyflie to start logging.
 
     Creates the desired log config and callback function and
-    starts logging.
+    starts logging. If a rate profile is given, the period is changed
+    every time the CommanderFlight enters a new phase, see CommanderFlight.SetPhase.
 
     Parameters:
         com: CommanderFlight
@@ -49,6 +77,10 @@ def StartLogging(com: CommanderFlight, logFile: str, speed: float, threshold: fl
             A float from 0 to 1 which determines how far above the target
             velocity the drone can go before printing an error to the console.
             10% by default.
+        rateProfile: dict[str, float]
+            The period in ms to log at during each phase, e.g. DEFAULT_RATE_PROFILE.
+            Phases that aren't in the profile keep the previous period.
+            Logs at DEFAULT_PERIOD throughout by default.
 
     Returns:
         LogConfig:
@@ -57,8 +89,13 @@ def StartLogging(com: CommanderFlight, logFile: str, speed: float, threshold: fl
             the config in case it wants to stop logging.
     """
 
+    # Starts at the period of the current phase.
+    period = DEFAULT_PERIOD
+    if (rateProfile is not None):
+        period = rateProfile.get(com.phase, DEFAULT_PERIOD)
+
     # Defines our log configs.
-    config = LogConfig(name='Pos, Vel & Battery', period_in_ms=100)
+    config = LogConfig(name='Pos, Vel & Battery', period_in_ms=period)
 
     # Adds the position variables.
     config.add_variable('stateEstimate.x', 'float')
@@ -78,13 +115,166 @@ def StartLogging(com: CommanderFlight, logFile: str, speed: float, threshold: fl
     # Adds the configs to the crazyflie.
     com.scf.cf.log.add_config(config)
 
+    # Creates the statistics for the link.
+    com.linkStats = LinkStats(com.scf.cf.link_uri, config.period_in_ms)
+
+    # Lets the CommanderFlight change the period when its phase changes.
+    com.logConfig = config
+    com.rateProfile = rateProfile
+
     # Adds the callback functions and starts logging.
-    config.data_received_cb.add_callback(lambda timestamp, data, _logconf: LogCallback(com, timestamp, data, logFile, speed, threshold))
+    config.data_received_cb.add_callback(lambda timestamp, data, logconf: LogCallback(com, timestamp, data, logFile, speed, threshold, logconf.period_in_ms))
     config.start()
 
     return config
 
-def LogCallback(com: CommanderFlight, timestamp, data, logFile: str, speed: float, threshold: float) -> None:
+def StopLogging(com: CommanderFlight, config: LogConfig, logFile: str) -> dict:
+    """Tells the Crazyflie to stop logging.
+
+    Writes the statistics of the link during the trial beside the log file,
+    see LinkStats.GetTrailerFile.
+
+    Parameters:
+        com: CommanderFlight
+            The instance of CommanderFlight that the drone is connected to.
+        config: LogConfig
+            The log config returned by StartLogging.
+        logFile: str
+            The file that the logged data was saved to.
+
+    Returns:
+        dict:
+            The statistics of the link, as given by LinkStats.Snapshot.
+    """
+
+    config.stop()
+    com.logConfig = None
+    com.rateProfile = None
+
+    # Writes the link statistics, if there are any.
+    if (com.linkStats is None):
+        return None
+
+    com.linkStats.WriteTrailer(logFile)
+    return com.linkStats.Snapshot()
+
+def StartBlockLogging(com: CommanderFlight, logFile: str, speed: float, blocks: tuple=DEFAULT_BLOCKS, threshold: float=0.1,
+                      budget: float=LINK_PACKET_BUDGET) -> Tuple[list[LogConfig], BlockMerger]:
+    """Tells the Crazyflie to start logging the variables in several blocks at different rates.
+
+    The packets of every block are merged into rows ordered by timestamp,
+    see LogBlocks.BlockMerger, and each row is saved by LogCallback, so the
+    log file has the same columns as with StartLogging.
+
+    Parameters:
+        com: CommanderFlight
+            An instance of CommanderFlight linked to a Crazyflie.
+        logFile: str
+            The file that the logged data will be saved to.
+            Assumes that the file already exists.
+        speed: float
+            The speed this trial is meant to be at. Prints
+            an error to the console if this speed is passed by more than
+            the threshold.
+        blocks: tuple
+            The blocks to log, of the form given in LogBlocks.DEFAULT_BLOCKS.
+            Between them, the blocks must contain every variable used by LogCallback.
+        threshold: float
+            A float from 0 to 1 which determines how far above the target
+            velocity the drone can go before printing an error to the console.
+            10% by default.
+        budget: float
+            The number of packets per second that the link can carry.
+
+    Returns:
+        Tuple[list[LogConfig], BlockMerger]:
+            The log configs of the blocks and the merger of their packets.
+            These are returned so that the calling function can stop logging.
+    """
+
+    # Checks that the blocks can be logged before adding any of them.
+    ValidateBlocks(blocks)
+    CheckPacketBudget(blocks, budget)
+
+    # The merged rows are saved the same way as the packets of a single block.
+    # The merger keeps the statistics of each block instead of com.linkStats.
+    com.linkStats = None
+    # Each row is recorded at the period of the fastest block.
+    rowPeriod = min(period for name, period, variables in blocks)
+    merger = BlockMerger(blocks, lambda timestamp, values: LogCallback(com, timestamp, values, logFile, speed, threshold, rowPeriod), com.scf.cf.link_uri, budget)
+
+    # Defines a log config for each block and adds it to the crazyflie.
+    configs = []
+    for name, period, variables in blocks:
+        config = LogConfig(name=name, period_in_ms=period)
+        for variable, fetchAs in variables:
+            config.add_variable(variable, fetchAs)
+
+        com.scf.cf.log.add_config(config)
+        config.data_received_cb.add_callback(lambda timestamp, data, logconf: merger.AddPacket(logconf.name, timestamp, data, time.time()))
+        configs.append(config)
+
+    # Starts every block once they have all been added.
+    for config in configs:
+        config.start()
+
+    return configs, merger
+
+def StopBlockLogging(configs: list[LogConfig], merger: BlockMerger, logFile: str) -> dict:
+    """Tells the Crazyflie to stop logging every block.
+
+    Saves the rows still held by the merger and writes the statistics of
+    the link beside the log file, see LinkStats.GetTrailerFile.
+
+    Parameters:
+        configs: list[LogConfig]
+            The log configs returned by StartBlockLogging.
+        merger: BlockMerger
+            The merger returned by StartBlockLogging.
+        logFile: str
+            The file that the logged data was saved to.
+
+    Returns:
+        dict:
+            The statistics of the link, as given by BlockMerger.Snapshot.
+    """
+
+    for config in configs:
+        config.stop()
+
+    merger.Flush()
+    merger.WriteTrailer(logFile)
+
+    return merger.Snapshot()
+
+def SetLogPeriod(com: CommanderFlight, config: LogConfig, period: float) -> None:
+    """Changes the period that the Crazyflie logs at.
+
+    The Crazyflie only reads the period when a log block is started,
+    so the block is stopped and started again at the new period.
+
+    Parameters:
+        com: CommanderFlight
+            The instance of CommanderFlight that the drone is connected to.
+        config: LogConfig
+            The log config returned by StartLogging.
+        period: float
+            The new period in ms. Must be a multiple of 10 ms.
+    """
+
+    if (config.period_in_ms == period):
+        return
+
+    config.stop()
+    config.period_in_ms = period
+    config.period = int(period / 10)
+    config.start()
+
+    if (com.linkStats is not None):
+        com.linkStats.SetPeriod(period)
+
+@Profiler.Profiled("logging")
+def LogCallback(com: CommanderFlight, timestamp, data, logFile: str, speed: float, threshold: float, period: float=DEFAULT_PERIOD) -> None:
     """Saves the data from the Crazyflie to a file. 
 
     This function is called every time a packet containing
@@ -103,7 +293,16 @@ def LogCallback(com: CommanderFlight, timestamp, data, logFile: str, speed: floa
         threshold: float
             A float from 0 to 1 which determines how far above the target
             velocity the drone can go before printing an error to the console.
+        period: float
+            The period in ms that the data was logged at. Saved with the data
+            so that the samples can be weighted by the time they cover.
     """
+
+    # Records the arrival of the packet.
+    callbackStart = time.perf_counter()
+    Profiler.Count("packets")
+    if (com.linkStats is not None):
+        com.linkStats.RecordPacket(timestamp, time.time())
     
     # Gets the position variables.
     # If a position retrieval fails and for some reason it doesn't throw an error, then
@@ -133,11 +332,21 @@ def LogCallback(com: CommanderFlight, timestamp, data, logFile: str, speed: floa
     file = open(logFile, "a")
 
     # Writes to the file in csv form and then closes it.
-    file.write(f'{timestamp},{com.scf.cf.link_uri},{pos[0]},{pos[1]},{pos[2]},{vel[0]},{vel[1]},{vel[2]},{data["pm.vbat"]},{data["pm.batteryLevel"]}\n')
-    com.UpdateState(pos, vel, data["pm.vbat"], data["pm.batteryLevel"])
+    file.write(f'{timestamp},{com.scf.cf.link_uri},{pos[0]},{pos[1]},{pos[2]},{vel[0]},{vel[1]},{vel[2]},{data["pm.vbat"]},{data["pm.batteryLevel"]},{period}\n')
+    com.UpdateState(pos, vel, data["pm.vbat"], data["pm.batteryLevel"], timestamp)
     file.close()
 
-def CreateLogFile(logFolder: str, distance: float, speed: float, horizontalSeparation: float, extraHeight: float, repetition: int) -> str:
+    # Publishes the sample to any live views and monitors.
+    if (com.telemetryBus is not None):
+        com.telemetryBus.Publish(TelemetrySample(com.scf.cf.link_uri, timestamp, pos[0], pos[1], pos[2], vel[0], vel[1], vel[2],
+                                                 data["pm.vbat"], data["pm.batteryLevel"], period, time.time()))
+
+    # Records how long the callback took.
+    if (com.linkStats is not None):
+        com.linkStats.RecordCallbackTime(time.perf_counter() - callbackStart)
+
+def CreateLogFile(logFolder: str, distance: float, speed: float, horizontalSeparation: float, extraHeight: float, repetition: int,
+                  verticalSeparation: float, leading: bool) -> str:
     """Creates the log file for a specific trial.
 
     Parameters:
@@ -153,6 +362,12 @@ def CreateLogFile(logFolder: str, distance: float, speed: float, horizontalSepar
             The height above DEFAULT_HEIGHT that the drone is taking off to. 
         repetition: int
             The repetition currently being done for this trial (combination of parameters).
+        verticalSeparation: float
+            The vertical separation between the drones, in m. Required, since it can't be
+            worked out from the trailing drone's extraHeight.
+        leading: bool
+            Whether this is the leading drone. Required, since a leading drone with no
+            vertical separation has the same extraHeight as the trailing drone.
 
     Returns:
         The path to the newly created log file.
@@ -168,16 +383,15 @@ def CreateLogFile(logFolder: str, distance: float, speed: float, horizontalSepar
     # above breaks and we write to a file that already exists, we don't
     # lose the data stored within that file.
     file = open(logFile, 'a')
-    file.write("timestamp,uri,x,y,z,vx,vy,vz,batteryV,battery%\n")
-    file.write("==========================================\n")
-    file.write(f"date: {str(datetime.date.today())}\n")
-    file.write(f"time: {str(datetime.datetime.now().strftime('%H:%M:%S'))}\n")
-    file.write(f"distance: {str(distance)}\n")
-    file.write(f"velocity: {str(speed)}\n")
-    file.write(f"horizontalSeparation: {horizontalSeparation}\n")
-    file.write(f"heightAboveDefault: {extraHeight}\n")
-    file.write(f"trial: {repetition}\n")
-    file.write("==========================================\n")
+    WriteHeader(file, {
+        "distance": distance,
+        "velocity": speed,
+        "horizontalSeparation": horizontalSeparation,
+        "verticalSeparation": verticalSeparation,
+        "heightAboveDefault": extraHeight,
+        "leading": leading,
+        "trial": repetition,
+    })
     file.close()
 
     return logFile
@@ -203,12 +417,14 @@ def DetermineNextLogFile(logFolder: str) -> str:
 
     return logFile
 
-def CreateSimpleLogFile(logFolder: str) -> str:
+def CreateSimpleLogFile(logFolder: str, metadata: dict=None) -> str:
     """Creates a log file with just the basic header, no trial data.
 
     Parameters:
         logFolder: str
             The folder to create the log file in.
+        metadata: dict
+            Any trial data to write to the header, mapping each key to its value.
 
     Return:
         logFile: str
@@ -217,7 +433,7 @@ def CreateSimpleLogFile(logFolder: str) -> str:
 
     logFile = DetermineNextLogFile(logFolder)
     file = open(logFile, 'a')
-    file.write("timestamp,uri,x,y,z,vx,vy,vz,batteryV,battery%\n")
+    WriteHeader(file, metadata or {})
     file.close()
 
     return logFile
\ No newline at end of file
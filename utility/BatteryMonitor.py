@@ -0,0 +1,474 @@
+import argparse
+import logging
+import math
+import threading
+import time
+
+import cflib.crtp
+from cflib.crazyflie.swarm import CachedCfFactory
+from cflib.crazyflie.swarm import Swarm
+from cflib.crazyflie.log import LogConfig
+
+"""Monitors the batteries of the whole fleet while they charge.
+
+Replaces WaitUntilCharged.py, which printed every battery packet, and
+CheckBattery.py, which slept for a fixed time. Every drone logs its battery
+slowly enough that many drones can share a radio, and each packet updates
+that drone's ChargeTracker without printing anything. The tracker fits the
+battery voltage as it goes, weighting recent samples the most, so it can
+predict how long is left until the voltage reaches the level the drone
+counts as charged at. A status table of the
+whole fleet is printed every so often, and events are set as each drone,
+and then the whole fleet, is ready.
+
+Usage:
+    python BatteryMonitor.py radio://0/80/2M/E7E7E7E7E4 radio://0/60/2M/E7E7E7E7E8
+    python BatteryMonitor.py --once radio://0/80/2M/E7E7E7E7E4
+
+Methods:
+    GetTargetVoltage:
+        Gets the voltage at which the firmware reports a battery level.
+    ChargeTracker:
+        Tracks the charge of one drone and predicts when it will be charged.
+    BatteryMonitor:
+        Tracks the charge of every drone in the fleet.
+"""
+
+# The battery level in % at which a drone counts as charged.
+DEFAULT_TARGET = 90.0
+# The period in ms to log the battery at, slow enough for many drones to share a radio.
+DEFAULT_PERIOD = 2000
+# The time in s over which old samples stop counting towards the fitted charge rate. Long
+# enough to average out the noise in the voltage, and short enough to follow the charge curve.
+DEFAULT_TIME_CONSTANT = 300.0
+# The voltages above which the Crazyflie firmware reports a battery level of 10%, 20%, ..., 90%,
+# from the battery table in its pm_stm32f4.c.
+LEVEL_VOLTAGES = (3.00, 3.78, 3.83, 3.87, 3.89, 3.92, 3.96, 4.00, 4.04)
+# The time in s without a packet after which a drone counts as lost.
+LOST_TIMEOUT = 10.0
+# The time in s between status tables.
+DEFAULT_REFRESH = 10.0
+
+def GetTargetVoltage(target: float) -> float:
+    """Gets the voltage at which the firmware reports a battery level.
+
+    Parameters:
+        target: float
+            The battery level in %.
+
+    Returns:
+        float:
+            The voltage above which the firmware reports a level of at least target.
+    """
+
+    # The firmware reports the level in steps of 10%, so a target between steps is reached at the next one.
+    index = min(max(math.ceil(target / 10) - 1, 0), len(LEVEL_VOLTAGES) - 1)
+    return LEVEL_VOLTAGES[index]
+
+class ChargeTracker:
+    """Tracks the charge of one drone and predicts when it will be charged.
+
+    The firmware only reports the battery level in steps of 10%, so a line
+    through the levels jumps at every step. Instead, the charge rate is the
+    slope of a least squares line through the battery voltages, with each
+    sample weighted by exp(-age / timeConstant), and the time to full is how
+    long the line takes to reach the voltage at which the firmware reports
+    the target level. The weighted sums are updated with every sample, so
+    each update is O(1) and no samples are kept. Charging slows as the
+    battery fills, so the weighting lets the rate follow the curve.
+
+    Attributes:
+        uri: str
+            The URI of the drone.
+        target: float
+            The battery level in % at which the drone counts as charged.
+        targetVoltage: float
+            The voltage at which the firmware reports the target level.
+        timeConstant: float
+            The time in s over which old samples stop counting.
+        voltage: float
+            The latest battery voltage, or None before the first sample.
+        level: float
+            The latest battery level in %, or None before the first sample.
+        lastTime: float
+            The time.time() of the latest sample, or None before the first sample.
+        samples: int
+            The number of samples received.
+
+    Methods:
+        AddSample:
+            Adds a sample of the battery.
+        GetRate:
+            Gets the fitted charge rate.
+        GetTimeToFull:
+            Predicts how long is left until the drone is charged.
+        GetState:
+            Gets whether the drone is charging, charged, stalled or lost.
+    """
+
+    def __init__(self, uri: str, target: float=DEFAULT_TARGET, timeConstant: float=DEFAULT_TIME_CONSTANT, targetVoltage: float=None):
+        """Initialises a ChargeTracker object with no samples.
+
+        Parameters:
+            uri: str
+                The URI of the drone.
+            target: float
+                The battery level in % at which the drone counts as charged.
+            timeConstant: float
+                The time in s over which old samples stop counting.
+            targetVoltage: float
+                The voltage at which the firmware reports the target level.
+                Found from LEVEL_VOLTAGES by default.
+        """
+
+        self.uri = uri
+        self.target = target
+        self.targetVoltage = targetVoltage if targetVoltage is not None else GetTargetVoltage(target)
+        self.timeConstant = timeConstant
+        self.voltage = None
+        self.level = None
+        self.lastTime = None
+        self.samples = 0
+        # The weighted sums of 1, t, y, t^2 and t*y, with t measured from the first sample.
+        self._firstTime = None
+        self._sums = [0.0] * 5
+
+    def AddSample(self, sampleTime: float, voltage: float, level: float) -> None:
+        """Adds a sample of the battery.
+
+        Parameters:
+            sampleTime: float
+                The time.time() the sample arrived at.
+            voltage: float
+                The battery voltage.
+            level: float
+                The battery level in %.
+        """
+
+        if (self._firstTime is None):
+            self._firstTime = sampleTime
+
+        # Ages the previous samples, then adds the new one with a weight of 1.
+        if (self.lastTime is not None):
+            decay = math.exp(-(sampleTime - self.lastTime) / self.timeConstant)
+            self._sums = [total * decay for total in self._sums]
+
+        t = sampleTime - self._firstTime
+        self._sums[0] += 1
+        self._sums[1] += t
+        self._sums[2] += voltage
+        self._sums[3] += t * t
+        self._sums[4] += t * voltage
+
+        self.voltage = voltage
+        self.level = level
+        self.lastTime = sampleTime
+        self.samples += 1
+
+    def GetRate(self) -> float:
+        """Gets the fitted charge rate.
+
+        Returns:
+            float:
+                The charge rate in V/s, or NaN if there aren't enough samples yet.
+        """
+
+        weight, sumT, sumY, sumTT, sumTY = self._sums
+        spread = weight * sumTT - sumT * sumT
+        if (self.samples < 2 or spread <= 0):
+            return math.nan
+
+        return (weight * sumTY - sumT * sumY) / spread
+
+    def GetTimeToFull(self) -> float:
+        """Predicts how long is left until the drone is charged.
+
+        Returns:
+            float:
+                The time in s, 0 if the drone is already charged, or
+                NaN if it can't be predicted because the drone isn't charging.
+        """
+
+        if (self.level is None):
+            return math.nan
+        if (self.level >= self.target):
+            return 0.0
+
+        rate = self.GetRate()
+        if (not rate > 0):
+            return math.nan
+
+        # Starts from the fitted voltage rather than the latest sample, which is noisy.
+        weight, sumT, sumY, sumTT, sumTY = self._sums
+        voltage = sumY / weight + rate * (self.lastTime - self._firstTime - sumT / weight)
+
+        return max(self.targetVoltage - voltage, 0.0) / rate
+
+    def GetState(self, now: float=None) -> str:
+        """Gets whether the drone is charging, charged, stalled or lost.
+
+        Parameters:
+            now: float
+                The current time.time(). Uses the current time by default.
+
+        Returns:
+            str:
+                "waiting" before the first sample, "lost" if no sample has arrived recently,
+                "ready" once charged, "stalled" if the voltage isn't rising (e.g. it isn't
+                on a charger), and "charging" otherwise.
+        """
+
+        if (now is None):
+            now = time.time()
+
+        if (self.lastTime is None):
+            return "waiting"
+        if (now - self.lastTime > LOST_TIMEOUT):
+            return "lost"
+        if (self.level >= self.target):
+            return "ready"
+        if (self.samples >= 2 and not self.GetRate() > 0):
+            return "stalled"
+
+        return "charging"
+
+class BatteryMonitor:
+    """Tracks the charge of every drone in the fleet.
+
+    Packets from every drone arrive on cflib's threads, so every update
+    and query holds a lock.
+
+    Attributes:
+        trackers: dict[str, ChargeTracker]
+            The tracker of each drone, by URI.
+        readyEvents: dict[str, threading.Event]
+            Set once each drone is ready.
+        fleetReady: threading.Event
+            Set once every drone is ready.
+
+    Methods:
+        Record:
+            Records a battery packet from a drone.
+        OnReady:
+            Adds a function to call when a drone is ready.
+        GetStatus:
+            Gets the status of every drone.
+        FormatStatus:
+            Formats the status of every drone as a table.
+        WaitUntilReady:
+            Waits until every drone is ready.
+        WaitForSamples:
+            Waits until every drone has sent a sample.
+        StartLogging:
+            Tells a Crazyflie to start sending its battery to the monitor.
+    """
+
+    def __init__(self, uris: list[str], target: float=DEFAULT_TARGET, timeConstant: float=DEFAULT_TIME_CONSTANT):
+        """Initialises a BatteryMonitor object.
+
+        Parameters:
+            uris: list[str]
+                The URIs of the drones to monitor.
+            target: float
+                The battery level in % at which a drone counts as charged.
+            timeConstant: float
+                The time in s over which old samples stop counting towards the charge rate.
+        """
+
+        self.trackers = {uri: ChargeTracker(uri, target, timeConstant) for uri in uris}
+        self.readyEvents = {uri: threading.Event() for uri in uris}
+        self.fleetReady = threading.Event()
+        self._callbacks = []
+        self._sampled = threading.Condition()
+
+    def Record(self, uri: str, voltage: float, level: float, sampleTime: float=None) -> None:
+        """Records a battery packet from a drone.
+
+        Parameters:
+            uri: str
+                The URI of the drone.
+            voltage: float
+                The battery voltage.
+            level: float
+                The battery level in %.
+            sampleTime: float
+                The time.time() the packet arrived at. Uses the current time by default.
+        """
+
+        if (sampleTime is None):
+            sampleTime = time.time()
+
+        with self._sampled:
+            tracker = self.trackers[uri]
+            tracker.AddSample(sampleTime, voltage, level)
+            becameReady = tracker.level >= tracker.target and not self.readyEvents[uri].is_set()
+            if (becameReady):
+                self.readyEvents[uri].set()
+                if (all(event.is_set() for event in self.readyEvents.values())):
+                    self.fleetReady.set()
+            self._sampled.notify_all()
+
+        # Calls the callbacks outside of the lock, so they can query the monitor.
+        if (becameReady):
+            for callback in self._callbacks:
+                callback(uri)
+
+    def OnReady(self, callback) -> None:
+        """Adds a function to call when a drone is ready.
+
+        Parameters:
+            callback:
+                Called with the URI of each drone once it is ready, on cflib's thread.
+        """
+
+        self._callbacks.append(callback)
+
+    def GetStatus(self, now: float=None) -> list[dict]:
+        """Gets the status of every drone.
+
+        Parameters:
+            now: float
+                The current time.time(). Uses the current time by default.
+
+        Returns:
+            list[dict]:
+                For each drone, its "uri", "state", "voltage", "level" in %, "rate" in V/s and "timeToFull" in s.
+        """
+
+        if (now is None):
+            now = time.time()
+
+        with self._sampled:
+            return [{
+                "uri": tracker.uri,
+                "state": tracker.GetState(now),
+                "voltage": tracker.voltage,
+                "level": tracker.level,
+                "rate": tracker.GetRate(),
+                "timeToFull": tracker.GetTimeToFull(),
+            } for tracker in self.trackers.values()]
+
+    def FormatStatus(self, now: float=None) -> str:
+        """Formats the status of every drone as a table.
+
+        Parameters:
+            now: float
+                The current time.time(). Uses the current time by default.
+
+        Returns:
+            str:
+                A line per drone, and a line for the fleet.
+        """
+
+        status = self.GetStatus(now)
+        lines = [f"{'uri':<28}{'state':>10}{'V':>8}{'%':>8}{'mV/min':>8}{'to full':>10}"]
+        for drone in status:
+            voltage = f"{drone['voltage']:>8.2f}" if drone["voltage"] is not None else f"{'-':>8}"
+            level = f"{drone['level']:>8.1f}" if drone["level"] is not None else f"{'-':>8}"
+            rate = f"{drone['rate'] * 60000:>8.1f}" if math.isfinite(drone["rate"]) else f"{'-':>8}"
+            toFull = f"{drone['timeToFull'] / 60:>6.1f} min" if math.isfinite(drone["timeToFull"]) else f"{'-':>10}"
+            lines.append(f"{drone['uri']:<28}{drone['state']:>10}{voltage}{level}{rate}{toFull}")
+
+        # The fleet is ready when the slowest drone is.
+        ready = sum(drone["state"] == "ready" for drone in status)
+        remaining = [drone["timeToFull"] for drone in status]
+        fleetTime = f"{max(remaining) / 60:.1f} min" if all(math.isfinite(value) for value in remaining) else "unknown"
+        lines.append(f"{ready}/{len(status)} ready, fleet ready in {fleetTime}")
+
+        return "\n".join(lines)
+
+    def WaitUntilReady(self, timeout: float=None) -> bool:
+        """Waits until every drone is ready.
+
+        Parameters:
+            timeout: float
+                The longest time in s to wait. Waits forever by default.
+
+        Returns:
+            bool:
+                Whether every drone is ready.
+        """
+
+        return self.fleetReady.wait(timeout)
+
+    def WaitForSamples(self, timeout: float=None) -> bool:
+        """Waits until every drone has sent a sample.
+
+        Parameters:
+            timeout: float
+                The longest time in s to wait. Waits forever by default.
+
+        Returns:
+            bool:
+                Whether every drone has sent a sample.
+        """
+
+        with self._sampled:
+            return self._sampled.wait_for(lambda: all(tracker.samples > 0 for tracker in self.trackers.values()), timeout)
+
+    def StartLogging(self, scf, period: float=DEFAULT_PERIOD) -> LogConfig:
+        """Tells a Crazyflie to start sending its battery to the monitor.
+
+        Can be run for every drone at once with Swarm.parallel_safe.
+
+        Parameters:
+            scf: SyncCrazyflie
+                The drone, which must be one of the monitored drones.
+            period: float
+                The period in ms to log the battery at.
+
+        Returns:
+            LogConfig:
+                The log config, so that logging can be stopped.
+        """
+
+        config = LogConfig(name="Battery", period_in_ms=period)
+        config.add_variable('pm.vbat', 'float')
+        config.add_variable('pm.batteryLevel', 'float')
+        scf.cf.log.add_config(config)
+
+        uri = scf.cf.link_uri
+        config.data_received_cb.add_callback(lambda timestamp, data, logconf: self.Record(uri, data["pm.vbat"], data["pm.batteryLevel"]))
+        config.start()
+
+        return config
+
+# ===========================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitors the batteries of the fleet while they charge.")
+    parser.add_argument("uris", nargs="+", help="The URIs of the drones to monitor.")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET, help="The battery level in %% at which a drone counts as charged.")
+    parser.add_argument("--period", type=int, default=DEFAULT_PERIOD, help="The period in ms to log the battery at.")
+    parser.add_argument("--refresh", type=float, default=DEFAULT_REFRESH, help="The time in s between status tables.")
+    parser.add_argument("--once", action="store_true", help="Prints the status once every drone has sent a sample, then exits.")
+    parser.add_argument("--keep-running", action="store_true", help="Keeps monitoring once the fleet is ready.")
+    arguments = parser.parse_args()
+
+    # Only outputs errors.
+    logging.basicConfig(level=logging.ERROR)
+
+    cflib.crtp.init_drivers()
+    factory = CachedCfFactory(rw_cache="./cache")
+    monitor = BatteryMonitor(arguments.uris, arguments.target)
+    monitor.OnReady(lambda uri: print(f"{uri} finished charging."))
+
+    with Swarm(arguments.uris, factory=factory) as swarm:
+        swarm.parallel_safe(lambda scf: monitor.StartLogging(scf, arguments.period))
+
+        if (arguments.once):
+            monitor.WaitForSamples(LOST_TIMEOUT)
+            print(monitor.FormatStatus())
+        else:
+            try:
+                while (True):
+                    if (arguments.keep_running):
+                        time.sleep(arguments.refresh)
+                    elif (monitor.WaitUntilReady(arguments.refresh)):
+                        break
+                    print(monitor.FormatStatus() + "\n")
+
+                print(monitor.FormatStatus())
+                print("The fleet is charged.")
+            except KeyboardInterrupt:
+                pass
@@ -1,14 +1,10 @@
-import datetime
-import time
 import logging
-import math
 
-from UtilityLogs import *
+from BatteryMonitor import BatteryMonitor, LOST_TIMEOUT
 
 import cflib.crtp
 from cflib.crazyflie.swarm import CachedCfFactory
 from cflib.crazyflie.swarm import Swarm
-from cflib.crazyflie.log import LogConfig
 
 # The URIs of the drones that are going to be flying.
 uris = [
@@ -17,15 +13,22 @@ uris = [
     'radio://0/60/2M/E7E7E7E7E8'
 ]
 
+# The period in ms to log the battery at, fast enough that every drone reports straight away.
+CHECK_PERIOD = 500
+
 # Only output errors.
 logging.basicConfig(level=logging.ERROR)
 
 if __name__ == "__main__":
     cflib.crtp.init_drivers()
     factory = CachedCfFactory(rw_cache="./cache")
+    monitor = BatteryMonitor(uris)
 
     with Swarm(uris, factory=factory) as swarm:
         # Starts loggings battery levels.
-        swarm.parallel_safe(StartLoggingBattery)
+        swarm.parallel_safe(monitor.StartLogging, args_dict={uri: (CHECK_PERIOD,) for uri in uris})
         print("Logging started.")
-        time.sleep(2)
\ No newline at end of file
+
+        # Prints the battery of every drone as soon as they have all reported it.
+        monitor.WaitForSamples(LOST_TIMEOUT)
+        print(monitor.FormatStatus())
@@ -1,14 +1,10 @@
-import datetime
-import time
 import logging
-import math
 
-from UtilityLogs import *
+from BatteryMonitor import BatteryMonitor, DEFAULT_REFRESH
 
 import cflib.crtp
 from cflib.crazyflie.swarm import CachedCfFactory
 from cflib.crazyflie.swarm import Swarm
-from cflib.crazyflie.log import LogConfig
 
 # The URIs of the drones that are going to be flying.
 uris = [
@@ -24,19 +20,17 @@ if __name__ == "__main__":
     cflib.crtp.init_drivers()
     factory = CachedCfFactory(rw_cache="./cache")
 
-    with Swarm(uris, factory=factory) as swarm:
-        # Sets continuous to true in the logging function.
-        args = {
-            uris[0]: (True,),
-            uris[1]: (True,),
-            # uris[2]: (True,)
-        }
+    # Tracks every drone's charge without printing every packet.
+    monitor = BatteryMonitor(uris)
+    monitor.OnReady(lambda uri: print(f"{uri} finished charging."))
 
+    with Swarm(uris, factory=factory) as swarm:
         # Starts loggings battery levels.
-        swarm.parallel_safe(StartLoggingBattery, args_dict=args)
+        swarm.parallel_safe(monitor.StartLogging)
         print("Logging started.")
 
-        # Blocks the main program, when any input is given
-        # the program exits.
-        input()
-        exit()
\ No newline at end of file
+        # Prints the status of the fleet every so often until every drone is charged.
+        while (not monitor.WaitUntilReady(DEFAULT_REFRESH)):
+            print(monitor.FormatStatus() + "\n")
+
+        print(monitor.FormatStatus())